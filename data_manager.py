@@ -1,16 +1,251 @@
 import pandas as pd
+import numpy as np
 import json
 import os
 import warnings
+from bisect import bisect_right
 from copy import copy
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font, PatternFill, Alignment, Border
+import ast
 import gc
+import re
+from collections import namedtuple
+from types import MappingProxyType
 
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
 
+class SearchCursor:
+    """
+    全域搜尋結果游標。
+    只保存各表的命中 mask 與命中列 index，結果列 (sheet, is_sub, row_idx, match_info)
+    在 UI 真正要顯示時才逐列組出，數萬筆命中也不需一次建立全部結果。
+    """
+
+    def __init__(self):
+        self._segments = []  # [(sheet_name, is_sub, df, mask_df, hit_positions, text_lookup)]
+        self._offsets = []   # 各 segment 在整體結果中的起始位置
+        self._total = 0
+        self._cache = {}     # {結果序號: 已組好的結果列}
+
+    def add_segment(self, sheet_name, is_sub, df, mask, text_lookup=None):
+        """加入一張表的命中結果（mask 為與 df 同形的 bool DataFrame）"""
+        hits = np.flatnonzero(mask.to_numpy().any(axis=1))
+        if len(hits) == 0:
+            return
+        self._offsets.append(self._total)
+        self._segments.append((sheet_name, is_sub, df, mask, hits, text_lookup))
+        self._total += len(hits)
+
+    def __len__(self):
+        return self._total
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self._total:
+            raise IndexError(i)
+        cached = self._cache.get(i)
+        if cached is not None:
+            return cached
+
+        seg_no = bisect_right(self._offsets, i) - 1
+        sheet_name, is_sub, df, mask, hits, text_lookup = self._segments[seg_no]
+        pos = hits[i - self._offsets[seg_no]]
+        row_idx = df.index[pos]
+        mask_row = mask.iloc[pos]
+        matched_cols = [col for col in df.columns if mask_row[col]]
+
+        if text_lookup is None:
+            match_info = {col: str(df.iat[pos, df.columns.get_loc(col)]) for col in matched_cols}
+        else:
+            # 連結文字命中：顯示引用的 Key 與其文字內容
+            col = matched_cols[0]
+            key = str(df.iat[pos, df.columns.get_loc(col)])
+            match_info = {col: key, "Text": text_lookup.get(key, "")}
+
+        result = (sheet_name, is_sub, row_idx, match_info)
+        self._cache[i] = result
+        return result
+
+
+def _keep(value):
+    return value
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except Exception:
+        return value
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except Exception:
+        return value
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.lower() in ['true', '1', 'yes']
+    return bool(value)
+
+
+_CONVERTERS = {"int": _to_int, "float": _to_float, "bool": _to_bool}
+
+# 單一欄位的編譯結果：型別、UI 寫入轉型函式、是否連結文字表、enum 選項（有序 tuple / 查找用 frozenset）、
+# 衍生欄位公式（空字串表示一般欄位）、查表顯示 (目標母表, 目標欄位)（空 tuple 表示無）
+ColumnSchema = namedtuple("ColumnSchema", "name type convert linked options option_set formula lookup")
+
+_STRING_COLUMN = ColumnSchema("", "string", _keep, False, (), frozenset(), "", ())
+
+# 子表公式中引用外鍵對應母表列的欄位：[master.欄位]
+_MASTER_REF = "master."
+
+
+class ExpressionError(ValueError):
+    """批次運算式無法解析或含不支援的語法"""
+
+
+class ColumnExpression:
+    """
+    批次編輯用的欄位運算式（例如 "Damage * 1.1"、"Level * 5"、"max([Cool Down] - 1, 0)"）。
+    以 ast 解析後只允許數字、欄位名稱、四則 / 次方 / 取餘運算與少數函式，
+    不使用 eval；對選取的列以 numpy 向量化計算。
+    欄位名稱含空白或符號時以 [欄位名] 表示。
+    """
+
+    _COLUMN_REF = re.compile(r"\[([^\[\]]+)\]")
+    _BINOPS = {
+        ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide,
+        ast.FloorDiv: np.floor_divide, ast.Mod: np.mod, ast.Pow: np.power,
+    }
+    _UNARYOPS = {ast.USub: np.negative, ast.UAdd: np.positive}
+    _FUNCS = {
+        "abs": (1, 1, np.abs),
+        "round": (1, 2, lambda x, n=0: np.round(x, int(np.asarray(n).flat[0]))),
+        "int": (1, 1, np.trunc),
+        "float": (1, 1, lambda x: x),
+        "min": (2, None, lambda *xs: np.minimum.reduce(np.broadcast_arrays(*xs))),
+        "max": (2, None, lambda *xs: np.maximum.reduce(np.broadcast_arrays(*xs))),
+    }
+
+    def __init__(self, text, columns):
+        self.text = text
+        aliases = {}
+
+        def _alias(m):
+            name = m.group(1).strip()
+            if name not in columns:
+                raise ExpressionError(f"找不到欄位 [{name}]")
+            alias = f"__col{len(aliases)}"
+            aliases[alias] = name
+            return alias
+
+        source = self._COLUMN_REF.sub(_alias, text.strip())
+        try:
+            self._tree = ast.parse(source, mode="eval").body
+        except SyntaxError:
+            raise ExpressionError(f"運算式語法錯誤：{text}") from None
+        self._aliases = aliases
+        self.columns = set()  # 運算式用到的欄位
+        self._validate(self._tree, set(columns))
+
+    def _validate(self, node, columns):
+        if isinstance(node, ast.BinOp) and type(node.op) in self._BINOPS:
+            self._validate(node.left, columns)
+            self._validate(node.right, columns)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in self._UNARYOPS:
+            self._validate(node.operand, columns)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            pass
+        elif isinstance(node, ast.Name):
+            name = self._aliases.get(node.id, node.id)
+            if name not in columns:
+                raise ExpressionError(f"找不到欄位 {name}（欄位名含空白或符號時請寫成 [欄位名]）")
+            self.columns.add(name)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in self._FUNCS and not node.keywords:
+            lo, hi, _ = self._FUNCS[node.func.id]
+            if len(node.args) < lo or (hi is not None and len(node.args) > hi):
+                raise ExpressionError(f"{node.func.id}() 參數數量不正確")
+            for arg in node.args:
+                self._validate(arg, columns)
+        else:
+            raise ExpressionError(f"不支援的語法：{ast.dump(node)[:40]}")
+
+    def evaluate(self, values):
+        """values: {欄位: float ndarray}，回傳 float ndarray（無法計算的列為 NaN）"""
+        with np.errstate(all="ignore"):
+            return np.asarray(self._eval(self._tree, values), dtype=float)
+
+    def _eval(self, node, values):
+        if isinstance(node, ast.BinOp):
+            return self._BINOPS[type(node.op)](self._eval(node.left, values), self._eval(node.right, values))
+        if isinstance(node, ast.UnaryOp):
+            return self._UNARYOPS[type(node.op)](self._eval(node.operand, values))
+        if isinstance(node, ast.Constant):
+            return float(node.value)
+        if isinstance(node, ast.Name):
+            return values[self._aliases.get(node.id, node.id)]
+        return self._FUNCS[node.func.id][2](*(self._eval(arg, values) for arg in node.args))
+
+
+class SheetSchema:
+    """
+    單一工作表的欄位 schema（唯讀）。
+    由 config 編譯一次後供所有熱路徑查詢，避免每次寫入 / 建 UI 都逐層走訪 config dict。
+    config 變動（載入 Excel、儲存配置）時由 DataManager 整批丟棄重建，物件本身不會被修改。
+    """
+    __slots__ = ("name", "master", "sub", "is_sub", "columns", "linked", "derived", "lookups",
+                 "primary_key", "classification_key", "foreign_key")
+
+    def __init__(self, name, columns_cfg, df_columns, sheet_cfg, master_cfg):
+        self.name = name
+        self.is_sub = "#" in name
+        self.master, _, self.sub = name.partition("#")
+
+        columns = {}
+        for col in df_columns:
+            columns[col] = _STRING_COLUMN._replace(name=col)
+        for col, info in columns_cfg.items():
+            col_type = info.get("type", "string")
+            options = tuple(str(o) for o in info.get("options", ())) if col_type == "enum" else ()
+            lookup = info.get("lookup") or {}
+            lookup = (lookup["sheet"], lookup["column"]) if lookup.get("sheet") and lookup.get("column") else ()
+            columns[col] = ColumnSchema(col, col_type, _CONVERTERS.get(col_type, _keep),
+                                        bool(info.get("link_to_text")), options, frozenset(options),
+                                        str(info.get("formula") or "").strip().lstrip("="), lookup)
+        self.columns = MappingProxyType(columns)
+        self.linked = frozenset(col for col, c in columns.items() if c.linked)
+        self.derived = frozenset(col for col in df_columns if columns[col].formula)
+        # 查表欄位：{欄位: (目標母表, 目標欄位)}，依 df 欄位順序
+        self.lookups = MappingProxyType({col: columns[col].lookup for col in df_columns if columns[col].lookup})
+
+        first = df_columns[0] if len(df_columns) else ""
+        self.primary_key = sheet_cfg.get("primary_key", first)
+        self.classification_key = sheet_cfg.get("classification_key", first)
+        # 子表外鍵預設沿用母表 PK（與 SheetEditor 相同）
+        master_pk = master_cfg.get("primary_key", "")
+        self.foreign_key = sheet_cfg.get("foreign_key", master_pk) if self.is_sub else ""
+
+    def column(self, col_name):
+        """取得欄位 schema；未設定的欄位視為 string"""
+        col = self.columns.get(col_name)
+        return col if col is not None else _STRING_COLUMN._replace(name=col_name)
+
+    def type_map(self):
+        return {col: c.type for col, c in self.columns.items()}
+
+    def signature(self, col_names):
+        """欄位版面簽章（欄名 + 型別 + 連結 + 選項 + 查表），供 row widget 重用判斷"""
+        return tuple((col, c.type, c.linked, c.options, c.lookup)
+                     for col, c in ((col, self.column(col)) for col in col_names))
+
+
 class DataManager:
     def __init__(self, config_path="config.json"):
         self.config_path = config_path
@@ -36,6 +271,47 @@ class DataManager:
         self._excel_file_handle = None  # 保存 Excel 文件句柄
         self._text_file_handle = None  # 保存文字表文件句柄
 
+        # --- 資料版本（供各種衍生快取判斷是否過期）---
+        self._version_counter = 0
+        self._sheet_versions = {}  # {sheet_name: 版本號}，任何修改都會遞增
+        self._text_version = 0  # 文字表內容版本
+
+        # --- 快速跳轉索引 (Ctrl+P) ---
+        self._goto_segments = {}  # {sheet_name: {"version", "pk": [...], "name": [...]}}
+        self._goto_blob = None  # (blob, line_starts, lines, meta) 合併後的搜尋字串
+        self._goto_last = None  # 上一次查詢的完整命中集合，供遞增輸入時縮小範圍
+        self._text_flat = (-1, {})  # (text_version, {Key: 文字})
+
+        # --- 整表檢視（排序 / 篩選）快取 ---
+        self._sort_cache = {}  # {(sheet_name, column): (版本, 遞增列順序, 非空筆數)}
+        self._filter_cache = None  # (cache_key, 布林 Series) 最近一次篩選
+        self._row_blobs = {}  # {sheet_name: (版本, [每列串接後的小寫字串])}
+
+        # --- 欄位值索引（子表外鍵、母表分類）與項目清單顯示名稱 ---
+        self._value_index = {}  # {(sheet_name, 欄位): (版本, {值字串: 列 index ndarray})}
+        self._display_names = {}  # {母表: ((版本, 文字表版本), [每列顯示名稱])}
+
+        # --- 編譯後的欄位 schema（config 變動時整批重建）---
+        self._schemas = {}  # {sheet_name: SheetSchema}
+
+        # --- 衍生欄位（config 欄位的 formula）與母表 PK 索引 ---
+        self._derived = None  # (公式, 依賴)，見 _derived_graph；config 變動時重建
+        self.derived_errors = {}  # {(sheet_name, 欄位): 公式無法使用的原因}
+        self._pk_index = {}  # {母表: (版本, Series(PK 字串 → 列 index))}
+        self._lookups = {}  # {(sheet_name, 欄位): (戳記, [每列查表顯示值])}，見 lookup_values
+
+        # --- 全域 PK 登錄（跨表引用跳轉）---
+        self._pk_registry = {}  # {PK 字串: {母表: 該表中的筆數}}
+        self._pk_counts = {}  # {母表: (版本, {PK 字串: 筆數})}，各母表對登錄的貢獻
+        self._pk_keys_version = 0  # 登錄的 PK 集合有增減時遞增（引用索引以此判斷是否過期）
+        self._pk_key_index = (-1, None)  # (_pk_keys_version, pd.Index(所有 PK))，供 isin 使用
+        self._usages = {}  # {sheet_name: ((版本, PK 集合版本), {PK: [(列, 欄位)]})}，見 find_usages
+
+        # --- 修改記錄（復原 / 重做）---
+        self.undo_stack = []  # [op dict]，見 _record
+        self.redo_stack = []
+        self.flush_hook = None  # UI 的輸入緩衝 flush（讀取資料前先把未提交的輸入寫回）
+
     def _load_config(self, path):
         if not os.path.exists(path):
             return {}
@@ -99,26 +375,46 @@ class DataManager:
     def _drop_empty_rows(df):
         """移除整列都是空白的行（向量化，比 apply per-row 快）。
         回傳 (filtered_df, non_empty_mask)，mask 可供 _capture_sheet_styles 重用。"""
-        stripped = df.apply(lambda s: s.str.strip())
+        # 衍生欄位 / 批次修改可能讓整欄都是數值，先轉字串再判斷空白
+        stripped = df.apply(lambda s: s.astype(str).str.strip())
         mask = ~stripped.eq("").all(axis=1)
         return df[mask].reset_index(drop=True), mask
 
+    def schema(self, sheet_name):
+        """
+        取得工作表編譯後的欄位 schema（sheet_name 含 "#" 時視為子表）。
+        第一次查詢時由 config 編譯並快取，之後直到 invalidate_schema() 前都直接回傳。
+        """
+        schema = self._schemas.get(sheet_name)
+        if schema is None:
+            master_name, _, sub_name = sheet_name.partition("#")
+            master_cfg = self.config.get(master_name, {})
+            if sub_name:
+                sheet_cfg = master_cfg.get("sub_sheets", {}).get(sub_name, {})
+                df = self.sub_dfs.get(sheet_name)
+            else:
+                sheet_cfg = master_cfg
+                df = self.master_dfs.get(sheet_name)
+            df_columns = list(df.columns) if df is not None else []
+            schema = SheetSchema(sheet_name, sheet_cfg.get("columns", {}), df_columns, sheet_cfg, master_cfg)
+            self._schemas[sheet_name] = schema
+        return schema
+
+    def invalidate_schema(self):
+        """config 被修改後呼叫：丟棄所有編譯結果，下次查詢時重建"""
+        self._schemas = {}
+        self._derived = None
+        self._lookups = {}
+        # PK 欄可能被改掉：PK 索引與全域登錄一併重建
+        self._pk_index = {}
+        self._pk_registry = {}
+        self._pk_counts = {}
+        self._usages = {}
+        self._pk_keys_version += 1
+
     def _get_col_type_map(self, sheet_name):
         """取得工作表各欄位的資料型別對應"""
-        col_types = {}
-        if "#" in sheet_name:
-            parts = sheet_name.split("#", 1)
-            master_name, sub_name = parts[0], parts[1]
-            if master_name in self.config:
-                cols = self.config[master_name].get("sub_sheets", {}).get(sub_name, {}).get("columns", {})
-                for col_name, col_conf in cols.items():
-                    col_types[col_name] = col_conf.get("type", "string")
-        else:
-            if sheet_name in self.config:
-                cols = self.config[sheet_name].get("columns", {})
-                for col_name, col_conf in cols.items():
-                    col_types[col_name] = col_conf.get("type", "string")
-        return col_types
+        return self.schema(sheet_name).type_map()
 
     @staticmethod
     def _convert_value_for_excel(value, col_type):
@@ -138,16 +434,16 @@ class DataManager:
 
     def _prepare_df_for_save(self, sheet_name, df):
         """儲存前根據 config 轉換 DataFrame 的數值欄位為正確型別"""
-        col_types = self._get_col_type_map(sheet_name)
-        if not col_types:
+        schema = self.schema(sheet_name)
+        typed = [col for col in df.columns if schema.column(col).type in ("int", "float", "bool")]
+        if not typed:
             return df
         df = df.copy()
-        for col_name in df.columns:
-            col_type = col_types.get(col_name, "string")
-            if col_type in ("int", "float", "bool"):
-                df[col_name] = df[col_name].apply(
-                    lambda v, ct=col_type: self._convert_value_for_excel(v, ct)
-                )
+        for col_name in typed:
+            col_type = schema.column(col_name).type
+            df[col_name] = df[col_name].apply(
+                lambda v, ct=col_type: self._convert_value_for_excel(v, ct)
+            )
         return df
 
     @staticmethod
@@ -257,6 +553,25 @@ class DataManager:
         self.master_dfs = {}
         self.sub_dfs = {}
         self.sheet_styles = {}
+        self._sheet_versions = {}
+        self._goto_segments = {}
+        self._goto_blob = None
+        self._goto_last = None
+        self._sort_cache = {}
+        self._filter_cache = None
+        self._row_blobs = {}
+        self._value_index = {}
+        self._display_names = {}
+        self.undo_stack = []
+        self.redo_stack = []
+        self._schemas = {}
+        self._derived = None
+        self._pk_index = {}
+        self._lookups = {}
+        self._pk_registry = {}
+        self._pk_counts = {}
+        self._usages = {}
+        self._pk_keys_version += 1
 
         # 從 _full_config 取出該 Excel 的獨立配置區段
         excel_key = os.path.normpath(file_path)
@@ -313,6 +628,9 @@ class DataManager:
             if self.need_config_alert:
                 self.save_config()
 
+            # data_only=True 只讀到公式的快取值：依 config 公式重算衍生欄位
+            self.recompute_derived()
+
         except Exception as e:
             print(f"載入 Excel 失敗: {e}")
             raise
@@ -343,6 +661,7 @@ class DataManager:
             self.text_file_path = path
             self.text_sheetnames = []
             self.text_dict = {}
+            self._text_version += 1
 
             # 使用 openpyxl read_only 模式，比 pandas 快 2-5x
             wb = load_workbook(path, data_only=True, read_only=True)
@@ -410,6 +729,7 @@ class DataManager:
         gc.collect()
 
     def save_config(self):
+        self.invalidate_schema()
         with open(self.config_path, 'w', encoding='utf-8') as f:
             json.dump(self._full_config, f, indent=4, ensure_ascii=False)
 
@@ -421,11 +741,19 @@ class DataManager:
             return
 
         try:
-            # 儲存前清除空白行
-            for sheet in self.master_dfs:
-                self.master_dfs[sheet], _ = self._drop_empty_rows(self.master_dfs[sheet])
-            for sheet in self.sub_dfs:
-                self.sub_dfs[sheet], _ = self._drop_empty_rows(self.sub_dfs[sheet])
+            # 儲存前清除空白行：只有真的移除了列的表才換掉 DataFrame 並遞增版本，
+            # 其餘表的衍生快取（跳轉索引、排序、PK 登錄、引用索引…）保持有效
+            dropped = []
+            for dfs in (self.master_dfs, self.sub_dfs):
+                for sheet, df in dfs.items():
+                    filtered, mask = self._drop_empty_rows(df)
+                    if not mask.all():
+                        dfs[sheet] = filtered
+                        dropped.append(sheet)
+            if dropped:
+                self._bump_version(*dropped)
+                # 列號已位移：這些表的復原記錄會寫錯列，直接丟棄
+                self._drop_history(dropped)
 
             if not os.path.exists(self.excel_path):
                 with pd.ExcelWriter(self.excel_path, engine='openpyxl', mode='w') as writer:
@@ -590,40 +918,553 @@ class DataManager:
         if sheet_name in target_dict:
             df = target_dict[sheet_name]
 
-            try:
-                col_type = "string"
+            column = self.schema(sheet_name).column(col_name)
+            if column.formula:
+                return  # 衍生欄位由公式維護，不接受直接修改
+            value = column.convert(value)
+
+            if column.linked and not is_sub:
+                raw_key = self.master_dfs[sheet_name].at[row_idx, col_name]
+                self.update_linked_text(raw_key, value)
+                return
+
+            old = df.at[row_idx, col_name]
+            if str(old) == str(value):
+                return  # 值沒變（例如方向鍵觸發的 KeyRelease）：不改版本、不標記未儲存
+            self._write_cell(is_sub, sheet_name, row_idx, col_name, value)
+            self._record({"kind": "cell", "is_sub": is_sub, "sheet": sheet_name,
+                          "row": row_idx, "col": col_name, "old": old, "new": value})
+            self.dirty = True
 
-                if not is_sub:
-                    if sheet_name in self.config:
-                        col_type = self.config[sheet_name]["columns"].get(col_name, {}).get("type", "string")
+    def _write_cell(self, is_sub, sheet_name, row_idx, col_name, value):
+        """寫入單一儲存格並更新版本與各種增量快取（不記錄、不轉型）"""
+        df = (self.sub_dfs if is_sub else self.master_dfs)[sheet_name]
+        old_version = self.sheet_version(sheet_name)
+        old = df.at[row_idx, col_name]
+        df.at[row_idx, col_name] = value
+        self._bump_version(sheet_name)
+        if not is_sub:
+            self._patch_goto_segment(sheet_name, old_version, row_idx, col_name, value)
+            self._patch_display_name(sheet_name, old_version, row_idx, col_name)
+        self._patch_row_blob(sheet_name, old_version, row_idx)
+        self._patch_pk_index(sheet_name, old_version, col_name)
+        if not is_sub:
+            self._patch_pk_registry(sheet_name, old_version, col_name, old, value)
+        self._patch_usages(sheet_name, old_version, row_idx, col_name, old, value)
+        self._patch_lookups(sheet_name, old_version, row_idx, col_name)
+        self._propagate_derived(sheet_name, col_name, [row_idx], [old])
+
+    def _write_column(self, is_sub, sheet_name, rows, col_name, values):
+        """向量化寫入同一欄的多列，版本只遞增一次（增量快取隨版本失效，下次使用時重建）"""
+        df = (self.sub_dfs if is_sub else self.master_dfs)[sheet_name]
+        rows = np.asarray(rows, dtype=np.intp)
+        old = df[col_name].to_numpy(dtype=object)[rows]
+        self._store_column(df, sheet_name, rows, col_name, values)
+        self._propagate_derived(sheet_name, col_name, rows, old)
+
+    def _store_column(self, df, sheet_name, rows, col_name, values):
+        col_pos = df.columns.get_loc(col_name)
+        # df index 一律是 RangeIndex：列 index 即位置
+        df.iloc[rows, col_pos] = np.asarray(values, dtype=object)
+        self._bump_version(sheet_name)
+
+    # ================== 運算式 / 衍生欄位 ==================
+
+    def _expression_columns(self, sheet_name):
+        """運算式可引用的欄位：本表欄位；子表另可用 [master.欄位] 引用外鍵對應的母表列"""
+        if "#" not in sheet_name:
+            return list(self.master_dfs[sheet_name].columns)
+        master = self.master_dfs.get(sheet_name.partition("#")[0])
+        own = list(self.sub_dfs[sheet_name].columns)
+        return own + ([_MASTER_REF + c for c in master.columns] if master is not None else [])
+
+    def _pk_positions(self, master_name, keys):
+        """以母表 PK 做 hash join：回傳每個 key 對應的母表列 index（找不到為 -1）"""
+        version = self.sheet_version(master_name)
+        cached = self._pk_index.get(master_name)
+        if cached is None or cached[0] != version:
+            df = self.master_dfs[master_name]
+            pk_col = self._primary_key_of(master_name)
+            pks = df[pk_col].astype(str) if pk_col in df.columns else pd.Series([], dtype=str)
+            index = pd.Series(np.arange(len(pks), dtype=np.intp), index=pks.to_numpy())
+            # PK 重複時以第一筆為準
+            cached = (version, index[~index.index.duplicated()])
+            self._pk_index[master_name] = cached
+        return cached[1].reindex([str(k) for k in keys]).fillna(-1).to_numpy(dtype=np.intp)
+
+    def _patch_pk_index(self, sheet_name, old_version, col_name):
+        """單格修改不是 PK 欄時，PK 索引仍然有效：只更新版本戳"""
+        cached = self._pk_index.get(sheet_name)
+        if cached is not None and cached[0] == old_version and col_name != self._primary_key_of(sheet_name):
+            self._pk_index[sheet_name] = (self.sheet_version(sheet_name), cached[1])
+
+    def pk_row(self, sheet_name, key):
+        """母表中 PK 等於 key 的列 index（O(1)，重複時取第一筆），找不到回傳 None"""
+        pos = self._pk_positions(sheet_name, [key])[0]
+        return int(pos) if pos >= 0 else None
+
+    # ================== 全域 PK 登錄 ==================
+
+    def _sync_pk_registry(self):
+        """
+        讓全域 PK 登錄跟上各母表目前的版本：只重建版本已改變的母表的貢獻（value_counts 向量化），
+        未改變的母表什麼都不做。單格修改 PK 由 _patch_pk_registry 增量維護，不會走到這裡。
+        """
+        registry = self._pk_registry
+        for sheet_name in [s for s in self._pk_counts if s not in self.master_dfs]:
+            self._drop_pk_counts(sheet_name)
+        for sheet_name, df in self.master_dfs.items():
+            version = self.sheet_version(sheet_name)
+            entry = self._pk_counts.get(sheet_name)
+            if entry is not None and entry[0] == version:
+                continue
+            self._drop_pk_counts(sheet_name)
+            pk_col = self._primary_key_of(sheet_name)
+            counts = df[pk_col].astype(str).value_counts(sort=False).to_dict() if pk_col in df.columns else {}
+            counts.pop("", None)
+            for key, n in counts.items():
+                registry.setdefault(key, {})[sheet_name] = n
+            self._pk_counts[sheet_name] = (version, counts)
+            self._pk_keys_version += 1
+
+    def _drop_pk_counts(self, sheet_name):
+        entry = self._pk_counts.pop(sheet_name, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            owners = self._pk_registry.get(key)
+            if owners is not None:
+                owners.pop(sheet_name, None)
+                if not owners:
+                    del self._pk_registry[key]
+        self._pk_keys_version += 1
+
+    def _patch_pk_registry(self, sheet_name, old_version, col_name, old, new):
+        """單格修改的遞增維護：改到 PK 時把舊值的計數減一、新值加一；其他欄位只更新版本戳"""
+        entry = self._pk_counts.get(sheet_name)
+        if entry is None or entry[0] != old_version:
+            return
+        counts = entry[1]
+        if col_name == self._primary_key_of(sheet_name):
+            old, new = str(old), str(new)
+            if old in counts:
+                counts[old] -= 1
+                owners = self._pk_registry[old]
+                if counts[old]:
+                    owners[sheet_name] = counts[old]
                 else:
-                    master_name = sheet_name.split("#")[0]
-                    sub_name = sheet_name.split("#")[1]
-                    if master_name in self.config:
-                        col_type = self.config[master_name]["sub_sheets"].get(sub_name, {}) \
-                            .get("columns", {}).get(col_name, {}).get("type", "string")
-
-                if col_type == "int":
-                    value = int(value)
-                elif col_type == "float":
-                    value = float(value)
-                elif col_type == "bool":
-                    if isinstance(value, str):
-                        value = value.lower() in ['true', '1', 'yes']
-                    else:
-                        value = bool(value)
+                    del counts[old]
+                    del owners[sheet_name]
+                    if not owners:
+                        del self._pk_registry[old]
+                        self._pk_keys_version += 1
+            if new:
+                counts[new] = counts.get(new, 0) + 1
+                if new not in self._pk_registry:
+                    self._pk_keys_version += 1
+                self._pk_registry.setdefault(new, {})[sheet_name] = counts[new]
+        self._pk_counts[sheet_name] = (self.sheet_version(sheet_name), counts)
+
+    def pk_owners(self, key):
+        """擁有此 PK 的母表（依母表順序的 list），供跨表引用跳轉 O(1) 查詢"""
+        self._sync_pk_registry()
+        owners = self._pk_registry.get(str(key).strip())
+        if not owners:
+            return []
+        return [s for s in self.master_dfs if s in owners] if len(owners) > 1 else list(owners)
+
+    def ambiguous_pks(self):
+        """
+        有歧義的 PK：同時存在於多張母表，或在同一張母表重複出現。
+        回傳 {PK: {母表: 筆數}}（依 PK 排序），引用這些值時無法確定指向哪一筆。
+        """
+        self._sync_pk_registry()
+        return {key: dict(owners) for key, owners in sorted(self._pk_registry.items())
+                if len(owners) > 1 or any(n > 1 for n in owners.values())}
 
-            except Exception as e:
-                pass
+    # ================== 引用索引（Find usages）==================
 
-            col_conf = self.config.get(sheet_name, {}).get("columns", {}).get(col_name, {})
-            if col_conf.get("link_to_text"):
-                raw_key = self.master_dfs[sheet_name].at[row_idx, col_name]
-                self._update_external_text(raw_key, value)
+    def _usage_segment(self, sheet_name):
+        """
+        單一工作表的反向引用索引 {PK: [(列, 欄位)]}：逐欄以 isin 和全域 PK 集合取交集（向量化），
+        只收錄命中的儲存格。略過母表自己的 PK 欄、連結文字欄（存的是文字 Key）與衍生欄位。
+        依 (工作表版本, PK 集合版本) 快取；單格修改由 _patch_usages 增量維護。
+        """
+        stamp = (self.sheet_version(sheet_name), self._pk_keys_version)
+        cached = self._usages.get(sheet_name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        if self._pk_key_index[0] != self._pk_keys_version:
+            self._pk_key_index = (self._pk_keys_version, pd.Index(list(self._pk_registry)))
+        keys = self._pk_key_index[1]
+
+        is_sub = "#" in sheet_name
+        df = (self.sub_dfs if is_sub else self.master_dfs)[sheet_name]
+        schema = self.schema(sheet_name)
+        skip = schema.linked | schema.derived | (frozenset() if is_sub else {schema.primary_key})
+        index = {}
+        for col in df.columns:
+            if col in skip:
+                continue
+            values = df[col].astype(str).to_numpy()
+            rows = np.flatnonzero(pd.Index(values).isin(keys))
+            for row, key in zip(rows.tolist(), values[rows].tolist()):
+                index.setdefault(key, []).append((row, col))
+        self._usages[sheet_name] = (stamp, index)
+        return index
+
+    def _patch_usages(self, sheet_name, old_version, row_idx, col_name, old, new):
+        """單格修改的遞增維護：從舊值的清單移除該格，新值是 PK 時加入"""
+        cached = self._usages.get(sheet_name)
+        if cached is None or cached[0][0] != old_version:
+            return
+        stamp, index = cached
+        cells = index.get(str(old))
+        if cells is not None and (row_idx, col_name) in cells:
+            cells.remove((row_idx, col_name))
+            if not cells:
+                del index[str(old)]
+        schema = self.schema(sheet_name)
+        is_sub = "#" in sheet_name
+        skip = col_name in schema.linked or col_name in schema.derived or \
+            (not is_sub and col_name == schema.primary_key)
+        if not skip and str(new) in self._pk_registry:
+            index.setdefault(str(new), []).append((row_idx, col_name))
+        self._usages[sheet_name] = ((self.sheet_version(sheet_name), stamp[1]), index)
+
+    def find_usages(self, key):
+        """
+        引用 key（某母表的 PK）的所有儲存格：[(sheet_name, is_sub, 列, 欄位)]，
+        依母表、子表順序排列。索引建好之後每次查詢只是各表一次 dict 查找。
+        """
+        self._flush_pending()
+        self._sync_pk_registry()
+        key = str(key).strip()
+        result = []
+        for sheet_name in list(self.master_dfs) + list(self.sub_dfs):
+            for row, col in self._usage_segment(sheet_name).get(key, ()):
+                result.append((sheet_name, "#" in sheet_name, row, col))
+        return result
+
+    def prepare_usage_index(self):
+        """預先建立全域 PK 登錄與所有工作表的引用索引（載入完成後在背景執行緒呼叫）"""
+        self._sync_pk_registry()
+        for sheet_name in list(self.master_dfs) + list(self.sub_dfs):
+            self._usage_segment(sheet_name)
+
+    # ================== 查表欄位（跨表 hash join）==================
+
+    def _lookup_stamp(self, sheet_name, target_sheet, target_col):
+        linked = target_col in self.linked_columns(target_sheet) and bool(self.text_dict)
+        return (self.sheet_version(sheet_name), self.sheet_version(target_sheet),
+                self._text_version if linked else 0)
+
+    def _lookup_display(self, target_sheet, target_col, positions):
+        """依母表列 index 取出目標欄位的顯示值（連結欄位轉文字；找不到的列為空字串）"""
+        df = self.master_dfs[target_sheet]
+        found = positions >= 0
+        out = np.full(len(positions), "", dtype=object)
+        if target_col in df.columns and found.any():
+            values = df[target_col].to_numpy(dtype=object)[positions[found]].astype(str)
+            if target_col in self.linked_columns(target_sheet) and self.text_dict:
+                texts = self._text_values()
+                values = np.array([str(texts.get(v, v)) for v in values], dtype=object)
+            out[found] = values
+        return out
+
+    def lookup_values(self, sheet_name, column):
+        """
+        查表欄位每列的顯示值（list，位置即列 index）：以 column 的值到目標母表的 PK 索引做 hash join，
+        取出目標欄位（例如子表 SkillID 旁顯示技能名稱）。整欄向量化計算並依兩邊的版本快取；
+        單格修改由 _patch_lookups 增量修補，不是查表欄位時回傳 None。
+        """
+        spec = self.schema(sheet_name).lookups.get(column)
+        if not spec or spec[0] not in self.master_dfs:
+            return None
+        target_sheet, target_col = spec
+        stamp = self._lookup_stamp(sheet_name, target_sheet, target_col)
+        cached = self._lookups.get((sheet_name, column))
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        df = (self.sub_dfs if "#" in sheet_name else self.master_dfs)[sheet_name]
+        positions = self._pk_positions(target_sheet, df[column].to_numpy(dtype=object))
+        values = self._lookup_display(target_sheet, target_col, positions).tolist()
+        self._lookups[(sheet_name, column)] = (stamp, values)
+        return values
+
+    def _patch_lookups(self, sheet_name, old_version, row_idx, col_name):
+        """
+        單格修改後修補查表快取（修改前是最新的才修補，否則留給下次整欄重算）：
+        來源表改到查表欄位只重算該列；目標表改到目標欄位只重算引用該 PK 的列；
+        其餘欄位的修改不影響結果，只更新版本戳。目標表 PK 被改時整欄重算。
+        """
+        for (src_sheet, src_col), (stamp, values) in list(self._lookups.items()):
+            target_sheet, target_col = self.schema(src_sheet).lookups.get(src_col, ("", ""))
+            if sheet_name not in (src_sheet, target_sheet):
+                continue
+            old_stamp = (old_version if src_sheet == sheet_name else self.sheet_version(src_sheet),
+                         old_version if target_sheet == sheet_name else self.sheet_version(target_sheet),
+                         stamp[2])
+            if stamp != old_stamp:
+                continue
+            if target_sheet == sheet_name and col_name == self._primary_key_of(target_sheet):
+                self._lookups.pop((src_sheet, src_col), None)
+                continue
+            src_df = (self.sub_dfs if "#" in src_sheet else self.master_dfs)[src_sheet]
+            if src_sheet == sheet_name and col_name == src_col:
+                rows = [row_idx]
+            elif target_sheet == sheet_name and col_name == target_col:
+                pk = self.master_dfs[target_sheet].at[row_idx, self._primary_key_of(target_sheet)]
+                rows = self.rows_with_value(src_sheet, src_col, pk)
             else:
-                df.at[row_idx, col_name] = value
+                rows = []
+            if len(rows):
+                rows = np.asarray(rows, dtype=np.intp)
+                positions = self._pk_positions(target_sheet, src_df[src_col].to_numpy(dtype=object)[rows])
+                for i, v in zip(rows, self._lookup_display(target_sheet, target_col, positions)):
+                    values[i] = v
+            self._lookups[(src_sheet, src_col)] = (self._lookup_stamp(src_sheet, target_sheet, target_col), values)
+
+    def _numeric_column(self, sheet_name, df, col, rows):
+        """取出 df[col] 的 rows 列並轉為 float（非數字為 NaN；bool 欄位為 0/1）"""
+        raw = df[col].to_numpy(dtype=object)[rows]
+        if self.schema(sheet_name).column(col).type == "bool":
+            raw = np.array([str(v).lower() in ("true", "1", "yes") for v in raw], dtype=object)
+        return pd.to_numeric(pd.Series(raw), errors="coerce").to_numpy(dtype=float)
+
+    def evaluate_expression(self, sheet_name, rows, column, expr):
+        """
+        對 rows 計算批次運算式（以 "=" 開頭的字串或 ColumnExpression），結果依 column 的型別格式化。
+        回傳與 rows 等長的 object ndarray；參考欄位非數字或除以零等無法計算的列為 None。
+        """
+        is_sub = "#" in sheet_name
+        df = (self.sub_dfs if is_sub else self.master_dfs)[sheet_name]
+        if not isinstance(expr, ColumnExpression):
+            expr = ColumnExpression(str(expr).lstrip("="), self._expression_columns(sheet_name))
+        rows = np.asarray(rows, dtype=np.intp)
+        values = {}
+        joined = None
+        for col in expr.columns:
+            if is_sub and col.startswith(_MASTER_REF):
+                master_name = sheet_name.partition("#")[0]
+                master_df = self.master_dfs[master_name]
+                if joined is None:
+                    fk = self.schema(sheet_name).foreign_key
+                    keys = df[fk].to_numpy(dtype=object)[rows] if fk in df.columns else [""] * len(rows)
+                    joined = self._pk_positions(master_name, keys)
+                found = joined >= 0
+                vals = np.full(len(rows), np.nan)
+                vals[found] = self._numeric_column(master_name, master_df, col[len(_MASTER_REF):], joined[found])
+                values[col] = vals
+            else:
+                values[col] = self._numeric_column(sheet_name, df, col, rows)
+        result = np.broadcast_to(expr.evaluate(values), (len(rows),))
+
+        # 依目標欄位型別向量化格式化；int 四捨五入，字串欄位的整數值不帶 ".0"
+        col_type = self.schema(sheet_name).column(column).type
+        out = np.full(len(rows), None, dtype=object)
+        ok = np.isfinite(result)
+        vals = result[ok]
+        if col_type == "int":
+            formatted = np.rint(vals).astype(np.int64).tolist()
+        elif col_type == "float":
+            formatted = np.round(vals, 10).tolist()
+        else:
+            integral = vals == np.trunc(vals)
+            formatted = np.where(integral, np.trunc(vals).astype(np.int64).astype(str),
+                                 np.round(vals, 6).astype(str)).tolist()
+        out[ok] = formatted
+        return out
 
-            self.dirty = True
+    def _derived_graph(self):
+        """
+        編譯所有衍生欄位並建立依賴圖（config 變動後第一次使用時重建），回傳 (formulas, dependents)：
+        formulas：{(sheet, 衍生欄位): ColumnExpression}，依拓撲順序排列（被依賴的先算）
+        dependents：{(sheet, 輸入欄位): [(sheet, 衍生欄位, 是否經外鍵關聯母表)]}
+        公式錯誤或循環依賴的欄位不計算，原因記在 derived_errors。
+        """
+        if self._derived is not None:
+            return self._derived
+        errors = {}
+        compiled = {}
+        inputs = {}  # {(sheet, 衍生欄位): [((sheet, 輸入欄位), 是否經母表)]}
+        for sheet_name in list(self.master_dfs) + list(self.sub_dfs):
+            schema = self.schema(sheet_name)
+            for col in schema.derived:
+                try:
+                    expr = ColumnExpression(schema.column(col).formula, self._expression_columns(sheet_name))
+                except ExpressionError as e:
+                    errors[(sheet_name, col)] = str(e)
+                    continue
+                node_inputs = []
+                for name in expr.columns:
+                    if schema.is_sub and name.startswith(_MASTER_REF):
+                        node_inputs.append(((schema.master, name[len(_MASTER_REF):]), True))
+                    else:
+                        node_inputs.append(((sheet_name, name), False))
+                if any(joined for _, joined in node_inputs):
+                    # 外鍵或母表 PK 改變時，關聯到的母表列也跟著變
+                    node_inputs.append(((sheet_name, schema.foreign_key), False))
+                    node_inputs.append(((schema.master, self._primary_key_of(schema.master)), True))
+                compiled[(sheet_name, col)] = expr
+                inputs[(sheet_name, col)] = node_inputs
+
+        # Kahn 拓撲排序：只計算衍生欄位之間的邊；排不進去的就是循環依賴
+        waiting = {node: {src for src, _ in node_inputs if src in compiled and src != node}
+                   for node, node_inputs in inputs.items()}
+        for node, node_inputs in inputs.items():
+            if any(src == node for src, _ in node_inputs):
+                waiting[node].add(node)
+        order = []
+        ready = [node for node, deps in waiting.items() if not deps]
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for other, deps in waiting.items():
+                if node in deps:
+                    deps.discard(node)
+                    if not deps:
+                        ready.append(other)
+        for node in compiled:
+            if node not in order:
+                errors[node] = "公式循環依賴"
+
+        formulas = {node: compiled[node] for node in order}
+        dependents = {}
+        for node in order:
+            for src, joined in inputs[node]:
+                dependents.setdefault(src, []).append((node[0], node[1], joined))
+        self.derived_errors = errors
+        self._derived = (formulas, dependents)
+        return self._derived
+
+    def _recompute_derived_rows(self, sheet_name, col_name, expr, rows):
+        """重算衍生欄位的 rows 列（None 為整欄），只寫入有變動的列並回傳這些列"""
+        df = (self.sub_dfs if "#" in sheet_name else self.master_dfs)[sheet_name]
+        rows = np.arange(len(df), dtype=np.intp) if rows is None else np.asarray(rows, dtype=np.intp)
+        if not len(rows):
+            return rows
+        new = self.evaluate_expression(sheet_name, rows, col_name, expr)
+        new[np.equal(new, None)] = ""  # 輸入不是數字：留空（相當於 Excel 的錯誤值）
+        old = df[col_name].to_numpy(dtype=object)[rows]
+        changed = old.astype(str) != new.astype(str)
+        if changed.any():
+            self._store_column(df, sheet_name, rows[changed], col_name, new[changed])
+        return rows[changed]
+
+    def _propagate_derived(self, sheet_name, col_name, rows, old_values=()):
+        """
+        輸入欄位的 rows 列被寫入後，依拓撲順序只重算受影響的衍生欄位列（向量化）。
+        母表欄位改變時，經外鍵找出引用這些 PK（含修改前的值）的子表列。
+        """
+        formulas, dependents = self._derived_graph()
+        if (sheet_name, col_name) not in dependents:
+            return
+        pending = {}  # {(sheet, 衍生欄位): set(列 index)}
+
+        def _enqueue(src_sheet, src_col, src_rows, src_old=()):
+            for target_sheet, target_col, joined in dependents.get((src_sheet, src_col), ()):
+                if joined:
+                    df = self.master_dfs[src_sheet]
+                    pk_col = self._primary_key_of(src_sheet)
+                    keys = set(df[pk_col].to_numpy(dtype=object)[np.asarray(src_rows, dtype=np.intp)])
+                    if src_col == pk_col:
+                        keys.update(src_old)
+                    target_rows = self.rows_with_values(
+                        target_sheet, self.schema(target_sheet).foreign_key, keys)
+                else:
+                    target_rows = src_rows
+                if len(target_rows):
+                    pending.setdefault((target_sheet, target_col), set()).update(target_rows)
+
+        _enqueue(sheet_name, col_name, rows, old_values)
+        for node, expr in formulas.items():
+            node_rows = pending.pop(node, None)
+            if node_rows:
+                changed = self._recompute_derived_rows(node[0], node[1], expr, sorted(node_rows))
+                if len(changed):
+                    _enqueue(node[0], node[1], changed)
+
+    def recompute_derived(self, *sheet_names):
+        """
+        整欄重算衍生欄位（載入、修改公式或列結構改變後呼叫）；不指定工作表時重算全部。
+        依賴被重算欄位的其他衍生欄位會一併重算。回傳有變動的儲存格數。
+        """
+        formulas, dependents = self._derived_graph()
+        affected = set(sheet_names) if sheet_names else None
+        count = 0
+        for (sheet_name, col_name), expr in formulas.items():
+            masters = {sheet_name.partition("#")[0]} if "#" in sheet_name else set()
+            if affected is not None and sheet_name not in affected and not (masters & affected):
+                continue
+            changed = self._recompute_derived_rows(sheet_name, col_name, expr, None)
+            if len(changed) and affected is not None:
+                affected.add(sheet_name)
+            count += len(changed)
+        return count
+
+    def bulk_update(self, sheet_name, rows, column, value_or_expr):
+        """
+        一次修改多列的同一欄位（批次編輯用）：依 schema 轉型、向量化寫入、
+        記錄為單一復原操作、工作表版本只遞增一次。sheet_name 含 "#" 時視為子表。
+        value_or_expr：單一值（所有列套用同值，只轉型一次）、與 rows 等長的序列（每列各自的新值），
+        或以 "=" 開頭的運算式（見 ColumnExpression；無法計算的列保持原值）。
+        連結文字欄位（母表與子表皆同）改為修改各列 Key 對應的文字。回傳實際有變動的列數。
+        運算式有誤時拋出 ExpressionError。
+        """
+        self._flush_pending()
+        is_sub = "#" in sheet_name
+        df = (self.sub_dfs if is_sub else self.master_dfs)[sheet_name]
+        rows = np.asarray(rows, dtype=np.intp)
+        col_schema = self.schema(sheet_name).column(column)
+        if col_schema.formula:
+            return 0  # 衍生欄位由公式維護
+
+        if isinstance(value_or_expr, ColumnExpression) or \
+                (isinstance(value_or_expr, str) and value_or_expr.startswith("=")):
+            computed = self.evaluate_expression(sheet_name, rows, column, value_or_expr)
+            ok = np.array([v is not None for v in computed], dtype=bool)
+            rows, value_or_expr = rows[ok], computed[ok]
+
+        if isinstance(value_or_expr, (str, bytes)) or np.ndim(value_or_expr) == 0:
+            new = np.empty(len(rows), dtype=object)
+            new[:] = [col_schema.convert(value_or_expr)] if len(rows) else []
+        else:
+            if len(value_or_expr) != len(rows):
+                raise ValueError("value_or_expr 與 rows 長度不同")
+            new = np.array([col_schema.convert(v) for v in value_or_expr], dtype=object)
+
+        old = df[column].to_numpy(dtype=object)[rows]
+
+        if col_schema.linked:
+            # 連結欄位的儲存格是文字 Key：逐 Key 修改文字表，合併成一筆復原記錄
+            ops = []
+            count = 0
+            for key, text in zip(old, new):
+                key, text = str(key), str(text)
+                info = self.text_dict.get(key)
+                prev = info["value"] if info else None
+                if prev == text:
+                    continue
+                self._update_external_text(key, text)
+                count += 1
+                if prev is not None:
+                    ops.append({"kind": "text", "key": key, "old": prev, "new": text})
+            if ops:
+                self._record({"kind": "batch", "ops": ops})
+            if count:
+                self.dirty = True
+            return count
+
+        changed = old.astype(str) != new.astype(str)
+        if not changed.any():
+            return 0
+        rows, old, new = rows[changed], old[changed], new[changed]
+        self._write_column(is_sub, sheet_name, rows, column, new)
+        self._record({"kind": "cells", "is_sub": is_sub, "sheet": sheet_name,
+                      "rows": rows, "col": column, "old": old, "new": new})
+        self.dirty = True
+        return int(changed.sum())
 
     def _update_external_text(self, key, new_value):
         """
@@ -636,6 +1477,7 @@ class DataManager:
 
         if str(key) in self.text_dict:
             self.text_dict[str(key)]["value"] = str(new_value)
+            self._text_version += 1
 
         self.text_modified = True
 
@@ -649,14 +1491,508 @@ class DataManager:
         else:
             return f"<{key} Missing>"
 
+    def rows_with_value(self, sheet_name, column, key):
+        """
+        工作表中 column 欄（以字串比較）等於 key 的列 index（np.ndarray，依列順序）
+        每個 (工作表, 欄位) 依工作表版本建立一次 groupby 索引，之後每次查詢都是 O(1)，
+        不必每選一個項目就整欄 astype(str) 比對。sheet_name 含 "#" 時視為子表。
+        """
+        df = (self.sub_dfs if "#" in sheet_name else self.master_dfs).get(sheet_name)
+        if df is None or column not in df.columns:
+            return np.empty(0, dtype=np.intp)
+        version = self.sheet_version(sheet_name)
+        cached = self._value_index.get((sheet_name, column))
+        if cached is None or cached[0] != version:
+            # df index 一律是 RangeIndex，groupby 的位置索引即列 index
+            groups = df.groupby(df[column].astype(str), sort=False).indices
+            cached = (version, groups)
+            self._value_index[(sheet_name, column)] = cached
+        rows = cached[1].get(str(key))
+        return rows if rows is not None else np.empty(0, dtype=np.intp)
+
+    def rows_with_values(self, sheet_name, column, keys):
+        """rows_with_value 的多鍵版本：column 值屬於 keys 的所有列 index（遞增排序的 list）"""
+        keys = list(keys)
+        if len(keys) > 64:
+            # 鍵很多時一次 isin 比逐鍵查索引再合併快
+            df = (self.sub_dfs if "#" in sheet_name else self.master_dfs)[sheet_name]
+            return np.flatnonzero(df[column].astype(str).isin([str(k) for k in keys])).tolist()
+        parts = [self.rows_with_value(sheet_name, column, key) for key in keys]
+        return np.sort(np.concatenate(parts)).tolist() if parts else []
+
+    def child_rows(self, sheet_name, fk_col, key):
+        """子表中外鍵等於 key（母表 PK）的列 index"""
+        return self.rows_with_value(sheet_name, fk_col, key)
+
+    def display_names(self, sheet_name):
+        """
+        母表每列在項目清單的顯示名稱（list，位置即列 index）：Name 欄經文字表解析，
+        沒有 Name 欄或文字表查不到時用 PK。整欄以向量化 map 計算並快取；
+        單格修改只在改到 Name / PK 時修補該列（_patch_display_name），文字表內容改變才整欄重算。
+        """
+        df = self.master_dfs[sheet_name]
+        stamp = (self.sheet_version(sheet_name), self._text_version)
+        cached = self._display_names.get(sheet_name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        pk_col = self._primary_key_of(sheet_name)
+        names = df[pk_col].astype(str) if pk_col in df.columns else pd.Series([""] * len(df), index=df.index)
+        if "Name" in df.columns and self.text_dict:
+            resolved = df["Name"].map(self._text_values())
+            names = resolved.where(resolved.notna(), names).astype(str)
+        names = names.tolist()
+        self._display_names[sheet_name] = (stamp, names)
+        return names
+
+    def _display_name_at(self, sheet_name, row_idx):
+        df = self.master_dfs[sheet_name]
+        pk_col = self._primary_key_of(sheet_name)
+        name = str(df.at[row_idx, pk_col]) if pk_col in df.columns else ""
+        if "Name" in df.columns and self.text_dict:
+            text_info = self.text_dict.get(df.at[row_idx, "Name"])
+            if text_info:
+                name = str(text_info["value"])
+        return name
+
+    def _patch_display_name(self, sheet_name, old_version, row_idx, col_name):
+        """單一儲存格修改後修補顯示名稱快取：只有 Name / PK 欄需要重算該列"""
+        cached = self._display_names.get(sheet_name)
+        if cached is None:
+            return
+        (version, text_version), names = cached
+        if version != old_version:
+            self._display_names.pop(sheet_name, None)
+            return
+        if col_name == "Name" or col_name == self._primary_key_of(sheet_name):
+            names[row_idx] = self._display_name_at(sheet_name, row_idx)
+        self._display_names[sheet_name] = ((self.sheet_version(sheet_name), text_version), names)
+
+    def row_values(self, sheet_name, row_indices, columns):
+        """
+        取得指定列、欄的字串值（二維 list），供虛擬化表格只取可視範圍使用
+        sheet_name 含 "#" 時視為子表
+        """
+        df = (self.sub_dfs if "#" in sheet_name else self.master_dfs).get(sheet_name)
+        if df is None or not len(row_indices):
+            return []
+        # take（位置）比 loc（標籤清單）快一個數量級，捲動時每次只取可視範圍
+        positions = df.index.get_indexer(list(row_indices))
+        return df.take(positions)[list(columns)].astype(str).values.tolist()
+
     def update_linked_text(self, key, new_text):
         """ 給 UI 呼叫：更新文字內容 (不改 Key) """
         if not hasattr(self, "text_dict") or self.text_dict is None:
             return
 
+        info = self.text_dict.get(str(key))
+        old = info["value"] if info else None
+        if old == str(new_text):
+            return
         self._update_external_text(key, new_text)
+        if old is not None:
+            self._record({"kind": "text", "key": str(key), "old": old, "new": str(new_text)})
         self.dirty = True
 
+    # ================== 修改記錄（復原 / 重做） ==================
+
+    _UNDO_LIMIT = 500
+
+    def _record(self, op):
+        """
+        記錄一筆修改。op：
+          {"kind": "cell", "is_sub", "sheet", "row", "col", "old", "new"}
+          {"kind": "cells", "is_sub", "sheet", "rows", "col", "old", "new"}  批次修改（old/new 與 rows 等長）
+          {"kind": "text", "key", "old", "new"}
+          {"kind": "batch", "ops": [op, ...]}  多筆修改視為一次復原
+        """
+        self.undo_stack.append(op)
+        if len(self.undo_stack) > self._UNDO_LIMIT:
+            del self.undo_stack[0]
+        self.redo_stack.clear()
+
+    def _flush_pending(self):
+        if self.flush_hook is not None:
+            self.flush_hook()
+
+    def _apply_op(self, op, side):
+        """把 op 的 old（復原）或 new（重做）值寫回"""
+        if op["kind"] == "cell":
+            self._write_cell(op["is_sub"], op["sheet"], op["row"], op["col"], op[side])
+        elif op["kind"] == "cells":
+            self._write_column(op["is_sub"], op["sheet"], op["rows"], op["col"], op[side])
+        elif op["kind"] == "text":
+            self._update_external_text(op["key"], op[side])
+        elif op["kind"] == "batch":
+            for sub_op in (op["ops"] if side == "new" else reversed(op["ops"])):
+                self._apply_op(sub_op, side)
+        self.dirty = True
+
+    def undo(self):
+        """復原最後一筆修改，回傳該 op（沒有可復原的回傳 None）"""
+        self._flush_pending()
+        if not self.undo_stack:
+            return None
+        op = self.undo_stack.pop()
+        self._apply_op(op, "old")
+        self.redo_stack.append(op)
+        return op
+
+    def redo(self):
+        """重做最後一筆復原的修改，回傳該 op"""
+        self._flush_pending()
+        if not self.redo_stack:
+            return None
+        op = self.redo_stack.pop()
+        self._apply_op(op, "new")
+        self.undo_stack.append(op)
+        return op
+
+    def _drop_history(self, sheet_names):
+        """列結構改變（新增/刪除/移動列）後，該表的記錄列號已失效，直接丟棄"""
+        names = set(sheet_names)
+        self.undo_stack = [op for op in self.undo_stack if op.get("sheet") not in names]
+        self.redo_stack = [op for op in self.redo_stack if op.get("sheet") not in names]
+
+    # ================== 資料版本 ==================
+
+    def _bump_version(self, *sheet_names):
+        for name in sheet_names:
+            self._version_counter += 1
+            self._sheet_versions[name] = self._version_counter
+
+    def sheet_version(self, sheet_name):
+        """取得工作表目前的資料版本（衍生快取以此判斷是否過期）"""
+        return self._sheet_versions.get(sheet_name, 0)
+
+    def data_version(self, sheet_name):
+        """(工作表版本, 文字表版本)：畫面同時顯示連結文字時用來判斷是否需要重繪"""
+        return self.sheet_version(sheet_name), self._text_version
+
+    def mark_dirty(self, *sheet_names):
+        """
+        UI 直接改動 DataFrame 結構（新增/刪除/移動/複製列）後呼叫：
+        標記未儲存，並讓這些工作表的衍生快取失效。
+        """
+        self._bump_version(*sheet_names)
+        self._drop_history(sheet_names)
+        self.recompute_derived(*sheet_names)
+        self.dirty = True
+
+    def _text_values(self):
+        """{文字 Key: 文字內容} 的扁平字典（依文字表版本快取，供向量化 map 使用）"""
+        version, flat = self._text_flat
+        if version != self._text_version:
+            flat = {k: info["value"] for k, info in self.text_dict.items()}
+            self._text_flat = (self._text_version, flat)
+        return flat
+
+    def search(self, query):
+        """
+        全域搜尋（母表、子表、連結文字），回傳 SearchCursor。
+        比對以向量化 mask 完成，結果列延遲到顯示時才組出，不再需要筆數上限。
+        """
+        self._flush_pending()
+        cursor = SearchCursor()
+        if not query:
+            return cursor
+
+        def _contains_mask(df):
+            return df.astype(str).apply(
+                lambda col: col.str.contains(query, case=False, na=False, regex=False))
+
+        # 搜尋母表
+        for sheet_name, df in self.master_dfs.items():
+            try:
+                cursor.add_segment(sheet_name, False, df, _contains_mask(df))
+            except Exception:
+                pass
+
+        # 搜尋子表
+        for sub_name, sub_df in self.sub_dfs.items():
+            try:
+                cursor.add_segment(sub_name, True, sub_df, _contains_mask(sub_df))
+            except Exception:
+                pass
+
+        # 搜尋連結文字：先收集命中的 Key，再以 isin 一次找出引用它們的母表行
+        if self.text_dict:
+            q = query.lower()
+            hit_texts = {}
+            for key, info in self.text_dict.items():
+                val = info["value"] if isinstance(info, dict) else str(info)
+                if q in val.lower() or q in str(key).lower():
+                    hit_texts[str(key)] = val
+            if hit_texts:
+                keys = list(hit_texts)
+                for sheet_name, df in self.master_dfs.items():
+                    try:
+                        cursor.add_segment(sheet_name, False, df,
+                                           df.astype(str).isin(keys), text_lookup=hit_texts)
+                    except Exception:
+                        pass
+
+        return cursor
+
+    # ================== 整表檢視（排序 / 篩選） ==================
+
+    def linked_columns(self, sheet_name):
+        """取得工作表中勾選「連結文字表」的欄位（sheet_name 含 "#" 時視為子表）"""
+        return self.schema(sheet_name).linked
+
+    def _display_series(self, sheet_name, df, column):
+        """欄位的顯示字串（連結欄位轉為文字內容），回傳 (Series, 快取版本)"""
+        raw = df[column].astype(str)
+        if column in self.linked_columns(sheet_name) and self.text_dict:
+            return raw.map(self._text_values()).fillna(raw), (self.sheet_version(sheet_name), self._text_version)
+        return raw, (self.sheet_version(sheet_name), 0)
+
+    def sort_order(self, sheet_name, column, descending=False):
+        """
+        取得依 column 排序後的列索引（np.ndarray）
+        每個 (工作表, 欄位) 只在資料版本改變後才重新排序；遞減直接反轉快取結果。
+        非空值全部可轉為數字時依數值排序，否則依字串（不分大小寫）；空值一律排最後。
+        """
+        df = (self.sub_dfs if "#" in sheet_name else self.master_dfs)[sheet_name]
+        key = (sheet_name, column)
+        cached = self._sort_cache.get(key)
+        text_linked = column in self.linked_columns(sheet_name) and bool(self.text_dict)
+        version = (self.sheet_version(sheet_name), self._text_version if text_linked else 0)
+
+        if cached is None or cached[0] != version:
+            values, version = self._display_series(sheet_name, df, column)
+            blank = values.str.strip() == ""
+            nums = pd.to_numeric(values.where(~blank), errors="coerce")
+            if nums.notna().sum() == (~blank).sum():
+                keys = nums
+            else:
+                keys = values.str.lower().where(~blank)
+            ordered = keys.sort_values(kind="stable", na_position="last")
+            cached = (version, ordered.index.to_numpy(), int((~blank).sum()))
+            self._sort_cache[key] = cached
+
+        _, order, n_valid = cached
+        if descending:
+            return np.concatenate([order[:n_valid][::-1], order[n_valid:]])
+        return order
+
+    def _row_blob(self, sheet_name, df):
+        """
+        每列所有欄位（連結欄位為文字內容）以 \x1f 串接並轉小寫的字串清單
+        依工作表版本快取；update_cell 會就地修補單列，不必整表重建
+        """
+        linked = self.linked_columns(sheet_name) if self.text_dict else set()
+        version = (self.sheet_version(sheet_name), self._text_version if linked else 0)
+        cached = self._row_blobs.get(sheet_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        columns = [self._display_series(sheet_name, df, col)[0].tolist() for col in df.columns]
+        blob = ["\x1f".join(values).lower() for values in zip(*columns)]
+        self._row_blobs[sheet_name] = (version, blob)
+        return blob
+
+    def _patch_row_blob(self, sheet_name, old_version, row_idx):
+        """單一儲存格修改後修補整表篩選快取（快取過期時直接丟棄，下次重建）"""
+        cached = self._row_blobs.get(sheet_name)
+        if cached is None:
+            return
+        (version, text_version), blob = cached
+        if version != old_version:
+            self._row_blobs.pop(sheet_name, None)
+            return
+        df = (self.sub_dfs if "#" in sheet_name else self.master_dfs)[sheet_name]
+        row = df.loc[[row_idx]]
+        pos = df.index.get_loc(row_idx)
+        blob[pos] = "\x1f".join(self._display_series(sheet_name, row, col)[0].iat[0]
+                                 for col in df.columns).lower()
+        self._row_blobs[sheet_name] = ((self.sheet_version(sheet_name), text_version), blob)
+
+    def filter_mask(self, sheet_name, query, column=None):
+        """
+        關鍵字篩選（不分大小寫、子字串），回傳以列索引為 index 的布林 Series
+        column 為 None 時比對所有欄位（掃描快取的整列字串）；連結欄位以文字內容比對
+        """
+        df = (self.sub_dfs if "#" in sheet_name else self.master_dfs)[sheet_name]
+        q = query.lower()
+        key = (sheet_name, q, column, self.sheet_version(sheet_name), self._text_version)
+        if self._filter_cache is not None and self._filter_cache[0] == key:
+            return self._filter_cache[1]
+
+        if column is None:
+            blob = self._row_blob(sheet_name, df)
+            hits = np.fromiter((q in line for line in blob), dtype=bool, count=len(blob))
+        else:
+            values, _ = self._display_series(sheet_name, df, column)
+            hits = values.str.lower().str.contains(q, regex=False, na=False).to_numpy()
+
+        mask = pd.Series(hits, index=df.index)
+        self._filter_cache = (key, mask)
+        return mask
+
+    def view_rows(self, sheet_name, sort_column=None, descending=False, query="", filter_column=None):
+        """整表檢視的列索引清單：先套用排序（快取），再套用篩選"""
+        self._flush_pending()
+        df = (self.sub_dfs if "#" in sheet_name else self.master_dfs).get(sheet_name)
+        if df is None:
+            return []
+        if sort_column is not None and sort_column in df.columns:
+            rows = self.sort_order(sheet_name, sort_column, descending)
+        else:
+            rows = df.index.to_numpy()
+        if query:
+            mask = self.filter_mask(sheet_name, query, filter_column)
+            rows = rows[mask.reindex(rows).to_numpy()]
+        return rows.tolist()
+
+    # ================== 快速跳轉索引 (Ctrl+P) ==================
+
+    _GOTO_SCAN_CAP = 2000  # 單次掃描最多收集的命中行數
+
+    def _primary_key_of(self, sheet_name):
+        return self.schema(sheet_name).primary_key
+
+    def _build_goto_segment(self, sheet_name):
+        """建立單一母表的跳轉索引區段：PK 與顯示名稱（Name 欄經文字表解析）"""
+        df = self.master_dfs[sheet_name]
+        pk_col = self._primary_key_of(sheet_name)
+        pks = df[pk_col].astype(str).tolist() if pk_col in df.columns else [""] * len(df)
+        if "Name" in df.columns:
+            raw = df["Name"].astype(str)
+            names = raw.map(self._text_values()).fillna(raw).tolist() if self.text_dict else raw.tolist()
+        else:
+            names = [""] * len(df)
+        return {
+            "version": (self.sheet_version(sheet_name), self._text_version),
+            "pk": pks,
+            "name": names,
+        }
+
+    def _patch_goto_segment(self, sheet_name, old_version, row_idx, col_name, value):
+        """
+        update_cell 的遞增維護：區段若在修改前是最新的，只修補受影響的那一格並更新版本戳，
+        不必重建整張表的索引。
+        """
+        seg = self._goto_segments.get(sheet_name)
+        if seg is None or seg["version"] != (old_version, self._text_version):
+            return
+        df = self.master_dfs[sheet_name]
+        pos = df.index.get_loc(row_idx)
+        if col_name == self._primary_key_of(sheet_name):
+            seg["pk"][pos] = str(value)
+            self._goto_blob = None
+        elif col_name == "Name":
+            text = self._text_values().get(str(value)) if self.text_dict else None
+            seg["name"][pos] = text if text is not None else str(value)
+            self._goto_blob = None
+        seg["version"] = (self.sheet_version(sheet_name), self._text_version)
+
+    def _goto_index(self):
+        """取得（必要時重建）合併後的跳轉索引：所有母表的 "pk\tname" 以換行串成一個字串"""
+        for sheet_name in list(self._goto_segments):
+            if sheet_name not in self.master_dfs:
+                del self._goto_segments[sheet_name]
+                self._goto_blob = None
+
+        for sheet_name in self.master_dfs:
+            seg = self._goto_segments.get(sheet_name)
+            if seg is None or seg["version"] != (self.sheet_version(sheet_name), self._text_version):
+                self._goto_segments[sheet_name] = self._build_goto_segment(sheet_name)
+                self._goto_blob = None
+
+        if self._goto_blob is None:
+            meta = []
+            for sheet_name, seg in self._goto_segments.items():
+                meta.extend((sheet_name, pk, name) for pk, name in zip(seg["pk"], seg["name"]))
+            lines = [f"{pk}\t{name}".lower() for _, pk, name in meta]
+            line_starts = []
+            pos = 0
+            for line in lines:
+                line_starts.append(pos)
+                pos += len(line) + 1
+            self._goto_blob = ("\n".join(lines), line_starts, lines, meta)
+            self._goto_last = None
+        return self._goto_blob
+
+    def prepare_goto_index(self):
+        """預先建立跳轉索引（面板開啟時呼叫，避免第一次按鍵才付出建立成本）"""
+        if self.master_dfs:
+            self._goto_index()
+
+    @staticmethod
+    def _scan_lines(pattern, text, line_starts, line_ids, cap):
+        """
+        以 regex 掃描多行字串，回傳 ([(行號, 命中長度)], 是否完整掃描)。
+        同一行只記第一次命中；收集到 cap 行即提前結束。
+        """
+        hits = []
+        last = -1
+        for m in pattern.finditer(text):
+            line = line_ids[bisect_right(line_starts, m.start()) - 1]
+            if line == last:
+                continue
+            last = line
+            hits.append((line, m.end() - m.start()))
+            if len(hits) >= cap:
+                return hits, False
+        return hits, True
+
+    def goto_search(self, query, limit=50):
+        """
+        模糊比對所有母表的 PK 與顯示名稱，回傳排序後的 [(sheet_name, pk, name)]。
+        排序：PK 完全相同 > PK/名稱前綴 > 子字串 > 依序出現的模糊比對（跨度越短越前）。
+        比對在 C 層的 regex 中完成；若新查詢延伸自上一次的完整命中集合，只在該集合內搜尋。
+        """
+        self._flush_pending()
+        q = query.strip().lower()
+        if not q or not self.master_dfs:
+            return []
+
+        blob, line_starts, lines, meta = self._goto_index()
+
+        # 決定搜尋範圍
+        prev = self._goto_last
+        if prev is not None and q.startswith(prev["query"]):
+            scope = prev["lines"]
+            text = "\n".join(lines[i] for i in scope)
+            starts = []
+            pos = 0
+            for i in scope:
+                starts.append(pos)
+                pos += len(lines[i]) + 1
+            line_ids = scope
+        else:
+            text, starts, line_ids = blob, line_starts, range(len(lines))
+
+        cap = self._GOTO_SCAN_CAP
+        sub_hits, complete = self._scan_lines(re.compile(re.escape(q)), text, starts, line_ids, cap)
+        fuzzy_hits = []
+        if len(sub_hits) < limit:
+            fuzzy = re.compile("[^\n]*?".join(re.escape(c) for c in q))
+            fuzzy_hits, complete = self._scan_lines(fuzzy, text, starts, line_ids, cap)
+        else:
+            complete = False
+
+        # 模糊命中 ⊇ 子字串命中；完整時記下供下一次遞增輸入縮小範圍
+        self._goto_last = {"query": q, "lines": [line for line, _ in fuzzy_hits]} if complete else None
+
+        ranked = []
+        seen = set()
+        for line, _ in sub_hits:
+            seen.add(line)
+            pk, _, name = lines[line].partition("\t")
+            if pk == q:
+                tier = 0
+            elif pk.startswith(q) or name.startswith(q):
+                tier = 1
+            else:
+                tier = 2
+            ranked.append((tier, len(lines[line]), line))
+        for line, span in fuzzy_hits:
+            if line not in seen:
+                ranked.append((3, span * 1000 + len(lines[line]), line))
+
+        ranked.sort()
+        return [meta[line] for _, _, line in ranked[:limit]]
+
     def cleanup(self):
         """清理所有資源"""
         self.close_excel()
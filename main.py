@@ -1,11 +1,20 @@
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import messagebox, filedialog
-from data_manager import DataManager
+from data_manager import DataManager, ExpressionError
 import os
 import sys
 import threading
-from PIL import Image
+import queue
+import json
+import mmap
+import struct
+import zlib
+import bisect
+import re
+import time
+from collections import OrderedDict
+from PIL import Image, ImageTk
 import pandas as pd
 
 ctk.set_appearance_mode("Dark")
@@ -53,6 +62,33 @@ _CELL_FG = "#DCE4EE"
 _CELL_BORDER = "#565B5E"
 _CELL_FOCUS_BORDER = "#3B8ED0"
 
+# 中間項目清單（VirtualList canvas 列，外觀對齊原本的 CTkButton）
+_ITEM_ROW_H = 32
+_ITEM_BG = "gray"
+_ITEM_SELECTED_BG = "#1F6AA5"
+_ITEM_HOVER_BG = "#144870"
+
+# 子表列數超過此值時改用 VirtualGrid（canvas 繪製 + 單一浮動編輯器），
+# widget 數量不再隨子表列數成長；列數少時保留可自動換行的 widget 列
+_SUB_GRID_THRESHOLD = 50
+_SUB_GRID_ROW_H = 28
+_SUB_LOOKUP_W = 12  # 查表結果欄寬（字元數）
+
+# 項目清單圖示格檢視的圖塊大小（px）
+_GALLERY_TILE_W = 96
+_GALLERY_TILE_H = 112
+
+# 母表編輯區第一次建立時同步建立的欄位數，其餘欄位由排程器分段建立
+_MASTER_FIELD_CHUNK = 40
+
+# 鄰近項目子表預取：選取停留多久後開始、前後各幾個項目、LRU 保留幾筆 (子表, 母表 PK)
+_SUB_PREFETCH_DELAY_MS = 150
+_SUB_PREFETCH_SPAN = 2
+_SUB_PREFETCH_MAX = 24
+
+# 全程式子表列 widget 數量上限（使用中 + 閒置），超過時從最久未使用的子表開始回收
+_ROW_POOL_MAX_WIDGETS = 8000
+
 # 面板色彩
 _PANEL_HEADER_BG = "#333333"   # 區塊標題底色
 _PANEL_HEADER_FG = "#A0C4E8"   # 區塊標題文字色
@@ -131,9 +167,1460 @@ class LightScrollableFrame(tk.Frame):
         self._update_scroll_region()
 
 
+class SliceScheduler:
+    """
+    協作式時間片排程器 — 以 after() 驅動，全部在主執行緒執行。
+    job 是 generator：每個 yield 是一個可中斷點，單一時間片最多執行 budget_ms 毫秒
+    （預設 12ms，留給 Tk 重繪的空間以維持 60fps），剩下的工作排到下一片，期間輸入事件照常處理。
+    yield SliceScheduler.NEXT_FRAME 代表「這一片到此為止」（例如等 Tk 完成幾何計算）。
+    以相同 key 重新 submit 會取消舊 job；取消時會 close generator，其 finally 區塊照常執行。
+    """
+
+    NEXT_FRAME = object()
+
+    def __init__(self, widget, budget_ms=12):
+        self._widget = widget
+        self._budget = budget_ms / 1000.0
+        self._jobs = {}  # {key: (generator, on_slice, on_done)}，依序輪流執行
+        self._pending = None  # 已排程的 after id
+
+    def submit(self, key, job, on_slice=None, on_done=None):
+        """
+        提交 job（generator）。on_slice() 在 job 尚未完成的每個時間片結尾呼叫，
+        on_done() 在 job 正常結束時呼叫（被取消則不呼叫）
+        """
+        self.cancel(key)
+        self._jobs[key] = (job, on_slice, on_done)
+        self._schedule()
+
+    def cancel(self, key):
+        entry = self._jobs.pop(key, None)
+        if entry is not None:
+            entry[0].close()
+
+    def cancel_all(self):
+        for key in list(self._jobs):
+            self.cancel(key)
+        if self._pending is not None:
+            try:
+                self._widget.after_cancel(self._pending)
+            except Exception:
+                pass
+            self._pending = None
+
+    def is_running(self, key):
+        return key in self._jobs
+
+    def _schedule(self):
+        # 先排 idle 再排 timer：idle 佇列依序執行，Tk 的幾何計算/重繪會在下一片之前完成
+        if self._pending is None and self._jobs:
+            self._pending = self._widget.after_idle(self._defer)
+
+    def _defer(self):
+        self._pending = self._widget.after(1, self._tick)
+
+    def _tick(self):
+        self._pending = None
+        deadline = time.perf_counter() + self._budget
+        for key in list(self._jobs):
+            entry = self._jobs.get(key)
+            if entry is None:
+                continue  # 已被其他 job 的步驟取消
+            job, on_slice, on_done = entry
+            finished = False
+            try:
+                while next(job) is not self.NEXT_FRAME and time.perf_counter() < deadline:
+                    pass
+            except StopIteration:
+                finished = True
+            except Exception:
+                if self._jobs.get(key) is entry:
+                    del self._jobs[key]
+                self._schedule()
+                raise
+            if self._jobs.get(key) is not entry:
+                continue  # 步驟中被取消或重新提交
+            del self._jobs[key]
+            if finished:
+                if on_done:
+                    on_done()
+            else:
+                self._jobs[key] = entry  # 移到尾端，多個 job 輪流分配時間片
+                if on_slice:
+                    on_slice()
+            if time.perf_counter() >= deadline:
+                break
+        self._schedule()
+
+
+class RowWidgetPool:
+    """
+    全程式共用的子表列 widget 池，限制所有 SheetEditor 的列 widget 總數。
+    Tk widget 無法更換 parent，因此以 (容器, 欄位佈局簽章) 為 key，只在同一容器內重用；
+    widget 總數（使用中 + 閒置）超過上限時，從最久未使用的 key 開始銷毀閒置列，
+    仍不足時請該 key 的擁有者交出隱藏中的列（reclaim）再銷毀。
+    """
+
+    def __init__(self, max_widgets):
+        self.max_widgets = max_widgets
+        self._idle = OrderedDict()  # {key: [row_frame]}，最久未使用的 key 在前
+        self._reclaim = {}  # {key: callable() -> [row_frame]} 擁有者交出隱藏中的列
+        self._total = 0  # 目前存在的列 widget 數（含列內子 widget）
+
+    def touch(self, key, reclaim=None):
+        """標記 key 為最近使用；reclaim 為擁有者提供的回收 callback"""
+        self._idle.setdefault(key, [])
+        self._idle.move_to_end(key)
+        if reclaim is not None:
+            self._reclaim[key] = reclaim
+
+    def acquire(self, key):
+        """取出一個可重用的列（沒有則回傳 None，由呼叫端建立後 register）"""
+        self.touch(key)
+        rows = self._idle[key]
+        return rows.pop(0) if rows else None
+
+    def register(self, key, row_frame):
+        """新建立的列納入計數"""
+        row_frame._pool_cost = 1 + len(row_frame.winfo_children())
+        self._total += row_frame._pool_cost
+        self._evict(key)
+
+    def release(self, key, rows):
+        """歸還已 pack_forget 的列（放在前端，下次優先重用）"""
+        self.touch(key)
+        self._idle[key][:0] = rows
+        self._evict(key)
+
+    def forget(self, key, rows=()):
+        """容器即將銷毀：移除 key 並扣除其閒置列與 rows（使用中）的計數，widget 隨容器一併銷毀"""
+        for row_frame in self._idle.pop(key, []) + list(rows):
+            self._total -= getattr(row_frame, '_pool_cost', 1)
+        self._reclaim.pop(key, None)
+
+    def _evict(self, current_key):
+        if self._total <= self.max_widgets:
+            return
+        for key in list(self._idle):
+            if key == current_key:
+                continue
+            self._destroy_idle(key)
+            if self._total > self.max_widgets and key in self._reclaim:
+                self._idle[key].extend(self._reclaim[key]())
+                self._destroy_idle(key)
+            if self._total <= self.max_widgets:
+                return
+        # 其他 key 都已清空：最後才釋放目前 key 多餘的閒置列
+        self._destroy_idle(current_key)
+
+    def _destroy_idle(self, key):
+        rows = self._idle.get(key)
+        while rows and self._total > self.max_widgets:
+            row_frame = rows.pop()
+            self._total -= getattr(row_frame, '_pool_cost', 1)
+            row_frame.destroy()
+
+
+_ROW_POOL = RowWidgetPool(_ROW_POOL_MAX_WIDGETS)
+
+
+class TextLineMeasurer:
+    """
+    tk.Text（wrap="word"）顯示行數估算 — 不需要幾何計算，widget 尚未 map 也能算出列高。
+    以字型量測過的單一字元寬度建立 glyph 寬度表，依 Tk 的斷行規則（空白處斷行，
+    單字超過整行寬時逐字斷行）模擬；結果再以 (內容 hash, 像素寬, 字型) 快取。
+    """
+
+    _TOKEN_RE = re.compile(r"\S+|\s+")
+
+    def __init__(self, max_entries=4096):
+        self._fonts = {}  # {字型: tkfont.Font}
+        self._glyphs = {}  # {字型: {字元: 像素寬}}
+        self._cache = OrderedDict()  # {(hash, 像素寬, 字型): 行數}，LRU
+        self._max_entries = max_entries
+
+    def _font(self, font):
+        f = self._fonts.get(font)
+        if f is None:
+            import tkinter.font as tkfont
+            f = self._fonts[font] = tkfont.Font(font=font)
+            self._glyphs[font] = {}
+        return f
+
+    def text_width(self, text, font):
+        """字串像素寬（逐字元查表，未量過的字元才呼叫 Tk）"""
+        glyphs = self._glyphs.get(font)
+        if glyphs is None:
+            self._font(font)
+            glyphs = self._glyphs[font]
+        total = 0
+        for ch in text:
+            w = glyphs.get(ch)
+            if w is None:
+                w = glyphs[ch] = self._fonts[font].measure(ch)
+            total += w
+        return total
+
+    def elide(self, text, width_px, font):
+        """單行顯示：超出 width_px 以 … 截斷"""
+        if self.text_width(text, font) <= width_px:
+            return text
+        total = self.text_width("…", font)
+        for i, ch in enumerate(text):
+            total += self.text_width(ch, font)
+            if total > width_px:
+                return text[:i] + "…"
+        return text
+
+    def char_width(self, font):
+        """Tk 以 "0" 的寬度作為 width=N 字元的單位"""
+        return self.text_width("0", font)
+
+    def count_lines(self, text, width_px, font):
+        """text 在 width_px 寬度內的顯示行數"""
+        width_px = max(1, int(width_px))
+        key = (hash(text), width_px, font)
+        lines = self._cache.get(key)
+        if lines is not None:
+            self._cache.move_to_end(key)
+            return lines
+
+        lines = 0
+        for para in text.split("\n"):
+            lines += 1
+            x = 0
+            for token in self._TOKEN_RE.findall(para):
+                w = self.text_width(token, font)
+                if token.isspace() or x + w <= width_px:
+                    x += w  # 行尾空白可以超出邊界，不會造成換行
+                elif w <= width_px:
+                    lines += 1
+                    x = w
+                else:
+                    # 單字比整行還寬：逐字元斷行
+                    for ch in token:
+                        cw = self.text_width(ch, font)
+                        if x + cw > width_px and x > 0:
+                            lines += 1
+                            x = 0
+                        x += cw
+
+        self._cache[key] = lines
+        if len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+        return lines
+
+    def widget_lines(self, tw, content):
+        """
+        tk.Text 的顯示行數：已 map 時用實際寬度，否則用 width 設定（字元數 × "0" 寬）推算
+        """
+        font = str(tw.cget("font"))
+        inset = 2 * (int(tw.cget("padx")) + int(tw.cget("borderwidth")) + int(tw.cget("highlightthickness")))
+        actual = tw.winfo_width()
+        if actual > inset + 1:
+            width_px = actual - inset
+        else:
+            width_px = int(tw.cget("width")) * self.char_width(font)
+        return self.count_lines(content, width_px, font)
+
+
+_LINE_MEASURER = TextLineMeasurer()
+
+
+class EditBuffer:
+    """
+    文字輸入的提交緩衝 — 每次按鍵只記下該儲存格的最新值，停止輸入 delay_ms 後
+    （或 flush 時，例如失去焦點、切換項目、存檔、復原）才呼叫一次 commit。
+    連續按鍵因此合併成一次 DataManager 修改與一筆復原記錄。
+    """
+
+    def __init__(self, widget, delay_ms=400):
+        self._widget = widget
+        self._delay = delay_ms
+        self._pending = OrderedDict()  # {cell key: (commit, 最新值)}，依輸入順序
+        self._timer = None
+
+    def stage(self, key, commit, value):
+        self._pending[key] = (commit, value)
+        self._pending.move_to_end(key)
+        if self._timer is not None:
+            self._widget.after_cancel(self._timer)
+        self._timer = self._widget.after(self._delay, self.flush)
+
+    def flush(self):
+        """立即提交所有緩衝中的輸入"""
+        if self._timer is not None:
+            self._widget.after_cancel(self._timer)
+            self._timer = None
+        pending, self._pending = self._pending, OrderedDict()
+        for commit, value in pending.values():
+            commit(value)
+
+    def __bool__(self):
+        return bool(self._pending)
+
+
+class ThumbnailAtlas:
+    """
+    單一圖示資料夾的磁碟縮圖集 — 已縮好的 RGBA 像素連續存成一個檔案，開啟時以 mmap 映射，
+    之後取縮圖只是切一段記憶體 + Image.frombuffer，不必再解碼 PNG。
+    每筆記錄來源檔的 mtime，來源被修改後該筆自動失效；新縮圖先留在記憶體，save() 時整檔重寫，
+    並丟掉來源 PNG 已刪除或改名的記錄。
+    檔案格式：MAGIC | uint32 索引長度 | JSON 索引 {檔名: [mtime_ns, offset, w, h]} | 像素資料
+    get/put 會在工作執行緒呼叫，以 lock 保護。
+    """
+
+    MAGIC = b"ETA1"
+
+    def __init__(self, path, folder):
+        self.path = path
+        self.folder = folder  # 來源圖示資料夾
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._file = None
+        self._mm = None
+        self._index = {}
+        self._data_start = 0
+        self._new = {}  # {檔名: (mtime_ns, w, h, 像素 bytes)} 本次新產生、尚未寫回
+
+    def get(self, name, mtime):
+        """取得縮圖（PIL Image）；沒有或來源已修改回傳 None"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            new = self._new.get(name)
+            if new is not None and new[0] == mtime:
+                _, w, h, data = new
+            else:
+                entry = self._index.get(name)
+                if entry is None or entry[0] != mtime or self._mm is None:
+                    return None
+                _, offset, w, h = entry
+                start = self._data_start + offset
+                data = self._mm[start:start + w * h * 4]
+        return Image.frombuffer("RGBA", (w, h), data, "raw", "RGBA", 0, 1)
+
+    def put(self, name, mtime, pil_img):
+        rgba = pil_img.convert("RGBA")
+        with self._lock:
+            self._new[name] = (mtime, rgba.width, rgba.height, rgba.tobytes())
+
+    def save(self):
+        """把新縮圖併入磁碟檔（寫暫存檔後替換；替換前先關閉 mmap，Windows 才能覆寫）"""
+        live = {os.path.basename(path) for path, _ in _ICONS.files(self.folder).values()}
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            stale = [name for name in self._index if name not in live]
+            if not self._new and not stale:
+                return
+            entries = {}
+            for name, (mtime, offset, w, h) in self._index.items():
+                if name in live and name not in self._new:
+                    start = self._data_start + offset
+                    entries[name] = (mtime, w, h, self._mm[start:start + w * h * 4])
+            entries.update((name, new) for name, new in self._new.items() if name in live)
+
+            index = {}
+            offset = 0
+            for name, (mtime, w, h, data) in entries.items():
+                index[name] = [mtime, offset, w, h]
+                offset += len(data)
+            header = json.dumps(index, ensure_ascii=False).encode("utf-8")
+
+            self._close()
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(self.MAGIC)
+                    f.write(struct.pack("<I", len(header)))
+                    f.write(header)
+                    for _, _, _, data in entries.values():
+                        f.write(data)
+                os.replace(tmp_path, self.path)
+                self._new = {}
+            except OSError:
+                pass  # 快取寫不進去不影響顯示，下次啟動重新解碼
+
+    def _load(self):
+        self._loaded = True
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # 空檔無法映射
+            f.close()
+            return
+        try:
+            if mm[:4] != self.MAGIC:
+                raise ValueError("bad atlas")
+            (header_len,) = struct.unpack_from("<I", mm, 4)
+            index = json.loads(mm[8:8 + header_len].decode("utf-8"))
+        except Exception:
+            mm.close()
+            f.close()
+            return
+        self._file, self._mm, self._index, self._data_start = f, mm, index, 8 + header_len
+
+    def _close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._index = {}
+        self._loaded = False
+
+
+class ThumbnailCache:
+    """
+    圖示縮圖快取 — 背景執行緒解碼 PNG 並縮圖，主執行緒建立 CTkImage / PhotoImage。
+    已完成的縮圖以 (路徑, mtime) 為 key 放在 LRU，重複顯示同一張圖不必再解碼；
+    縮好的像素另外存進各資料夾的 ThumbnailAtlas，下次啟動直接從磁碟映射，不必解 PNG。
+    工作執行緒只碰 PIL，不碰 Tk；結果放進佇列，由主執行緒以 after() 輪詢取回、
+    建立 Tk 影像後才呼叫 callback（Tk 物件只能在主執行緒建立）。
+    （打包設定排除了 concurrent，因此直接用 threading + queue）
+
+    kind：「ctk」= CTkImage（CTkLabel 用）、「tile」= TILE_SIZE 的 PhotoImage（canvas 圖塊用），
+    同一張縮圖的各種形式在第一次取用時才建立。
+    """
+
+    TILE_SIZE = 64
+
+    _POLL_MS = 15
+    _PRIO_SHOW = 0  # 目前要顯示的圖優先於預取
+    _PRIO_PREFETCH = 1
+
+    def __init__(self, size=128, max_items=256, workers=2, cache_dir="thumb_cache"):
+        self.size = size
+        self._cache_dir = cache_dir
+        self._atlases = {}  # {資料夾: ThumbnailAtlas}
+        self._atlas_lock = threading.Lock()
+        self._max = max_items
+        self._ready = OrderedDict()  # {(path, mtime): {"pil": PIL Image, kind: Tk 影像}}，LRU
+        self._waiting = {}  # {(path, mtime): [(callback, kind)]}，已送去解碼、尚未取回
+        self._requests = queue.PriorityQueue()  # (優先度, -序號, key)：同優先度時新的先做
+        self._results = queue.Queue()  # (key, PIL Image 或 None)
+        self._seq = 0
+        self._workers = workers
+        self._threads = []
+        self._widget = None
+        self._poll_id = None
+
+    def attach(self, widget):
+        """指定負責 after() 輪詢的 widget（App 啟動時設定）"""
+        self._widget = widget
+
+    def peek(self, key, kind="ctk"):
+        """已在快取中的縮圖（不觸發解碼）；沒有回傳 None"""
+        entry = self._ready.get(key)
+        if entry is None:
+            return None
+        self._ready.move_to_end(key)
+        return self._image(entry, kind)
+
+    def request(self, key, callback, kind="ctk"):
+        """
+        取得 key 的縮圖：已在快取時立即呼叫 callback(影像) 並回傳 True；
+        否則送去背景解碼，完成後在主執行緒呼叫 callback(影像 或 None)，回傳 False。
+        同一個 callback 對同一張圖只會登記一次。
+        """
+        img = self.peek(key, kind)
+        if img is not None:
+            callback(img)
+            return True
+        if self._widget is None:
+            # 尚未 attach（沒有可排程的主迴圈）：同步解碼
+            pil_img = self._decode(key)
+            callback(self._image(self._store(key, pil_img), kind) if pil_img is not None else None)
+            return True
+        waiters = self._waiting.get(key)
+        if waiters is None:
+            self._waiting[key] = [(callback, kind)]
+            self._enqueue(key, self._PRIO_SHOW)
+        elif (callback, kind) not in waiters:
+            waiters.append((callback, kind))
+            self._enqueue(key, self._PRIO_SHOW)  # 預取中的圖提升為優先
+        return False
+
+    def prefetch(self, keys):
+        """背景預先解碼（不需要 callback），已快取或已在佇列中的略過"""
+        if self._widget is None:
+            return
+        for key in keys:
+            if key is None or key in self._ready or key in self._waiting:
+                continue
+            self._waiting[key] = []
+            self._enqueue(key, self._PRIO_PREFETCH)
+
+    def clear(self):
+        self._ready.clear()
+
+    def save(self):
+        """把本次新產生的縮圖寫回各資料夾的磁碟縮圖集（關閉程式時呼叫）"""
+        with self._atlas_lock:
+            atlases = list(self._atlases.values())
+        for atlas in atlases:
+            atlas.save()
+
+    # ── 內部 ──
+
+    def _enqueue(self, key, prio):
+        self._seq += 1
+        self._requests.put((prio, -self._seq, key))
+        if len(self._threads) < self._workers:
+            t = threading.Thread(target=self._work, daemon=True)
+            t.start()
+            self._threads.append(t)
+        if self._poll_id is None:
+            self._poll_id = self._widget.after(self._POLL_MS, self._poll)
+
+    def _atlas(self, folder):
+        with self._atlas_lock:
+            atlas = self._atlases.get(folder)
+            if atlas is None:
+                folder_id = zlib.crc32(os.path.normcase(os.path.abspath(folder)).encode("utf-8"))
+                atlas = ThumbnailAtlas(os.path.join(self._cache_dir, f"{folder_id:08x}_{self.size}.atlas"), folder)
+                self._atlases[folder] = atlas
+            return atlas
+
+    def _decode(self, key):
+        """工作執行緒：先查磁碟縮圖集，沒有才解碼 + 縮圖（只用 PIL）"""
+        path, mtime = key
+        folder, name = os.path.split(path)
+        atlas = self._atlas(folder)
+        pil_img = atlas.get(name, mtime)
+        if pil_img is not None:
+            return pil_img
+        try:
+            with Image.open(path) as src:
+                src.thumbnail((self.size, self.size))
+                pil_img = src.copy()
+        except Exception:
+            return None
+        atlas.put(name, mtime, pil_img)
+        return pil_img
+
+    def _work(self):
+        while True:
+            _, _, key = self._requests.get()
+            self._results.put((key, self._decode(key)))
+
+    def _store(self, key, pil_img):
+        entry = {"pil": pil_img}
+        self._ready[key] = entry
+        self._ready.move_to_end(key)
+        while len(self._ready) > self._max:
+            self._ready.popitem(last=False)
+        return entry
+
+    def _image(self, entry, kind):
+        img = entry.get(kind)
+        if img is None:
+            pil_img = entry["pil"]
+            if kind == "tile":
+                tile = pil_img.copy()
+                tile.thumbnail((self.TILE_SIZE, self.TILE_SIZE))
+                img = ImageTk.PhotoImage(tile)
+            else:
+                img = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=pil_img.size)
+            entry[kind] = img
+        return img
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                key, pil_img = self._results.get_nowait()
+            except queue.Empty:
+                break
+            waiters = self._waiting.pop(key, None)
+            if waiters is None:
+                continue  # 重複解碼（預取後又被提升優先度），第一份結果已處理
+            entry = self._ready.get(key)
+            if entry is None and pil_img is not None:
+                entry = self._store(key, pil_img)
+            for callback, kind in waiters:
+                callback(self._image(entry, kind) if entry is not None else None)
+        if self._waiting:
+            self._poll_id = self._widget.after(self._POLL_MS, self._poll)
+
+
+_THUMBS = ThumbnailCache()
+
+
+class IconIndex:
+    """
+    圖示資料夾索引 — 每個資料夾以 os.scandir 掃描一次，建立 {檔名主體: (路徑, mtime_ns)}，
+    之後查詢都是 dict 查找，不必每次 os.path.exists。檔名主體以 os.path.normcase 正規化，
+    與 Windows 檔案系統一樣不分大小寫。
+    資料夾本身的 mtime 改變（新增 / 刪除 / 改名檔案）才重新掃描；同一資料夾 _RECHECK_S 秒內最多 stat 一次。
+    原地覆寫檔案不會改變資料夾 mtime，所以 lookup 命中時再 stat 該檔取得最新 mtime。
+    """
+
+    _RECHECK_S = 2.0
+
+    def __init__(self):
+        self._dirs = {}  # {資料夾: [資料夾 mtime_ns, 上次檢查時間, {檔名主體: (路徑, mtime_ns)}]}
+
+    def files(self, folder):
+        """資料夾內的 PNG：{正規化檔名主體: (路徑, 掃描時的 mtime_ns)}"""
+        now = time.monotonic()
+        entry = self._dirs.get(folder)
+        if entry is not None and now - entry[1] < self._RECHECK_S:
+            return entry[2]
+        try:
+            dir_mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            self._dirs[folder] = [None, now, {}]
+            return {}
+        if entry is not None and entry[0] == dir_mtime:
+            entry[1] = now
+            return entry[2]
+
+        files = {}
+        try:
+            with os.scandir(folder) as it:
+                for e in it:
+                    name = e.name
+                    if name[-4:].lower() == ".png" and e.is_file():
+                        files[os.path.normcase(name[:-4])] = (e.path, e.stat().st_mtime_ns)
+        except OSError:
+            pass
+        self._dirs[folder] = [dir_mtime, now, files]
+        return files
+
+    def lookup(self, base, cls_val, pk):
+        """圖示的 (路徑, mtime_ns)：先找 {base}/{分類}/{pk}.png，再找 {base}/{pk}.png；都沒有回傳 None"""
+        pk = os.path.normcase(str(pk))
+        hit = self.files(os.path.join(base, str(cls_val))).get(pk)
+        if hit is None:
+            hit = self.files(base).get(pk)
+            if hit is None:
+                return None
+        # 只 stat 命中的檔案：覆寫後的新 mtime 讓縮圖快取與縮圖集失效
+        try:
+            return hit[0], os.stat(hit[0]).st_mtime_ns
+        except OSError:
+            return None
+
+    def report(self, base, pairs):
+        """
+        pairs: [(pk, 分類)]。回傳 (缺少圖示的 [(pk, 分類)], 沒有任何 PK 使用的圖示路徑 [str])
+        孤兒圖示 = 資料夾（含各分類子資料夾）內所有 PNG 與已對應路徑的差集
+        """
+        missing = []
+        used = set()
+        for pk, cls_val in pairs:
+            hit = self.lookup(base, cls_val, pk)
+            if hit is None:
+                missing.append((pk, cls_val))
+            else:
+                used.add(hit[0])
+        available = {path for path, _ in self.files(base).values()}
+        for cls_val in {cls_val for _, cls_val in pairs}:
+            available.update(path for path, _ in self.files(os.path.join(base, str(cls_val))).values())
+        return missing, sorted(available - used)
+
+    def clear(self):
+        self._dirs.clear()
+
+
+_ICONS = IconIndex()
+
+
+class VirtualList(tk.Frame):
+    """
+    虛擬化清單 — 只為可視範圍建立固定數量的 canvas 列（slot），捲動時重新填值。
+    不論資料有幾筆，canvas item 數量只與視窗高度成正比。
+
+    make_slot(canvas, tag) -> slot：以 tag 建立一列所需的 canvas items，回傳任意物件（通常是 item id dict）
+    fill_slot(slot, index, y, width)：把第 index 筆資料畫到 slot（y 為該列頂端的 canvas 座標）
+    """
+
+    def __init__(self, parent, row_height, make_slot, fill_slot, bg=_BG):
+        import tkinter.ttk as ttk
+        super().__init__(parent, bg=bg)
+        self.row_height = row_height
+        self._make_slot = make_slot
+        self._fill_slot = fill_slot
+        self._count = 0
+        self._slots = []  # [(tag, slot)]
+        self._last_render = None  # (first, count, width, n_visible) — 相同則跳過重繪
+
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, bd=0,
+                                yscrollincrement=row_height)
+        self._scrollbar = ttk.Scrollbar(self, orient="vertical",
+                                        style="Dark.Vertical.TScrollbar",
+                                        command=self.canvas.yview)
+        self._scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.bind("<Configure>", self._on_canvas_cfg)
+
+        # 供 App 層級滾輪路由識別
+        self.canvas._is_light_scrollable = True
+
+    def __len__(self):
+        return self._count
+
+    def set_count(self, count, keep_position=False):
+        """設定資料筆數並重繪（keep_position=False 時捲回頂端）"""
+        self._count = count
+        self._update_scroll_region()
+        if not keep_position:
+            self.canvas.yview_moveto(0)
+        self.refresh()
+
+    def refresh(self):
+        """強制重新填入可視範圍的所有 slot（資料或高亮狀態改變時呼叫）"""
+        self._last_render = None
+        self._render()
+
+    def index_at(self, event_y, event_x=0):
+        """將事件 y 座標換算為資料序號；落在資料範圍外回傳 None（event_x 供多欄子類別使用）"""
+        i = int(self.canvas.canvasy(event_y) // self.row_height)
+        return i if 0 <= i < self._count else None
+
+    def bind_row(self, sequence, callback):
+        """綁定列事件：callback(index, event)，點到空白處不觸發"""
+        def _handler(event):
+            i = self.index_at(event.y)
+            if i is not None:
+                return callback(i, event)
+        self.canvas.bind(sequence, _handler, add="+")
+
+    def see(self, index):
+        """捲動使第 index 列進入可視範圍"""
+        if not (0 <= index < self._row_count()):
+            return
+        view_h = max(1, self.canvas.winfo_height())
+        total_h = max(self._row_count() * self.row_height, view_h)
+        top = self.canvas.canvasy(0)
+        y = index * self.row_height
+        if y < top:
+            self.canvas.yview_moveto(y / total_h)
+        elif y + self.row_height > top + view_h:
+            self.canvas.yview_moveto((y + self.row_height - view_h) / total_h)
+
+    def _row_count(self):
+        """畫面上的列數（子類別一列可放多筆時覆寫）"""
+        return self._count
+
+    def _update_scroll_region(self):
+        width = self.canvas.winfo_width()
+        height = max(self._row_count() * self.row_height, self.canvas.winfo_height())
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+    def _on_canvas_cfg(self, _event=None):
+        self._update_scroll_region()
+        self._render()
+
+    def _on_yscroll(self, first, last):
+        self._scrollbar.set(first, last)
+        self._render()
+
+    def _render(self):
+        rh = self.row_height
+        width = self.canvas.winfo_width()
+        first = max(0, int(self.canvas.canvasy(0) // rh))
+        n_visible = self.canvas.winfo_height() // rh + 2
+
+        key = (first, self._count, width, n_visible)
+        if key == self._last_render:
+            return
+        self._last_render = key
+
+        while len(self._slots) < n_visible:
+            tag = f"vslot{len(self._slots)}"
+            self._slots.append((tag, self._make_slot(self.canvas, tag)))
+
+        for k, (tag, slot) in enumerate(self._slots):
+            i = first + k
+            if k < n_visible and i < self._count:
+                self._fill_slot(slot, i, i * rh, width)
+                self.canvas.itemconfigure(tag, state="normal")
+            else:
+                self.canvas.itemconfigure(tag, state="hidden")
+
+
+class VirtualTiles(VirtualList):
+    """
+    虛擬化圖塊格 — VirtualList 的多欄版本：每一列依寬度排入數個 tile_width 寬的圖塊，
+    同樣只為可視範圍建立 slot，捲動時重新填值（數千個項目也不會每項一個 widget）。
+
+    fill_slot(slot, index, x, y, width, height)：把第 index 筆資料畫到 (x, y) 起的圖塊
+    """
+
+    def __init__(self, parent, tile_width, tile_height, make_slot, fill_slot, bg=_BG):
+        self.tile_width = tile_width
+        self._cols = 1
+        super().__init__(parent, tile_height, make_slot, fill_slot, bg=bg)
+
+    def index_at(self, event_y, event_x=0):
+        row = int(self.canvas.canvasy(event_y) // self.row_height)
+        col = int(self.canvas.canvasx(event_x) // self.tile_width)
+        if row < 0 or col >= self._cols:
+            return None
+        i = row * self._cols + col
+        return i if i < self._count else None
+
+    def bind_row(self, sequence, callback):
+        """綁定圖塊事件：callback(index, event)，點到空白處不觸發"""
+        def _handler(event):
+            i = self.index_at(event.y, event.x)
+            if i is not None:
+                return callback(i, event)
+        self.canvas.bind(sequence, _handler, add="+")
+
+    def see(self, index):
+        """捲動使第 index 筆所在的圖塊列進入可視範圍"""
+        if 0 <= index < self._count:
+            super().see(index // self._cols)
+
+    def _row_count(self):
+        return -(-self._count // self._cols)
+
+    def _update_scroll_region(self):
+        width = self.canvas.winfo_width()
+        self._cols = max(1, width // self.tile_width)
+        height = max(self._row_count() * self.row_height, self.canvas.winfo_height())
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+    def _render(self):
+        rh = self.row_height
+        width = self.canvas.winfo_width()
+        first_row = max(0, int(self.canvas.canvasy(0) // rh))
+        n_visible = (self.canvas.winfo_height() // rh + 2) * self._cols
+
+        key = (first_row, self._count, width, n_visible)
+        if key == self._last_render:
+            return
+        self._last_render = key
+
+        while len(self._slots) < n_visible:
+            tag = f"vtile{len(self._slots)}"
+            self._slots.append((tag, self._make_slot(self.canvas, tag)))
+
+        first = first_row * self._cols
+        for k, (tag, slot) in enumerate(self._slots):
+            i = first + k
+            if k < n_visible and i < self._count:
+                row, col = divmod(i, self._cols)
+                self._fill_slot(slot, i, col * self.tile_width, row * rh, self.tile_width, rh)
+                self.canvas.itemconfigure(tag, state="normal")
+            else:
+                self.canvas.itemconfigure(tag, state="hidden")
+
+
+class VirtualGrid(tk.Frame):
+    """
+    虛擬化表格 — canvas 只繪製可視範圍內的儲存格，編輯時以單一浮動 tk.Text 覆蓋在該格上。
+    不論資料有幾列，widget 數量固定（2 個 canvas、2 條捲軸、1 個編輯器）。
+
+    columns: [{"title", "width"(px), "kind", "options"}]，kind 可為
+        "text"（點擊開啟浮動編輯器）、"bool"（點擊切換）、"enum"（點擊彈出 options 選單）、
+        "readonly"（唯讀）、"action"（點擊觸發 on_action）
+    fetch_rows(start, end) -> [[cell 值, ...], ...]：只以可視範圍呼叫，回傳完整字串（繪製時才截斷）
+    回呼：on_edit(row, col, value)、on_select(row)、on_action(row, col)、
+          on_context(row, col, event)、on_double(row, col)、on_header(col)（點擊標題）
+    """
+
+    _HEADER_H = 30
+    _GRID_LINE = "#3a3a3a"
+    _SELECT_ROW_BG = "#2f4257"
+    _READONLY_FG = "gray"
+    _ACTION_BG = "darkred"
+    _MAX_EDITOR_LINES = 6
+
+    def __init__(self, parent, columns, fetch_rows, row_height=28,
+                 on_edit=None, on_select=None, on_action=None, on_context=None, on_double=None,
+                 on_header=None):
+        import tkinter.ttk as ttk
+        import tkinter.font as tkfont
+        super().__init__(parent, bg=_BG)
+        self.row_height = row_height
+        self._fetch_rows = fetch_rows
+        self._on_edit = on_edit
+        self._on_select = on_select
+        self._on_action = on_action
+        self._on_context = on_context
+        self._on_double = on_double
+        self._on_header = on_header
+
+        self._columns = []
+        self._edges = [0]  # 各欄左緣 x 座標（最後一個為總寬）
+        self._count = 0
+        self._selected_row = None
+        self._rows = {}  # {row: [值...]} 目前可視範圍的資料快取
+        self._rows_range = None  # _rows 對應的 (start, end)
+        self._cells = []  # [(rect_id, text_id)] 可重用的儲存格 item 池
+        self._cells_used = 0
+        self._last_render = None
+
+        font = tkfont.Font(font=_CELL_FONT)
+        self._line_h = font.metrics("linespace")
+
+        # 標題列（只做水平捲動）
+        self.header = tk.Canvas(self, bg=_BG_HEADER, highlightthickness=0, bd=0,
+                                height=self._HEADER_H)
+        self.header.pack(fill="x", side="top")
+
+        body = tk.Frame(self, bg=_BG)
+        body.pack(fill="both", expand=True)
+        self.canvas = tk.Canvas(body, bg=_BG, highlightthickness=0, bd=0,
+                                yscrollincrement=row_height, xscrollincrement=20)
+        v_scrollbar = ttk.Scrollbar(body, orient="vertical",
+                                    style="Dark.Vertical.TScrollbar", command=self.canvas.yview)
+        v_scrollbar.pack(side="right", fill="y")
+
+        def xview_sync(*args):
+            self.canvas.xview(*args)
+            self.header.xview(*args)
+
+        h_scrollbar = ttk.Scrollbar(body, orient="horizontal",
+                                    style="Dark.Horizontal.TScrollbar", command=xview_sync)
+        h_scrollbar.pack(side="bottom", fill="x")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        def on_yscroll(first, last):
+            v_scrollbar.set(first, last)
+            self._render()
+
+        def on_xscroll(first, last):
+            h_scrollbar.set(first, last)
+            self.header.xview_moveto(first)
+            self._render()
+
+        self.canvas.configure(yscrollcommand=on_yscroll, xscrollcommand=on_xscroll)
+        self.canvas.bind("<Configure>", lambda e: (self._update_scroll_region(), self._render()))
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Button-3>", self._on_right_click)
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+        self.header.bind("<Button-1>", self._on_header_click)
+
+        # 供 App 層級滾輪路由識別（與 widget 版子表相同的旗標）
+        self.canvas._is_sub_table_canvas = True
+        self.header._is_sub_table_header_canvas = True
+        self.header._linked_data_canvas = self.canvas
+
+        # 單一浮動編輯器
+        self._editor = tk.Text(self.canvas, height=1, wrap="word",
+                               bg=_CELL_BG, fg=_CELL_FG, insertbackground=_CELL_FG,
+                               selectbackground=_CELL_FOCUS_BORDER, selectforeground="white",
+                               relief="flat", highlightthickness=1,
+                               highlightbackground=_CELL_FOCUS_BORDER, highlightcolor=_CELL_FOCUS_BORDER,
+                               font=_CELL_FONT, padx=4, pady=2, undo=False, maxundo=0)
+        self._editor_win = None
+        self._editing = None  # (row, col, 原始值)
+        self._editor.bind("<Return>", lambda e: self._commit_and_move(1, 0))
+        self._editor.bind("<Shift-Return>", self._insert_newline)
+        self._editor.bind("<Tab>", lambda e: self._commit_and_move(0, 1))
+        self._editor.bind("<Escape>", lambda e: self._end_edit(commit=False))
+        self._editor.bind("<FocusOut>", lambda e: self._end_edit(commit=True))
+        self._editor.bind("<KeyRelease>", lambda e: self._fit_editor_height())
+        self._editor.bind("<Double-Button-1>",
+                          lambda e: self._on_double and self._editing and
+                          self._on_double(self._editing[0], self._editing[1]))
+
+        self.set_columns(columns)
+
+    # ── 公開 API ──
+
+    def set_columns(self, columns):
+        """設定欄位並重繪標題列"""
+        self._end_edit(commit=True)
+        self._columns = list(columns)
+        self._edges = [0]
+        for col in self._columns:
+            self._edges.append(self._edges[-1] + col["width"])
+
+        self.header.delete("all")
+        for c, col in enumerate(self._columns):
+            x0, x1 = self._edges[c], self._edges[c + 1]
+            self.header.create_rectangle(x0, 0, x1, self._HEADER_H, fill=_BG_HEADER,
+                                         outline=self._GRID_LINE, tags=(f"hdr{c}",))
+            self.header.create_text(x0 + 6, self._HEADER_H / 2, anchor="w", fill=_CELL_FG,
+                                    text=self._fit_text(col["title"], col["width"]),
+                                    font=("微軟正黑體", 10, "bold"), tags=(f"hdr{c}",))
+        self.header.configure(scrollregion=(0, 0, self._edges[-1], self._HEADER_H))
+        self._update_scroll_region()
+        self.refresh()
+
+    def set_count(self, count, keep_position=False):
+        """設定資料列數並重繪（keep_position=False 時捲回左上）"""
+        self._end_edit(commit=True)
+        self._count = count
+        if self._selected_row is not None and self._selected_row >= count:
+            self._selected_row = None
+        self._update_scroll_region()
+        if not keep_position:
+            self.canvas.yview_moveto(0)
+            self.canvas.xview_moveto(0)
+        self.refresh()
+
+    def refresh(self):
+        """資料改變時呼叫：清除可視範圍快取並重繪"""
+        self._rows = {}
+        self._rows_range = None
+        self._last_render = None
+        self._render()
+
+    def select_row(self, row, see=True):
+        """設定選中列（None 取消選取）"""
+        self._selected_row = row if row is not None and 0 <= row < self._count else None
+        if see and self._selected_row is not None:
+            self.see(self._selected_row)
+        self._last_render = None
+        self._render()
+
+    def see(self, row):
+        view_h = max(1, self.canvas.winfo_height())
+        total_h = max(self._count * self.row_height, view_h)
+        top = self.canvas.canvasy(0)
+        y = row * self.row_height
+        if y < top:
+            self.canvas.yview_moveto(y / total_h)
+        elif y + self.row_height > top + view_h:
+            self.canvas.yview_moveto((y + self.row_height - view_h) / total_h)
+
+    def cell_value(self, row, col):
+        """取得儲存格完整值（必要時向 fetch_rows 取值）"""
+        values = self._rows.get(row)
+        if values is None:
+            fetched = self._fetch_rows(row, row + 1)
+            if not fetched:
+                return ""
+            values = fetched[0]
+        return values[col] if col < len(values) else ""
+
+    # ── 繪製 ──
+
+    def _update_scroll_region(self):
+        width = max(self._edges[-1], self.canvas.winfo_width())
+        height = max(self._count * self.row_height, self.canvas.winfo_height())
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+    def _fit_text(self, text, px):
+        """單行顯示：只取第一行，超出欄寬以 … 截斷（字寬查 _LINE_MEASURER 的 glyph 表）"""
+        s = str(text)
+        nl = s.find("\n")
+        if nl >= 0:
+            s = s[:nl] + " …"
+        return _LINE_MEASURER.elide(s, px - 12, _CELL_FONT)
+
+    @staticmethod
+    def _is_true(value):
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ("true", "1", "yes")
+
+    def _render(self):
+        rh = self.row_height
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        view_w = self.canvas.winfo_width()
+        view_h = self.canvas.winfo_height()
+
+        r0 = max(0, int(y0 // rh))
+        r1 = min(self._count, int((y0 + view_h) // rh) + 1)
+        c0 = max(0, bisect.bisect_right(self._edges, x0) - 1)
+        c1 = min(len(self._columns), bisect.bisect_left(self._edges, x0 + view_w))
+
+        key = (r0, r1, c0, c1, self._count, self._selected_row)
+        if key == self._last_render:
+            return
+        self._last_render = key
+
+        # 只向資料來源要可視範圍的列
+        if self._rows_range != (r0, r1):
+            fetched = self._fetch_rows(r0, r1) if r1 > r0 else []
+            self._rows = {r0 + k: values for k, values in enumerate(fetched)}
+            self._rows_range = (r0, r1)
+
+        canvas = self.canvas
+        k = 0
+        for r in range(r0, r1):
+            values = self._rows.get(r)
+            if values is None:
+                continue
+            top, bottom = r * rh, (r + 1) * rh
+            if r == self._selected_row:
+                row_bg = self._SELECT_ROW_BG
+            else:
+                row_bg = _ROW_EVEN if r % 2 == 0 else _ROW_ODD
+            for c in range(c0, c1):
+                col = self._columns[c]
+                kind = col.get("kind", "text")
+                value = values[c] if c < len(values) else ""
+                left, right = self._edges[c], self._edges[c + 1]
+
+                if k == len(self._cells):
+                    self._cells.append((
+                        canvas.create_rectangle(0, 0, 0, 0, outline=self._GRID_LINE),
+                        canvas.create_text(0, 0, anchor="w", font=_CELL_FONT),
+                    ))
+                rect_id, text_id = self._cells[k]
+                k += 1
+
+                fill, fg, anchor, tx = row_bg, _CELL_FG, "w", left + 6
+                if kind == "bool":
+                    text = "☑" if self._is_true(value) else "☐"
+                    anchor, tx = "center", (left + right) / 2
+                elif kind == "action":
+                    fill, fg = self._ACTION_BG, "white"
+                    text = str(value)
+                    anchor, tx = "center", (left + right) / 2
+                else:
+                    text = self._fit_text(value, right - left)
+                    if kind == "readonly":
+                        fg = self._READONLY_FG
+
+                canvas.coords(rect_id, left, top, right, bottom)
+                canvas.itemconfigure(rect_id, fill=fill, state="normal")
+                canvas.coords(text_id, tx, top + rh / 2)
+                canvas.itemconfigure(text_id, text=text, fill=fg, anchor=anchor, state="normal")
+
+        for rect_id, text_id in self._cells[k:self._cells_used]:
+            canvas.itemconfigure(rect_id, state="hidden")
+            canvas.itemconfigure(text_id, state="hidden")
+        self._cells_used = k
+
+        if self._editor_win is not None:
+            canvas.tag_raise(self._editor_win)
+
+    # ── 事件 ──
+
+    def _hit(self, event):
+        """事件座標 → (row, col)；落在資料範圍外回傳 (None, None)"""
+        x = self.canvas.canvasx(event.x)
+        y = self.canvas.canvasy(event.y)
+        row = int(y // self.row_height)
+        col = bisect.bisect_right(self._edges, x) - 1
+        if not (0 <= row < self._count) or not (0 <= col < len(self._columns)):
+            return None, None
+        return row, col
+
+    def _on_click(self, event):
+        self._end_edit(commit=True)
+        row, col = self._hit(event)
+        if row is None:
+            return
+        self.select_row(row, see=False)
+        if self._on_select:
+            self._on_select(row)
+
+        kind = self._columns[col].get("kind", "text")
+        if kind == "action":
+            if self._on_action:
+                self._on_action(row, col)
+        elif kind == "bool":
+            if self._on_edit:
+                self._on_edit(row, col, not self._is_true(self.cell_value(row, col)))
+                self.refresh()
+        elif kind == "enum":
+            self._popup_enum(row, col)
+        elif kind == "text":
+            self._begin_edit(row, col)
+
+    def _on_right_click(self, event):
+        self._end_edit(commit=True)
+        row, col = self._hit(event)
+        if row is None:
+            return
+        self.select_row(row, see=False)
+        if self._on_select:
+            self._on_select(row)
+        if self._on_context:
+            self._on_context(row, col, event)
+
+    def _on_header_click(self, event):
+        if not self._on_header:
+            return
+        col = bisect.bisect_right(self._edges, self.header.canvasx(event.x)) - 1
+        if 0 <= col < len(self._columns):
+            self._end_edit(commit=True)
+            self._on_header(col)
+
+    def _on_double_click(self, event):
+        row, col = self._hit(event)
+        if row is not None and self._on_double:
+            self._on_double(row, col)
+
+    def _popup_enum(self, row, col):
+        menu = tk.Menu(self, tearoff=0, bg=_CELL_BG, fg=_CELL_FG,
+                       activebackground=_CELL_FOCUS_BORDER, activeforeground="white",
+                       font=_CELL_FONT)
+        for opt in self._columns[col].get("options", []):
+            menu.add_command(label=opt, command=lambda v=opt: self._apply_enum(row, col, v))
+        x = self.canvas.winfo_rootx() + int(self._edges[col] - self.canvas.canvasx(0))
+        y = self.canvas.winfo_rooty() + int((row + 1) * self.row_height - self.canvas.canvasy(0))
+        menu.post(x, y)
+
+    def _apply_enum(self, row, col, value):
+        if self._on_edit:
+            self._on_edit(row, col, value)
+        self.refresh()
+
+    # ── 浮動編輯器 ──
+
+    def _begin_edit(self, row, col):
+        value = str(self.cell_value(row, col))
+        self._editing = (row, col, value)
+        self._editor.delete("1.0", "end")
+        self._editor.insert("1.0", value)
+        self._editor.mark_set("insert", "end-1c")
+        self._editor_win = self.canvas.create_window(
+            self._edges[col], row * self.row_height, window=self._editor, anchor="nw",
+            width=self._edges[col + 1] - self._edges[col], height=self.row_height)
+        self._fit_editor_height()
+        self._editor.focus_set()
+
+    def _fit_editor_height(self):
+        """依內容估算編輯器高度（最多 _MAX_EDITOR_LINES 行），不觸發幾何計算"""
+        if self._editing is None or self._editor_win is None:
+            return
+        _, col, _ = self._editing
+        content = self._editor.get("1.0", "end-1c")
+        usable = max(1, self._edges[col + 1] - self._edges[col] - 12)
+        lines = min(self._MAX_EDITOR_LINES, _LINE_MEASURER.count_lines(content, usable, _CELL_FONT))
+        height = max(self.row_height, lines * self._line_h + 8)
+        self.canvas.itemconfigure(self._editor_win, height=height)
+
+    def _insert_newline(self, _event=None):
+        self._editor.insert("insert", "\n")
+        self._fit_editor_height()
+        return "break"
+
+    def _end_edit(self, commit=True):
+        if self._editing is None:
+            return
+        row, col, original = self._editing
+        self._editing = None
+        new_value = self._editor.get("1.0", "end-1c")
+        if self._editor_win is not None:
+            self.canvas.delete(self._editor_win)
+            self._editor_win = None
+        if commit and new_value != original and self._on_edit:
+            self._on_edit(row, col, new_value)
+        self.refresh()
+
+    def _commit_and_move(self, d_row, d_col):
+        if self._editing is None:
+            return "break"
+        row, col, _ = self._editing
+        self._end_edit(commit=True)
+        # 找到下一個可編輯的文字欄
+        if d_col:
+            col += d_col
+            while col < len(self._columns) and self._columns[col].get("kind", "text") != "text":
+                col += d_col
+            if col >= len(self._columns):
+                return "break"
+        row += d_row
+        if 0 <= row < self._count:
+            self.select_row(row)
+            if self._on_select:
+                self._on_select(row)
+            self._begin_edit(row, col)
+        return "break"
+
+
+class SheetTableView(tk.Frame):
+    """
+    整表檢視 — 以 VirtualGrid 顯示整張母表或子表（不依母表 PK 篩選）。
+    點擊標題排序（遞增 → 遞減 → 原順序），排序結果由 DataManager 依欄位快取；
+    可依關鍵字篩選（全部欄位或指定欄位）。所有編輯都經由 DataManager。
+    """
+
+    _ALL_COLUMNS = "全部欄位"
+    _FILTER_DELAY_MS = 250
+
+    def __init__(self, parent, master_sheet, manager, on_open_row=None):
+        super().__init__(parent, bg=_BG)
+        self.master_sheet = master_sheet
+        self.manager = manager
+        self._on_open_row = on_open_row  # on_open_row(sheet_name, row_idx)：雙擊列號回到編輯器
+        self.sheet_name = None
+        self._headers = []
+        self._linked = set()
+        self._rows = []  # 目前顯示順序的列索引
+        self._sort = None  # (欄位名, 是否遞減)
+        self._filter_job = None
+        self._data_version = None  # 載入 _rows 時的工作表版本
+
+        bar = tk.Frame(self, bg=_PANEL_HEADER_BG)
+        bar.pack(fill="x")
+        tk.Label(bar, text="工作表", bg=_PANEL_HEADER_BG, fg=_PANEL_HEADER_FG,
+                 font=_CELL_FONT).pack(side="left", padx=(8, 4), pady=4)
+        self._sheet_var = ctk.StringVar()
+        self._sheet_menu = ctk.CTkOptionMenu(bar, values=[master_sheet], variable=self._sheet_var,
+                                             width=220, height=26, command=self.show_sheet)
+        self._sheet_menu.pack(side="left", padx=4)
+
+        tk.Label(bar, text="篩選", bg=_PANEL_HEADER_BG, fg=_PANEL_HEADER_FG,
+                 font=_CELL_FONT).pack(side="left", padx=(16, 4))
+        self._filter_col_var = ctk.StringVar(value=self._ALL_COLUMNS)
+        self._filter_col_menu = ctk.CTkOptionMenu(bar, values=[self._ALL_COLUMNS],
+                                                  variable=self._filter_col_var, width=150, height=26,
+                                                  command=lambda _v: self._apply_view())
+        self._filter_col_menu.pack(side="left", padx=4)
+        self._query_var = tk.StringVar()
+        entry = tk.Entry(bar, textvariable=self._query_var, width=28, bg=_CELL_BG, fg=_CELL_FG,
+                         insertbackground=_CELL_FG, relief="flat", font=_CELL_FONT,
+                         highlightthickness=1, highlightbackground=_CELL_BORDER,
+                         highlightcolor=_CELL_FOCUS_BORDER)
+        entry.pack(side="left", padx=4, ipady=2)
+        entry.bind("<KeyRelease>", self._schedule_filter)
+        entry.bind("<Return>", lambda e: self._apply_view())
+
+        self._count_label = tk.Label(bar, text="", bg=_PANEL_HEADER_BG, fg="gray", font=_CELL_FONT)
+        self._count_label.pack(side="right", padx=8)
+
+        self.grid_view = VirtualGrid(self, [], fetch_rows=self._fetch_rows,
+                                     row_height=_SUB_GRID_ROW_H, on_edit=self._on_edit,
+                                     on_double=self._on_double, on_header=self._on_header)
+        self.grid_view.pack(fill="both", expand=True)
+
+        self.refresh_sheets()
+
+    # ── 公開 API ──
+
+    def refresh_sheets(self):
+        """重新列出母表及其子表（子表可能被新增或移除）"""
+        prefix = f"{self.master_sheet}#"
+        names = [self.master_sheet] + [n for n in self.manager.sub_dfs if n.startswith(prefix)]
+        self._sheet_menu.configure(values=names)
+        if self.sheet_name not in names:
+            self.show_sheet(names[0])
+
+    def show_sheet(self, sheet_name):
+        """切換顯示的工作表（重設排序與篩選欄位）"""
+        self._sheet_var.set(sheet_name)
+        self.sheet_name = sheet_name
+        df = self._df()
+        self._headers = list(df.columns)
+        self._linked = self.manager.linked_columns(sheet_name)
+        self._sort = None
+        self._filter_col_var.set(self._ALL_COLUMNS)
+        self._filter_col_menu.configure(values=[self._ALL_COLUMNS] + self._headers)
+        self.grid_view.set_columns(self._build_columns())
+        self._apply_view()
+
+    def refresh(self):
+        """重新顯示時呼叫：資料在別處被改動過才重新套用排序/篩選，否則只重繪可視範圍"""
+        self.refresh_sheets()
+        if self.manager.sheet_version(self.sheet_name) != self._data_version:
+            self._apply_view(keep_position=True)
+        else:
+            self.grid_view.refresh()
+
+    # ── 內部 ──
+
+    def _df(self):
+        return (self.manager.sub_dfs if "#" in self.sheet_name else self.manager.master_dfs)[self.sheet_name]
+
+    def _build_columns(self):
+        """依欄位 schema 建立 VirtualGrid 欄位（第 0 欄為列號），排序欄位標上箭頭"""
+        char_w = _LINE_MEASURER.char_width(_CELL_FONT)
+        schema = self.manager.schema(self.sheet_name)
+        columns = [{"title": "#", "width": 7 * char_w + 12, "kind": "readonly"}]
+        for col in self._headers:
+            col_schema = schema.column(col)
+            if col_schema.formula:
+                title = f"{col} ƒ"
+            else:
+                title = f"{col} 🔗" if col_schema.linked else col
+            if self._sort and self._sort[0] == col:
+                title += " ▼" if self._sort[1] else " ▲"
+            column = {"title": title, "width": (22 if col_schema.linked else 15) * char_w + 16,
+                      "kind": "text"}
+            if col_schema.formula:
+                # 衍生欄位由公式計算，不可直接編輯
+                column["kind"] = "readonly"
+                columns.append(column)
+                continue
+            if col_schema.linked:
+                columns.append(column)
+                continue
+            if col_schema.type == "bool":
+                column["kind"] = "bool"
+            elif col_schema.type == "enum":
+                column["kind"] = "enum"
+                column["options"] = list(col_schema.options) or ["None"]
+            columns.append(column)
+        return columns
+
+    def _apply_view(self, keep_position=False):
+        """重新計算顯示列（排序 + 篩選）"""
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+            self._filter_job = None
+        filter_col = self._filter_col_var.get()
+        sort_col, descending = self._sort if self._sort else (None, False)
+        self._rows = self.manager.view_rows(
+            self.sheet_name, sort_col, descending, self._query_var.get().strip(),
+            None if filter_col == self._ALL_COLUMNS else filter_col)
+        self._data_version = self.manager.sheet_version(self.sheet_name)
+        self._count_label.configure(text=f"{len(self._rows)} / {len(self._df())} 列")
+        self.grid_view.set_count(len(self._rows), keep_position=keep_position)
+
+    def _schedule_filter(self, _event=None):
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(self._FILTER_DELAY_MS, self._apply_view)
+
+    def _fetch_rows(self, start, end):
+        """VirtualGrid 資料來源：只取可視範圍，連結欄位轉為文字內容"""
+        row_indices = self._rows[start:end]
+        rows = self.manager.row_values(self.sheet_name, row_indices, self._headers)
+        linked = [i for i, col in enumerate(self._headers) if col in self._linked]
+        for row_idx, values in zip(row_indices, rows):
+            for i in linked:
+                values[i] = str(self.manager.get_text_value(values[i]))
+            values.insert(0, str(row_idx + 1))
+        return rows
+
+    def _on_edit(self, row, col, value):
+        col_name = self._headers[col - 1]
+        row_idx = self._rows[row]
+        is_sub = "#" in self.sheet_name
+        if col_name in self._linked and is_sub:
+            key = self.manager.row_values(self.sheet_name, [row_idx], [col_name])[0][0]
+            self.manager.update_linked_text(key, value)
+        else:
+            # 母表連結欄位由 update_cell 轉為修改文字表
+            self.manager.update_cell(is_sub, self.sheet_name, row_idx, col_name, value)
+        # 自己的編輯不改變列的順序（與試算表相同，不即時重排）
+        self._data_version = self.manager.sheet_version(self.sheet_name)
+
+    def _on_header(self, col):
+        if col == 0:
+            self._sort = None
+        else:
+            name = self._headers[col - 1]
+            if not self._sort or self._sort[0] != name:
+                self._sort = (name, False)
+            elif not self._sort[1]:
+                self._sort = (name, True)
+            else:
+                self._sort = None
+        self.grid_view.set_columns(self._build_columns())
+        self._apply_view()
+
+    def _on_double(self, row, col):
+        if col == 0 and self._on_open_row:
+            self._on_open_row(self.sheet_name, self._rows[row])
+
+
 class SheetEditor(ctk.CTkFrame):
     """ 單一母表的編輯介面 (包含左中右佈局) """
-    def __init__(self, parent, sheet_name, manager):
+    def __init__(self, parent, sheet_name, manager, deferred=False):
+        """deferred=True 時只建立狀態，UI 由呼叫端逐步執行 build_steps() 建立（閒置預建用）"""
         super().__init__(parent)
         self.sheet_name = sheet_name
         self.manager = manager
@@ -153,24 +1640,50 @@ class SheetEditor(ctk.CTkFrame):
 
         # 批次編輯模式
         self._batch_mode = False
-        self._batch_checks = {}  # {row_idx: BooleanVar}
+        self._batch_checked = set()  # 勾選中的 row_idx
         self._batch_bar = None  # 批次工具列 widget
 
         # 母表UI緩存
         self.cls_buttons = {}  # {分類值: 按鈕widget}
-        self.item_buttons = {}  # {row_idx: 按鈕widget}
+        self._item_indices = []  # 目前清單顯示的 row_idx（依顯示順序）
+        self._item_labels = []  # 與 _item_indices 對應的顯示名稱
+        self._item_pos = {}  # {row_idx: 清單位置}
+        self._item_hover = None  # 滑鼠懸停的清單位置
+        self._item_rows_view = None  # 文字列清單（VirtualList）
+        self._item_gallery = None  # 圖示格清單（VirtualTiles，第一次切換時才建立）
+        self._gallery_refresh_pending = False
         self.master_fields = {}  # {欄位名: Entry/CheckBox等widget}
         self.master_field_vars = {}  # {欄位名: StringVar/BooleanVar}
         self.trace_ids = {}  # {欄位名: trace_id} 用於清理舊的 trace
+        self._master_shown = {}  # {欄位名: 目前 widget 顯示的值}，供差異更新比對
+        self._master_lookups = {}  # {查表欄位: 顯示查表結果的 tk.Label}
+        self._master_field_parent = None
 
         # 子表UI緩存
         self.sub_table_frames = {}  # {tab_name: 容器frame}
         self.sub_table_headers = {}  # {tab_name: 標題frame}
-        self.sub_table_row_pools = {}  # {tab_name: [可重用的row_frame列表]}
-        self.sub_table_active_rows = {}  # {tab_name: [正在使用的row_frame列表]}
+        self.sub_table_active_rows = {}  # {tab_name: [正在使用的row_frame列表]}（閒置列由 _ROW_POOL 管理）
+        self._sub_master_id = None  # 子表目前對應的母表 PK
+        self._sub_tab_rendered = {}  # {tab_name: (master_id, 資料版本)} 該 Tab 最後一次渲染的狀態
+        self._sub_prefetch = OrderedDict()  # {(子表, 母表 PK): (資料版本, 子表列, {Key: 文字})} LRU
+        self._prefetch_timer = None
+
+        # 時間片排程器：大量 widget 建立/調整分段執行，可取消
+        self._scheduler = SliceScheduler(self)
+
+        # 整表檢視（延遲建立）
+        self._table_view = None
+        self.table_mode = False
+
+        if not deferred:
+            for _ in self.build_steps():
+                pass
 
+    def build_steps(self):
+        """分段建立 UI（generator）：每個 yield 之間可讓出主執行緒"""
         self.setup_layout()
-        self.load_classification_list()
+        yield
+        yield from self._classification_steps()
 
     @staticmethod
     def _make_section_header(parent, text, icon=""):
@@ -213,9 +1726,15 @@ class SheetEditor(ctk.CTkFrame):
         self.frame_mid = ctk.CTkFrame(self, width=200)
         self.frame_mid.grid(row=0, column=1, sticky="nsew", padx=(0, 1))
 
-        self._make_section_header(self.frame_mid, "項目清單", icon="\u2630")
-        self.scroll_items = LightScrollableFrame(self.frame_mid)
-        self.scroll_items.pack(fill="both", expand=True, padx=2, pady=2)
+        mid_hdr = self._make_section_header(self.frame_mid, "項目清單", icon="\u2630")
+        if self.cfg.get("use_icon", False):
+            ctk.CTkButton(mid_hdr, text="\u25a6", width=26, height=22, fg_color="#4a4a4a", hover_color="#5a5a5a",
+                          command=self.toggle_gallery).pack(side="right", padx=4)
+        self.item_list = VirtualList(self.frame_mid, _ITEM_ROW_H,
+                                     self._make_item_slot, self._fill_item_slot)
+        self.item_list.pack(fill="both", expand=True, padx=2, pady=2)
+        self._bind_item_view(self.item_list)
+        self._item_rows_view = self.item_list
 
         # 中間操作按鈕
         tk.Frame(self.frame_mid, bg=_SEPARATOR, height=1).pack(fill="x", padx=4)
@@ -256,11 +1775,55 @@ class SheetEditor(ctk.CTkFrame):
                       command=self.copy_sub_item).pack(side="right", padx=1)
 
         # 建立 TabView 用於子表切換
-        self.sub_tables_tabs = ctk.CTkTabview(self.frame_right)
+        self.sub_tables_tabs = ctk.CTkTabview(self.frame_right, command=self._on_sub_tab_changed)
         self.sub_tables_tabs.pack(fill="both", expand=True, padx=5, pady=(2, 5))
 
+    def show_table_view(self, show=True, reload=True):
+        """切換整表檢視 / 一般編輯佈局（reload=False：呼叫端隨後會自行載入項目）"""
+        self._flush_edits()
+        if show == self.table_mode:
+            return
+        self.table_mode = show
+        panels = (self.frame_left, self.frame_mid, self.frame_right)
+        if show:
+            if self._table_view is None:
+                self._table_view = SheetTableView(self, self.sheet_name, self.manager,
+                                                  on_open_row=self._open_row_from_table)
+            else:
+                self._table_view.refresh()
+            for panel in panels:
+                panel.grid_remove()
+            self._table_view.grid(row=0, column=0, columnspan=3, sticky="nsew")
+            return
+
+        self._table_view.grid_remove()
+        for panel in panels:
+            panel.grid()
+        # 整表檢視中可能改過資料：重新載入目前的清單與項目
+        if reload:
+            self.reload_current()
+
+    def reload_current(self):
+        """資料在別處被改動（例如復原）後，重新載入目前顯示的內容"""
+        if self.table_mode:
+            self._table_view.refresh()
+        elif self.current_master_idx is not None and self.current_master_idx in self.df.index:
+            self.load_items_by_group(self.current_cls_val)
+            self.load_editor(self.current_master_idx)
+
+    def _open_row_from_table(self, sheet_name, row_idx):
+        """整表檢視雙擊列號：回到編輯佈局並開啟該列（子表列開啟其母表項目）"""
+        app = self.winfo_toplevel()
+        if hasattr(app, '_jump_to_result'):
+            app._jump_to_result(sheet_name, "#" in sheet_name, row_idx)
+
     def load_classification_list(self):
         """載入分類列表 """
+        for _ in self._classification_steps():
+            pass
+
+    def _classification_steps(self):
+        """載入分類列表（generator，每建立一個按鈕 yield 一次）"""
         groups = self.df[self.cls_key].unique()
         current_groups = set(groups)
         cached_groups = set(self.cls_buttons.keys())
@@ -297,9 +1860,11 @@ class SheetEditor(ctk.CTkFrame):
                     btn._text_label.configure(wraplength=110)
                 btn.bind("<Button-3>", lambda e, val=g: self._show_cls_context_menu(e, val))
                 self.cls_buttons[g] = btn
+                yield
 
     def move_classification(self, direction):
         """移動分類順序 (direction: -1=上, +1=下)"""
+        self._flush_edits()
         if self.current_cls_val is None:
             return
 
@@ -322,7 +1887,7 @@ class SheetEditor(ctk.CTkFrame):
             parts.append(self.df[self.df[self.cls_key] == g])
         self.df = pd.concat(parts, ignore_index=True)
         self.manager.master_dfs[self.sheet_name] = self.df
-        self.manager.dirty = True
+        self.manager.mark_dirty(self.sheet_name)
 
         # 重建分類列表（pack 順序改了必須全部重建）
         for btn in self.cls_buttons.values():
@@ -330,11 +1895,7 @@ class SheetEditor(ctk.CTkFrame):
         self.cls_buttons.clear()
         self.load_classification_list()
 
-        # ignore_index=True 後所有 index 重編，必須清空項目按鈕快取 + 重新定位選中項
-        for btn in self.item_buttons.values():
-            btn.destroy()
-        self.item_buttons.clear()
-
+        # ignore_index=True 後所有 index 重編，必須重新定位選中項
         if self.current_master_pk is not None:
             matches = self.df[self.df[self.pk_key].astype(str) == str(self.current_master_pk)]
             self.current_master_idx = matches.index[0] if not matches.empty else None
@@ -344,6 +1905,7 @@ class SheetEditor(ctk.CTkFrame):
 
     def load_items_by_group(self, group_val):
         """載入項目清單 """
+        self._flush_edits()
         self.current_cls_val = group_val
 
         # 更新左側分類按鈕的高亮狀態（不重建）
@@ -353,60 +1915,198 @@ class SheetEditor(ctk.CTkFrame):
             else:
                 btn.configure(fg_color="transparent")
 
-        # 篩選該分類的資料
-        filter_df = self.df[self.df[self.cls_key] == group_val]
-        current_indices = set(filter_df.index)
-        cached_indices = set(self.item_buttons.keys())
-
-        # 1. 移除已不存在的項目按鈕
-        for idx in (cached_indices - current_indices):
-            if idx in self.item_buttons:
-                self.item_buttons[idx].destroy()
-                del self.item_buttons[idx]
-
-        # 2. 新增或更新項目按鈕
-        for idx, row in filter_df.iterrows():
-            # 取得顯示名稱
-            display_name = f"{row[self.pk_key]}"
-            if 'Name' in row.index and self.manager.text_dict:
-                text_dict_name = self.manager.text_dict.get(row['Name'])
-                if text_dict_name:
-                    display_name = text_dict_name["value"]
-
-            if idx in self.item_buttons:
-                # 已存在：只更新文字和顏色
-                btn = self.item_buttons[idx]
-                btn.configure(text=display_name)
-                if idx == self.current_master_idx:
-                    btn.configure(fg_color=("#3B8ED0", "#1F6AA5"))
-                else:
-                    btn.configure(fg_color="gray")
+        # 該分類的列（分類欄索引）與預先算好的顯示名稱（Name 經文字表解析）
+        if group_val is None:
+            indices = []
+        else:
+            indices = self.manager.rows_with_value(self.sheet_name, self.cls_key, group_val).tolist()
+        names = self.manager.display_names(self.sheet_name)
+        labels = [names[idx] for idx in indices]
+
+        self._set_item_list(indices, labels)
+
+    def _set_item_list(self, indices, labels):
+        """替換中間清單的資料（VirtualList 只重填可視範圍的 slot）"""
+        same_rows = indices == self._item_indices
+        self._item_indices = indices
+        self._item_labels = labels
+        self._item_pos = {idx: pos for pos, idx in enumerate(indices)}
+        self._item_hover = None
+        self.item_list.set_count(len(indices), keep_position=same_rows)
+
+    def _make_item_slot(self, canvas, tag):
+        return {
+            "bg": canvas.create_rectangle(0, 0, 0, 0, width=0, tags=(tag,)),
+            "check": canvas.create_rectangle(0, 0, 0, 0, outline=_CELL_BORDER,
+                                             fill=_CELL_BG, tags=(tag,)),
+            "mark": canvas.create_text(0, 0, text="\u2713", fill="white",
+                                       font=("Segoe UI", 10, "bold"), tags=(tag,)),
+            "text": canvas.create_text(0, 0, anchor="w", fill="white",
+                                       font=_CELL_FONT, tags=(tag,)),
+            "canvas": canvas,  # 清單與圖示格各自的 canvas，不隨 item_list 切換
+            "label": None,  # (名稱, 可用寬度)：沒變就不重新截斷
+        }
+
+    def _fill_item_slot(self, slot, index, y, width):
+        canvas = slot["canvas"]
+        if canvas is not self.item_list.canvas:
+            return  # 隱藏中的檢視：count 可能過期，切換回來時 set_count 會重繪
+        idx = self._item_indices[index]
+        top, bottom = y + 2, y + _ITEM_ROW_H - 2
+        mid = y + _ITEM_ROW_H / 2
+
+        if self._batch_mode:
+            row_bg = _ROW_EVEN if index % 2 == 0 else _ROW_ODD
+            text_x = 30
+            canvas.coords(slot["check"], 8, mid - 7, 22, mid + 7)
+            canvas.itemconfigure(slot["check"], state="normal")
+            canvas.coords(slot["mark"], 15, mid)
+            canvas.itemconfigure(slot["mark"],
+                                 state="normal" if idx in self._batch_checked else "hidden")
+        else:
+            if idx == self.current_master_idx:
+                row_bg = _ITEM_SELECTED_BG
+            elif index == self._item_hover:
+                row_bg = _ITEM_HOVER_BG
             else:
-                # 不存在：創建新按鈕
-                fg_color = ("#3B8ED0", "#1F6AA5") if idx == self.current_master_idx else "gray"
-                btn = ctk.CTkButton(
-                    self.scroll_items.interior,
-                    text=display_name,
-                    anchor="w",
-                    fg_color=fg_color,
-                    command=lambda i=idx: self.load_editor(i)
-                )
-                btn.pack(fill="x", pady=2, padx=2)
-                if hasattr(btn, '_text_label') and btn._text_label:
-                    btn._text_label.configure(wraplength=160)
-                btn.bind("<Button-3>", lambda e, i=idx: self._show_item_context_menu(e, i))
-                self.item_buttons[idx] = btn
+                row_bg = _ITEM_BG
+            text_x = 10
+            canvas.itemconfigure(slot["check"], state="hidden")
+            canvas.itemconfigure(slot["mark"], state="hidden")
+
+        canvas.coords(slot["bg"], 2, top, width - 2, bottom)
+        canvas.itemconfigure(slot["bg"], fill=row_bg)
+        canvas.coords(slot["text"], text_x, mid)
+        label = (self._item_labels[index], width - text_x - 8)
+        if label != slot["label"]:
+            # 名稱過長時截斷，不超出面板
+            canvas.itemconfigure(slot["text"], text=_LINE_MEASURER.elide(str(label[0]), label[1], _CELL_FONT))
+            slot["label"] = label
+
+    def _on_item_click(self, index, _event):
+        idx = self._item_indices[index]
+        if self._batch_mode:
+            # 批次模式：點擊整列切換勾選
+            if idx in self._batch_checked:
+                self._batch_checked.discard(idx)
+            else:
+                self._batch_checked.add(idx)
+            self.item_list.refresh()
+        else:
+            self.load_editor(idx)
+
+    def _on_item_right_click(self, index, event):
+        if not self._batch_mode:
+            self._show_item_context_menu(event, self._item_indices[index])
+
+    def _on_item_motion(self, event):
+        i = self.item_list.index_at(event.y, event.x)
+        if i != self._item_hover:
+            self._item_hover = i
+            if not self._batch_mode:
+                self.item_list.refresh()
+
+    def _on_item_leave(self, _event=None):
+        if self._item_hover is not None:
+            self._item_hover = None
+            if not self._batch_mode:
+                self.item_list.refresh()
+
+    def _clear_item_list(self):
+        self._set_item_list([], [])
+
+    def _bind_item_view(self, view):
+        view.bind_row("<Button-1>", self._on_item_click)
+        view.bind_row("<Button-3>", self._on_item_right_click)
+        view.canvas.bind("<Motion>", self._on_item_motion)
+        view.canvas.bind("<Leave>", self._on_item_leave)
+
+    # ── 圖示格檢視（項目清單的另一種呈現，延遲建立）──
+
+    def toggle_gallery(self):
+        """項目清單在文字列與圖示格之間切換；兩者共用 _item_indices / _item_labels 與點選處理"""
+        if self._item_gallery is None:
+            self._item_gallery = VirtualTiles(self.frame_mid, _GALLERY_TILE_W, _GALLERY_TILE_H,
+                                              self._make_tile_slot, self._fill_tile_slot)
+            self._bind_item_view(self._item_gallery)
+        old = self.item_list
+        new = self._item_rows_view if old is self._item_gallery else self._item_gallery
+        new.pack(fill="both", expand=True, padx=2, pady=2, before=old)
+        old.pack_forget()
+        self.item_list = new
+        self._item_hover = None
+        new.set_count(len(self._item_indices))
+        pos = self._item_pos.get(self.current_master_idx)
+        if pos is not None:
+            new.after_idle(lambda: new.see(pos))
+
+    def _make_tile_slot(self, canvas, tag):
+        return {
+            "bg": canvas.create_rectangle(0, 0, 0, 0, width=0, tags=(tag,)),
+            "image": canvas.create_image(0, 0, anchor="n", tags=(tag,)),
+            "text": canvas.create_text(0, 0, anchor="n", fill="white", justify="center",
+                                       font=("Segoe UI", 9), tags=(tag,)),
+            "photo": None,  # 目前顯示的 PhotoImage（保留參照，避免被回收）
+            "label": None,
+            "canvas": canvas,
+        }
+
+    def _fill_tile_slot(self, slot, index, x, y, width, height):
+        canvas = slot["canvas"]
+        if canvas is not self.item_list.canvas:
+            return
+        idx = self._item_indices[index]
+
+        if self._batch_mode:
+            tile_bg = "#2d8a4e" if idx in self._batch_checked else _ITEM_BG
+        elif idx == self.current_master_idx:
+            tile_bg = _ITEM_SELECTED_BG
+        elif index == self._item_hover:
+            tile_bg = _ITEM_HOVER_BG
+        else:
+            tile_bg = _ROW_ODD
+        canvas.coords(slot["bg"], x + 3, y + 3, x + width - 3, y + height - 3)
+        canvas.itemconfigure(slot["bg"], fill=tile_bg)
+
+        # 縮圖：已在快取就直接畫，否則送去背景解碼，完成後整格重繪一次
+        photo = None
+        key = self._icon_key(self.df.at[idx, self.pk_key], self.current_cls_val) if idx in self.df.index else None
+        if key is not None:
+            photo = _THUMBS.peek(key, "tile")
+            if photo is None:
+                _THUMBS.request(key, self._on_tile_thumb, "tile")
+        if photo is not slot["photo"]:
+            canvas.itemconfigure(slot["image"], image=photo or "")
+            slot["photo"] = photo
+        canvas.coords(slot["image"], x + width / 2, y + 6)
+
+        label = self._item_labels[index]
+        if label != slot["label"]:
+            canvas.itemconfigure(slot["text"], text=label, width=width - 10)
+            slot["label"] = label
+        canvas.coords(slot["text"], x + width / 2, y + ThumbnailCache.TILE_SIZE + 10)
+
+    def _on_tile_thumb(self, _photo):
+        """背景解碼完成：合併成下一次 idle 時的單次重繪"""
+        if self.item_list is self._item_gallery and not self._gallery_refresh_pending:
+            self._gallery_refresh_pending = True
+            self.after_idle(self._refresh_gallery)
+
+    def _refresh_gallery(self):
+        self._gallery_refresh_pending = False
+        if self.item_list is self._item_gallery:
+            self.item_list.refresh()
 
     def load_editor(self, row_idx):
         """載入編輯器 """
+        self._flush_edits()
         self.current_master_idx = row_idx
 
-        # 1. 更新中間清單的高亮（不重建）
-        for idx, btn in self.item_buttons.items():
-            if idx == row_idx:
-                btn.configure(fg_color=("#3B8ED0", "#1F6AA5"))
-            else:
-                btn.configure(fg_color="gray")
+        # 1. 更新中間清單的高亮（只重填可視範圍）
+        pos = self._item_pos.get(row_idx)
+        if pos is not None:
+            self.item_list.see(pos)
+        self.item_list.refresh()
 
         if row_idx not in self.df.index:
             return
@@ -429,6 +2129,7 @@ class SheetEditor(ctk.CTkFrame):
 
     def move_master_item(self, direction):
         """移動項目順序 (direction: -1=上, +1=下)，在同分類內移動"""
+        self._flush_edits()
         if self.current_master_idx is None or self.current_cls_val is None:
             return
 
@@ -453,20 +2154,18 @@ class SheetEditor(ctk.CTkFrame):
         self.df.iloc[idx_a] = row_b
         self.df.iloc[idx_b] = row_a
         self.manager.master_dfs[self.sheet_name] = self.df
-        self.manager.dirty = True
+        self.manager.mark_dirty(self.sheet_name)
 
         # 更新 current_master_idx 為新位置
         self.current_master_idx = idx_b
 
         # 重建項目清單
-        for btn in self.item_buttons.values():
-            btn.destroy()
-        self.item_buttons.clear()
         self.load_items_by_group(self.current_cls_val)
         self.load_editor(self.current_master_idx)
 
     def copy_master_item(self):
         """複製母表項目（含子表資料）"""
+        self._flush_edits()
         if self.current_master_idx is None:
             messagebox.showwarning("提示", "請先選擇要複製的項目")
             return
@@ -495,6 +2194,7 @@ class SheetEditor(ctk.CTkFrame):
         self.manager.master_dfs[self.sheet_name] = self.df
 
         # 複製子表資料
+        touched = [self.sheet_name]
         for sub_key, sub_df in list(self.manager.sub_dfs.items()):
             if not sub_key.startswith(self.sheet_name + "#"):
                 continue
@@ -514,13 +2214,11 @@ class SheetEditor(ctk.CTkFrame):
             copied = matched.copy()
             copied[fk_key] = new_id
             self.manager.sub_dfs[sub_key] = pd.concat([sub_df, copied], ignore_index=True)
+            touched.append(sub_key)
 
-        self.manager.dirty = True
+        self.manager.mark_dirty(*touched)
 
         # 重建項目清單並選中新項目
-        for btn in self.item_buttons.values():
-            btn.destroy()
-        self.item_buttons.clear()
         self.load_items_by_group(self.current_cls_val)
 
         new_idx = self.df[self.df[self.pk_key].astype(str) == str(new_id)].index[0]
@@ -552,81 +2250,147 @@ class SheetEditor(ctk.CTkFrame):
             edit_target_frame = LightScrollableFrame(self.top_container, height=100)
             edit_target_frame.pack(fill="both", expand=True)
 
-        # 建立欄位 UI
-        cols_cfg = self.cfg.get("columns", {})
+        # 建立欄位 UI：前 _MASTER_FIELD_CHUNK 欄立即建立，其餘交給排程器分段建立，
+        # 寬表（100+ 欄）第一次點選不必等全部欄位 widget 建好
+        self._master_field_parent = edit_target_frame.interior
         self.master_fields = {}
         self.master_field_vars = {}
         self.trace_ids = {}
+        self._master_shown = {}
+        self._master_lookups = {}
 
-        for col in self.df.columns:
-            f = tk.Frame(edit_target_frame.interior, bg=_BG)
-            f.pack(fill="x", pady=2)
-
-            ctk.CTkLabel(f, text=col, width=100, anchor="w").pack(side="left")
-
-            col_conf = cols_cfg.get(col, {})
-            col_type = col_conf.get("type", "string")
-            is_linked = col_conf.get("link_to_text", False)
-
-            if is_linked:
-                # Key (唯讀)
-                key_entry = ctk.CTkEntry(f, width=80, text_color="gray")
-                key_entry.configure(state="disabled")
-                key_entry.pack(side="left", padx=(0, 5))
-
-                # Text (可編輯) — 原生 tk.Text（輕量，取代 CTkTextbox）
-                textbox = self._make_master_text_cell(f)
-                textbox.pack(side="left", fill="x", expand=True)
-
-                self.master_fields[col] = (key_entry, textbox)
-                self.master_field_vars[col] = None
+        schema = self.manager.schema(self.sheet_name)
+        columns = list(self.df.columns)
+        for col in columns[:_MASTER_FIELD_CHUNK]:
+            self._build_master_field(col, schema.column(col))
 
-                textbox.bind("<KeyRelease>",
-                             lambda e, c=col, tb=textbox: (self._on_linked_field_change_tb(c, tb), self._resize_text_cell(tb)))
-                self.trace_ids[col] = "bind"
-
-            elif col_type == "bool":
-                var = ctk.BooleanVar()
-                chk = ctk.CTkCheckBox(f, text="", variable=var,
-                                      command=lambda c=col, v=var: self._on_field_change(c, v.get()))
-                chk.pack(side="left")
-
-                self.master_fields[col] = chk
-                self.master_field_vars[col] = var
-
-            elif col_type == "enum":
-                opts = col_conf.get("options", [])
-                menu = ctk.CTkOptionMenu(f, values=opts,
-                                         command=lambda v, c=col: self._on_field_change(c, v))
-                menu.pack(side="left", fill="x", expand=True)
-
-                self.master_fields[col] = menu
+        # 首次載入數據
+        self._update_editor_data(row_data)
 
-            elif col_type in ("int", "float"):
-                var = ctk.StringVar()
-                entry = ctk.CTkEntry(f, textvariable=var)
-                entry.pack(side="left", fill="x", expand=True)
+        if len(columns) > _MASTER_FIELD_CHUNK:
+            self._scheduler.submit("master_fields", self._materialize_fields_job(columns[_MASTER_FIELD_CHUNK:]))
+
+    def _materialize_fields_job(self, columns):
+        """其餘欄位的分段建立 job：每建一欄就填入目前項目的值"""
+        schema = self.manager.schema(self.sheet_name)
+        yield SliceScheduler.NEXT_FRAME
+        for col in columns:
+            self._build_master_field(col, schema.column(col))
+            if self.current_master_idx in self.df.index:
+                self._master_suppress = True
+                try:
+                    tb = self._show_master_field(col, self.df.at[self.current_master_idx, col], schema.column(col))
+                finally:
+                    self._master_suppress = False
+                if tb is not None:
+                    self._resize_text_cell(tb)
+                if col in self._master_lookups:
+                    self._fill_master_lookups()
+            yield
 
-                self.master_fields[col] = entry
-                self.master_field_vars[col] = var
+    def _build_master_field(self, col, col_schema):
+        """建立單一母表欄位的 widget 列（附加在已建立欄位之後）"""
+        f = tk.Frame(self._master_field_parent, bg=_BG)
+        f.pack(fill="x", pady=2)
 
-                trace_id = var.trace_add("write",
-                                         lambda *args, c=col, v=var: self._on_field_change(c, v.get()))
-                self.trace_ids[col] = trace_id
+        ctk.CTkLabel(f, text=col, width=100, anchor="w").pack(side="left")
 
-            else:  # string — 原生 tk.Text（輕量，取代 CTkTextbox）
-                textbox = self._make_master_text_cell(f)
-                textbox.pack(side="left", fill="x", expand=True)
+        col_type = col_schema.type
 
-                self.master_fields[col] = textbox
-                self.master_field_vars[col] = None
+        if col_schema.formula:
+            # 衍生欄位（唯讀）：值由 DataManager 依公式維護
+            var = ctk.StringVar()
+            entry = ctk.CTkEntry(f, textvariable=var, text_color="gray", state="disabled")
+            entry.pack(side="left", fill="x", expand=True)
 
-                textbox.bind("<KeyRelease>",
-                             lambda e, c=col, tb=textbox: (self._on_field_change(c, tb.get("1.0", "end-1c")), self._resize_text_cell(tb)))
-                self.trace_ids[col] = "bind"
+            self.master_fields[col] = entry
+            self.master_field_vars[col] = var
 
-        # 首次載入數據
-        self._update_editor_data(row_data)
+        elif col_schema.linked:
+            # Key (唯讀)
+            key_entry = ctk.CTkEntry(f, width=80, text_color="gray")
+            key_entry.configure(state="disabled")
+            key_entry.pack(side="left", padx=(0, 5))
+
+            # Text (可編輯) — 原生 tk.Text（輕量，取代 CTkTextbox）
+            textbox = self._make_master_text_cell(f)
+            textbox.pack(side="left", fill="x", expand=True)
+
+            self.master_fields[col] = (key_entry, textbox)
+            self.master_field_vars[col] = None
+
+            textbox.bind("<KeyRelease>",
+                         lambda e, c=col, tb=textbox: (self._on_linked_field_change_tb(c, tb), self._resize_text_cell(tb)))
+            textbox.bind("<FocusOut>", self._flush_edits)
+            self._bind_width_resize(textbox)
+            self.trace_ids[col] = "bind"
+
+        elif col_type == "bool":
+            var = ctk.BooleanVar()
+            chk = ctk.CTkCheckBox(f, text="", variable=var,
+                                  command=lambda c=col, v=var: self._on_field_change(c, v.get()))
+            chk.pack(side="left")
+
+            self.master_fields[col] = chk
+            self.master_field_vars[col] = var
+
+        elif col_type == "enum":
+            opts = list(col_schema.options)
+            menu = ctk.CTkOptionMenu(f, values=opts,
+                                     command=lambda v, c=col: self._on_field_change(c, v))
+            menu.pack(side="left", fill="x", expand=True)
+
+            self.master_fields[col] = menu
+
+        elif col_type in ("int", "float"):
+            var = ctk.StringVar()
+            entry = ctk.CTkEntry(f, textvariable=var)
+            entry.pack(side="left", fill="x", expand=True)
+
+            self.master_fields[col] = entry
+            self.master_field_vars[col] = var
+
+            trace_id = var.trace_add("write",
+                                     lambda *args, c=col, v=var: self._on_field_change(c, v.get(), buffered=True))
+            entry.bind("<FocusOut>", self._flush_edits)
+            self.trace_ids[col] = trace_id
+
+        else:  # string — 原生 tk.Text（輕量，取代 CTkTextbox）
+            textbox = self._make_master_text_cell(f)
+            textbox.pack(side="left", fill="x", expand=True)
+
+            self.master_fields[col] = textbox
+            self.master_field_vars[col] = None
+
+            textbox.bind("<KeyRelease>",
+                         lambda e, c=col, tb=textbox: (self._on_field_change(c, tb.get("1.0", "end-1c"), buffered=True),
+                                                       self._resize_text_cell(tb)))
+            textbox.bind("<FocusOut>", self._flush_edits)
+            self._bind_width_resize(textbox)
+            self.trace_ids[col] = "bind"
+
+        if col_schema.lookup:
+            # 查表結果（唯讀）
+            lbl = tk.Label(f, width=_SUB_LOOKUP_W, bg=_BG, fg="gray", font=_CELL_FONT, anchor="w")
+            lbl.pack(side="left", padx=(5, 0))
+            self._master_lookups[col] = lbl
+
+    def _fill_master_lookups(self):
+        """更新編輯區的查表結果（DataManager 整欄快取，O(1) 取值）"""
+        row_idx = self.current_master_idx
+        for col, lbl in self._master_lookups.items():
+            values = self.manager.lookup_values(self.sheet_name, col)
+            lbl.configure(text=values[row_idx] if values is not None and row_idx is not None else "")
+
+    def _bind_width_resize(self, tb):
+        """綁定寬度變化事件：視窗縮放時重新計算高度（避免殘留舊的行數）"""
+        tb._prev_width = 0
+
+        def _on_width_change(event, w=tb):
+            if event.width != w._prev_width:
+                w._prev_width = event.width
+                self._resize_text_cell(w)
+        tb.bind("<Configure>", _on_width_change)
 
     def _on_linked_field_change_tb(self, col, textbox):
         """連結欄位 (tk.Text 版) 文字變更回呼
@@ -637,90 +2401,89 @@ class SheetEditor(ctk.CTkFrame):
         if key is None:
             return
         new_text = textbox.get("1.0", "end-1c")
-        self.manager.update_linked_text(key, new_text)
+        self._master_shown[col] = (key, new_text)
+        self._stage_edit(("text", key), lambda v: self.manager.update_linked_text(key, v), new_text)
 
     def _update_editor_data(self, row_data):
         """只更新欄位的數據值（不重建 UI）
+        與上一次顯示的值（_master_shown）比對，只改動真的不同的欄位：
+        瀏覽相似項目時每次切換只需少數幾個 widget 操作。
         使用 suppress-flag 模式：suppress=True 時 callback 直接跳過，
         無需 unbind/rebind 開銷。"""
-        cols_cfg = self.cfg.get("columns", {})
-        _deferred_resize = []  # 收集需要調整高度的 textbox，延遲一起執行
+        schema = self.manager.schema(self.sheet_name)
+        _deferred_resize = []  # 收集內容有變的 textbox，延遲一起調整高度
 
         # suppress all master field callbacks
         self._master_suppress = True
 
-        try:
-            for col in self.df.columns:
-                if col not in self.master_fields:
-                    continue
-
-                val = row_data[col]
-                col_conf = cols_cfg.get(col, {})
-                col_type = col_conf.get("type", "string")
-                is_linked = col_conf.get("link_to_text", False)
-
-                if is_linked:
-                    key_entry, textbox = self.master_fields[col]
-
-                    # 更新 Key
-                    key_entry.configure(state="normal")
-                    key_entry.delete(0, "end")
-                    key_entry.insert(0, str(val))
-                    key_entry.configure(state="disabled")
-
-                    # 快取 linked key 到 textbox 上（供 _on_linked_field_change_tb 讀取）
-                    textbox._linked_key = str(val)
-
-                    # 更新 Text (tk.Text)
-                    real_text = str(self.manager.get_text_value(val))
-                    textbox.delete("1.0", "end")
-                    textbox.insert("1.0", real_text)
-                    _deferred_resize.append(textbox)
-
-                elif col_type == "bool":
-                    var = self.master_field_vars[col]
-                    var.set(bool(val))
-
-                elif col_type == "enum":
-                    menu = self.master_fields[col]
-                    menu.set(str(val))
-
-                elif col_type in ("int", "float"):
-                    var = self.master_field_vars[col]
-                    var.set(str(val))
-
-                else:  # string (tk.Text)
-                    textbox = self.master_fields[col]
-                    textbox.delete("1.0", "end")
-                    textbox.insert("1.0", str(val))
-                    _deferred_resize.append(textbox)
-
+        try:
+            for col in self.master_fields:
+                tb = self._show_master_field(col, row_data[col], schema.column(col))
+                if tb is not None:
+                    _deferred_resize.append(tb)
         finally:
             self._master_suppress = False
+        self._fill_master_lookups()
 
-        # 待 UI 渲染後再批次調整所有 text cell 高度
+        # 待 UI 渲染後再分段調整有變動的 text cell 高度
         if _deferred_resize:
             def _batch_resize(tbs=_deferred_resize):
-                # 強制幾何計算，讓 tk.Text 取得實際渲染寬度，
+                # 先讓出一個時間片：Tk 完成幾何計算後 tk.Text 才有實際渲染寬度，
                 # 否則 count("displaylines") 會按初始 width=30 字元計算，導致行數偏高
-                self.top_container.update_idletasks()
+                yield SliceScheduler.NEXT_FRAME
                 for tb in tbs:
                     self._resize_text_cell(tb)
-            self.after_idle(_batch_resize)
-
-            # 綁定寬度變化事件：視窗縮放時重新計算高度（避免殘留舊的行數）
-            for tb in _deferred_resize:
-                if not getattr(tb, '_has_configure_resize', False):
-                    tb._has_configure_resize = True
-                    tb._prev_width = 0
-                    def _on_width_change(event, w=tb):
-                        if event.width != w._prev_width:
-                            w._prev_width = event.width
-                            self._resize_text_cell(w)
-                    tb.bind("<Configure>", _on_width_change)
+                    yield
+            self._scheduler.submit("master_resize", _batch_resize())
+
+    def _show_master_field(self, col, val, col_schema):
+        """
+        把單一欄位設為 val；與 _master_shown 記錄相同時不碰 widget。
+        回傳內容有變動、需要重新計算高度的 tk.Text（否則 None）。呼叫端負責 suppress。
+        """
+        prev = self._master_shown.get(col)
+
+        if col_schema.linked:
+            key = str(val)
+            text = str(self.manager.get_text_value(val))
+            prev_key, prev_text = prev if prev is not None else (None, None)
+            self._master_shown[col] = (key, text)
+            key_entry, textbox = self.master_fields[col]
+            if key != prev_key:
+                key_entry.configure(state="normal")
+                key_entry.delete(0, "end")
+                key_entry.insert(0, key)
+                key_entry.configure(state="disabled")
+                # 快取 linked key 到 textbox 上（供 _on_linked_field_change_tb 讀取）
+                textbox._linked_key = key
+            if text == prev_text:
+                return None
+            textbox.delete("1.0", "end")
+            textbox.insert("1.0", text)
+            return textbox
+
+        shown = bool(val) if col_schema.type == "bool" and not col_schema.formula else str(val)
+        if prev is not None and prev == shown:
+            return None
+        self._master_shown[col] = shown
+
+        if col_schema.formula:
+            self.master_field_vars[col].set(shown)
+        elif col_schema.type == "bool":
+            self.master_field_vars[col].set(shown)
+        elif col_schema.type == "enum":
+            self.master_fields[col].set(shown)
+        elif col_schema.type in ("int", "float"):
+            self.master_field_vars[col].set(shown)
+        else:  # string (tk.Text)
+            textbox = self.master_fields[col]
+            textbox.delete("1.0", "end")
+            textbox.insert("1.0", shown)
+            return textbox
+        return None
 
     def _update_image(self):
-        """只更新圖片（不重建 UI）"""
+        """只更新圖片（不重建 UI）；解碼在背景執行，重複顯示直接取快取"""
         if not self.img_label:
             return
 
@@ -728,50 +2491,106 @@ class SheetEditor(ctk.CTkFrame):
         if not use_icon:
             return
 
-        img_base_path = self.cfg.get("image_path", "")
-        img_folder = f"{img_base_path}/{self.current_cls_val}"
         img_file = f"{self.current_master_pk}.png"
+        key = self._icon_key(self.current_master_pk, self.current_cls_val)
+        if key is None:
+            self.current_image_ref = None
+            self.img_label.configure(text=f"File not found\n{img_file}")
+        else:
+            pk = self.current_master_pk
+            _THUMBS.request(key, lambda img, p=pk: self._show_icon(p, img))
+        self._prefetch_icons()
 
-        full_path = os.path.join(img_folder, img_file)
-        if not os.path.exists(full_path):
-            full_path = os.path.join(img_base_path, img_file)
+    def _icon_key(self, pk, cls_val):
+        """圖示檔的快取 key (路徑, mtime)：由資料夾索引查找，不碰檔案系統"""
+        return _ICONS.lookup(self.cfg.get("image_path", ""), cls_val, pk)
 
-        if os.path.exists(full_path):
-            try:
-                pil_img = Image.open(full_path)
-                pil_img.thumbnail((128, 128))
-                ctk_img = ctk.CTkImage(light_image=pil_img, dark_image=pil_img, size=pil_img.size)
-                self.img_label.configure(image=ctk_img, text="")
-                self.current_image_ref = ctk_img
-            except Exception as e:
-                self.current_image_ref = None
-                self.img_label.configure(text="Error")
-        else:
+    def _show_icon(self, pk, img):
+        """縮圖解碼完成的回呼；期間已切換到別的項目就丟棄"""
+        if not self.img_label or not self.img_label.winfo_exists() or pk != self.current_master_pk:
+            return
+        if img is None:
             self.current_image_ref = None
-            self.img_label.configure(text=f"File not found\n{img_file}")
+            self.img_label.configure(text="Error")
+            return
+        if img is not self.current_image_ref:
+            self.img_label.configure(image=img, text="")
+            self.current_image_ref = img
+
+    def _prefetch_icons(self, span=3):
+        """預先解碼同分類中前後幾個項目的圖示"""
+        pos = self._item_pos.get(self.current_master_idx)
+        if pos is None:
+            return
+        keys = []
+        for p in range(max(0, pos - span), min(len(self._item_indices), pos + span + 1)):
+            row_idx = self._item_indices[p]
+            if p != pos and row_idx in self.df.index:
+                keys.append(self._icon_key(self.df.at[row_idx, self.pk_key], self.current_cls_val))
+        _THUMBS.prefetch(keys)
+
+    def _stage_edit(self, key, commit, value):
+        """文字輸入交給 App 的 EditBuffer：連續按鍵合併成一次提交"""
+        buffer = getattr(self.winfo_toplevel(), 'edit_buffer', None)
+        if buffer is None:
+            commit(value)
+        else:
+            buffer.stage(key, commit, value)
 
-    def _on_field_change(self, col_name, value):
-        """欄位變更回調（suppress-flag 模式）"""
+    def _flush_edits(self, _event=None):
+        """把尚未提交的輸入寫回 DataManager（讀取或改動列結構之前呼叫）"""
+        buffer = getattr(self.winfo_toplevel(), 'edit_buffer', None)
+        if buffer is not None:
+            buffer.flush()
+
+    def _on_field_change(self, col_name, value, buffered=False):
+        """欄位變更回調（suppress-flag 模式）；buffered=True 用於逐鍵輸入的欄位"""
         if getattr(self, '_master_suppress', False):
             return
+        # widget 已顯示使用者輸入的值，記下來讓下一次差異更新不會誤判
+        self._master_shown[col_name] = value if isinstance(value, bool) else str(value)
         if self.current_master_idx is not None:
-            self.manager.update_cell(False, self.sheet_name, self.current_master_idx, col_name, value)
+            row_idx = self.current_master_idx
 
-    def _on_linked_field_change(self, col_name, var):
-        """連結文字欄位變更回調（suppress-flag 模式）"""
-        if getattr(self, '_master_suppress', False):
+            def commit(v):
+                self.manager.update_cell(False, self.sheet_name, row_idx, col_name, v)
+                self._refresh_derived_fields(row_idx)
+                self._refresh_joined_sub_tab()
+
+            if buffered:
+                self._stage_edit(("master", self.sheet_name, row_idx, col_name), commit, value)
+            else:
+                commit(value)
+
+    def _refresh_derived_fields(self, row_idx):
+        """輸入欄位寫回後，更新編輯區中已建立的衍生欄位（只動有變化的）與查表結果"""
+        schema = self.manager.schema(self.sheet_name)
+        if row_idx != self.current_master_idx:
             return
-        if self.current_master_idx is not None:
-            # 取得 Key（從快取讀取，不碰 CTkEntry.configure）
-            _, textbox = self.master_fields[col_name]
-            key = getattr(textbox, '_linked_key', None)
-            if key is None:
-                return
-            # 更新文字表
-            self.manager.update_linked_text(key, var.get())
+        self._fill_master_lookups()
+        if not schema.derived:
+            return
+        self._master_suppress = True
+        try:
+            for col in schema.derived:
+                if col in self.master_fields:
+                    self._show_master_field(col, self.df.at[row_idx, col], schema.column(col))
+        finally:
+            self._master_suppress = False
+
+    def _refresh_joined_sub_tab(self):
+        """母表寫回可能經 [master.欄位] 重算子表衍生欄位：可見的子表 Tab 依版本戳記重繪（其餘切換時才更新）"""
+        try:
+            tab_name = self.sub_tables_tabs.get()
+        except Exception:
+            return
+        sheet_full_name = f"{self.sheet_name}#{tab_name}"
+        if sheet_full_name in self.manager.sub_dfs and self.manager.schema(sheet_full_name).derived:
+            self._refresh_sub_tab(tab_name)
 
     def add_classification(self):
         """ 新增分類 """
+        self._flush_edits()
         dialog = ctk.CTkInputDialog(text="請輸入新分類名稱:", title="新增分類")
         new_cls = dialog.get_input()
         if not new_cls: return
@@ -790,33 +2609,33 @@ class SheetEditor(ctk.CTkFrame):
 
         self.df = pd.concat([self.df, pd.DataFrame([new_row])], ignore_index=True)
         self.manager.master_dfs[self.sheet_name] = self.df
-        self.manager.dirty = True
+        self.manager.mark_dirty(self.sheet_name)
         self.load_classification_list()
         self.load_items_by_group(new_cls)
 
     def delete_classification(self):
         """ 刪除選取的分類 """
+        self._flush_edits()
         if not self.current_cls_val: return
         if not messagebox.askyesno("刪除確認", f"確定要刪除分類 [{self.current_cls_val}] 及其下所有資料嗎？"): return
 
         self.df = self.df[self.df[self.cls_key] != self.current_cls_val]
         self.df.reset_index(drop=True, inplace=True)
         self.manager.master_dfs[self.sheet_name] = self.df
-        self.manager.dirty = True
+        self.manager.mark_dirty(self.sheet_name)
 
         self.current_cls_val = None
         self.current_master_idx = None
 
         # 清空項目列表
-        for btn in self.item_buttons.values():
-            btn.destroy()
-        self.item_buttons.clear()
+        self._clear_item_list()
 
         self.load_classification_list()
         self.load_sub_tables(None)
 
     def add_master_item(self):
         """ 新增項目到當前分類（插在該分類最後） """
+        self._flush_edits()
         if not self.current_cls_val:
             messagebox.showwarning("提示", "請先選擇左側分類")
             return
@@ -840,7 +2659,7 @@ class SheetEditor(ctk.CTkFrame):
         bottom = self.df.iloc[insert_idx:]
         self.df = pd.concat([top, pd.DataFrame([new_row]), bottom], ignore_index=True)
         self.manager.master_dfs[self.sheet_name] = self.df
-        self.manager.dirty = True
+        self.manager.mark_dirty(self.sheet_name)
 
         self.load_items_by_group(self.current_cls_val)
 
@@ -849,21 +2668,20 @@ class SheetEditor(ctk.CTkFrame):
 
     def delete_master_item(self):
         """ 刪除選取的項目 """
+        self._flush_edits()
         if self.current_master_idx is None:
             messagebox.showwarning("提示", "請先選擇要刪除的項目")
             return
 
-        if not messagebox.askyesno("刪除確認", "確定要刪除此筆資料嗎？"): return
+        # 刪除前提醒仍在引用此 PK 的儲存格（反向引用索引，O(1) 查詢）
+        usages = self.manager.find_usages(self.df.at[self.current_master_idx, self.pk_key])
+        note = f"\n\n此項目仍被 {len(usages)} 個儲存格引用（右鍵「查看引用」可列出）" if usages else ""
+        if not messagebox.askyesno("刪除確認", "確定要刪除此筆資料嗎？" + note): return
 
         self.df.drop(self.current_master_idx, inplace=True)
         self.df.reset_index(drop=True, inplace=True)
         self.manager.master_dfs[self.sheet_name] = self.df
-        self.manager.dirty = True
-
-        # 從緩存中移除
-        if self.current_master_idx in self.item_buttons:
-            self.item_buttons[self.current_master_idx].destroy()
-            del self.item_buttons[self.current_master_idx]
+        self.manager.mark_dirty(self.sheet_name)
 
         self.current_master_idx = None
         self.load_items_by_group(self.current_cls_val)
@@ -881,6 +2699,12 @@ class SheetEditor(ctk.CTkFrame):
 
     def _highlight_current_sub_row(self, tab_name):
         """重新高亮當前選中的子表行"""
+        frames = self.sub_table_frames.get(tab_name, {})
+        if frames.get('mode') == 'grid':
+            rows = frames['grid_rows']
+            pos = rows.index(self.current_sub_row_idx) if self.current_sub_row_idx in rows else None
+            frames['grid'].select_row(pos)
+            return
         for rf in self.sub_table_active_rows.get(tab_name, []):
             if rf._del_ctx["row_idx"] == self.current_sub_row_idx:
                 rf.configure(highlightthickness=2, highlightbackground=_CELL_FOCUS_BORDER)
@@ -889,6 +2713,7 @@ class SheetEditor(ctk.CTkFrame):
 
     def move_sub_item(self, direction):
         """移動子表行順序 (direction: -1=上, +1=下)"""
+        self._flush_edits()
         if self.current_sub_row_idx is None or self.current_master_pk is None:
             return
 
@@ -930,7 +2755,7 @@ class SheetEditor(ctk.CTkFrame):
         sub_df.iloc[idx_a] = row_b
         sub_df.iloc[idx_b] = row_a
         self.manager.sub_dfs[full_sub_name] = sub_df
-        self.manager.dirty = True
+        self.manager.mark_dirty(full_sub_name)
 
         # 更新選中索引
         self.current_sub_row_idx = idx_b
@@ -941,6 +2766,7 @@ class SheetEditor(ctk.CTkFrame):
 
     def copy_sub_item(self):
         """複製子表行"""
+        self._flush_edits()
         if self.current_sub_row_idx is None or self.current_master_pk is None:
             return
 
@@ -972,13 +2798,14 @@ class SheetEditor(ctk.CTkFrame):
         bottom = sub_df.iloc[insert_idx:]
         sub_df = pd.concat([top, pd.DataFrame([new_row]), bottom], ignore_index=True)
         self.manager.sub_dfs[full_sub_name] = sub_df
-        self.manager.dirty = True
+        self.manager.mark_dirty(full_sub_name)
 
         # 刷新子表
         self._update_sub_table_data(current_tab, full_sub_name, self.current_master_pk)
 
     def add_sub_item(self):
         """ 新增子表資料（插在該母表最後） """
+        self._flush_edits()
         if self.current_master_pk is None:
             messagebox.showwarning("提示", "請先選擇母表資料")
             return
@@ -1009,20 +2836,21 @@ class SheetEditor(ctk.CTkFrame):
         bottom = sub_df.iloc[insert_idx:]
         sub_df = pd.concat([top, pd.DataFrame([new_row]), bottom], ignore_index=True)
         self.manager.sub_dfs[full_sub_name] = sub_df
-        self.manager.dirty = True
+        self.manager.mark_dirty(full_sub_name)
 
         # 重新載入該 Tab（會自動重用行）
         self._update_sub_table_data(current_tab, full_sub_name, self.current_master_pk)
 
     def delete_sub_item(self, sheet_full_name, row_idx):
         """ 刪除子表資料 (由每一列的 X 按鈕觸發) """
+        self._flush_edits()
         if not messagebox.askyesno("確認", "刪除此列子表資料？"): return
 
         sub_df = self.manager.sub_dfs[sheet_full_name]
         sub_df.drop(row_idx, inplace=True)
         sub_df.reset_index(drop=True, inplace=True)
         self.manager.sub_dfs[sheet_full_name] = sub_df
-        self.manager.dirty = True
+        self.manager.mark_dirty(sheet_full_name)
 
         # 只更新受影響的單一 Tab，不重建全部子表結構（避免卡頓）
         short_name = sheet_full_name.split("#")[1]
@@ -1040,8 +2868,11 @@ class SheetEditor(ctk.CTkFrame):
         if not related_sheets:
             # 清空所有 Tab
             for tab_name in list(self.sub_tables_tabs._tab_dict.keys()):
+                self._forget_tab_rows(tab_name)
+                self.sub_table_frames.pop(tab_name, None)
                 self.sub_tables_tabs.delete(tab_name)
             self.sub_tables_tabs.add("無子表")
+            self._sub_tab_rendered.clear()
             return
 
         # 取得現有和需要的 Tab
@@ -1052,16 +2883,14 @@ class SheetEditor(ctk.CTkFrame):
         for tab in (existing_tabs - needed_tabs):
             self.sub_tables_tabs.delete(tab)
             # 清理緩存
+            self._sub_tab_rendered.pop(tab, None)
+            self._forget_tab_rows(tab)
             if tab in self.sub_table_frames:
                 del self.sub_table_frames[tab]
             if tab in self.sub_table_headers:
                 del self.sub_table_headers[tab]
-            if tab in self.sub_table_row_pools:
-                del self.sub_table_row_pools[tab]
-            if tab in self.sub_table_active_rows:
-                del self.sub_table_active_rows[tab]
 
-        # 2. 為每個子表更新內容
+        # 2. 確保每個子表的 Tab 存在
         for sheet in related_sheets:
             short_name = sheet.split("#")[1]
 
@@ -1070,8 +2899,116 @@ class SheetEditor(ctk.CTkFrame):
                 self.sub_tables_tabs.add(short_name)
                 self._create_sub_table_structure(short_name)
 
-            # 更新該 Tab 的資料（重用行）
-            self._update_sub_table_data(short_name, sheet, master_id)
+        # 3. 只更新目前可見的 Tab；其餘視為過期，切換到該 Tab 時才更新
+        self._sub_master_id = master_id
+        self._refresh_sub_tab(self.sub_tables_tabs.get())
+        self._schedule_sub_prefetch()
+
+    # ── 鄰近項目子表預取 ──
+
+    def _schedule_sub_prefetch(self):
+        """選取停下來後，於閒置時預先算好上下幾個項目的子表資料"""
+        if self._prefetch_timer is not None:
+            self.after_cancel(self._prefetch_timer)
+        self._scheduler.cancel("sub_prefetch")
+        self._prefetch_timer = self.after(_SUB_PREFETCH_DELAY_MS, self._start_sub_prefetch)
+
+    def _start_sub_prefetch(self):
+        self._prefetch_timer = None
+        pos = self._item_pos.get(self.current_master_idx)
+        if pos is None:
+            return
+        # 由近到遠：下一個、上一個、再下一個…（方向鍵瀏覽時最先用到）
+        neighbors = []
+        for d in range(1, _SUB_PREFETCH_SPAN + 1):
+            for p in (pos + d, pos - d):
+                if 0 <= p < len(self._item_indices):
+                    neighbors.append(self._item_indices[p])
+        if neighbors:
+            self._scheduler.submit("sub_prefetch", self._sub_prefetch_job(neighbors))
+
+    def _sub_prefetch_job(self, row_indices):
+        prefix = self.sheet_name + "#"
+        sheets = [s for s in self.manager.sub_dfs if s.startswith(prefix)]
+        for row_idx in row_indices:
+            # 目前項目的子表還在分段建立時先讓路
+            while self._scheduler.is_running(("sub_table", self.sub_tables_tabs.get())):
+                yield SliceScheduler.NEXT_FRAME
+            if row_idx not in self.df.index:
+                continue
+            master_id = self.df.at[row_idx, self.pk_key]
+            for sheet_full_name in sheets:
+                fk = self.manager.schema(sheet_full_name).foreign_key or self.pk_key
+                self._sub_slice(sheet_full_name, fk, master_id)
+                yield
+
+    def _sub_slice(self, sheet_full_name, fk, master_id):
+        """
+        取得某母表項目的子表列與其連結欄位文字，回傳 (DataFrame, {Key: 文字})
+        結果依 (子表, PK) 放入 LRU，資料或文字表版本改變時自動失效。
+        """
+        version = self.manager.data_version(sheet_full_name)
+        key = (sheet_full_name, str(master_id))
+        entry = self._sub_prefetch.get(key)
+        if entry is not None and entry[0] == version:
+            self._sub_prefetch.move_to_end(key)
+            return entry[1], entry[2]
+
+        sub_df = self.manager.sub_dfs[sheet_full_name]
+        filtered_rows = sub_df.take(self.manager.child_rows(sheet_full_name, fk, master_id))
+        texts = {}
+        if self.manager.text_dict:
+            for col in self.manager.schema(sheet_full_name).linked:
+                if col in filtered_rows.columns:
+                    for k in filtered_rows[col].astype(str).unique():
+                        texts[k] = str(self.manager.get_text_value(k))
+
+        self._sub_prefetch[key] = (version, filtered_rows, texts)
+        self._sub_prefetch.move_to_end(key)
+        while len(self._sub_prefetch) > _SUB_PREFETCH_MAX:
+            self._sub_prefetch.popitem(last=False)
+        return filtered_rows, texts
+
+    def _on_sub_tab_changed(self):
+        """子表 Tab 切換：過期的 Tab 在此時才更新"""
+        tab_name = self.sub_tables_tabs.get()
+        self._refresh_sub_tab(tab_name)
+        self._highlight_current_sub_row(tab_name)
+
+    def _refresh_sub_tab(self, tab_name):
+        """Tab 最後渲染的母表 PK 與資料版本都沒變時直接跳過"""
+        sheet_full_name = f"{self.sheet_name}#{tab_name}"
+        if tab_name not in self.sub_table_frames or sheet_full_name not in self.manager.sub_dfs:
+            return
+        stamp = (self._sub_master_id, self.manager.data_version(sheet_full_name))
+        if self._sub_tab_rendered.get(tab_name) == stamp:
+            return
+        self._update_sub_table_data(tab_name, sheet_full_name, self._sub_master_id)
+
+    def _commit_sub_cell(self, sheet_full_name, row_idx, col, value):
+        """子表儲存格編輯寫回 DataManager；畫面本身已是最新，同步更新該 Tab 的渲染戳記"""
+        self.manager.update_cell(True, sheet_full_name, row_idx, col, value)
+        self._restamp_sub_tab(sheet_full_name)
+        self._refresh_sub_row_extras(sheet_full_name, row_idx)
+
+    def _stage_sub_cell(self, sheet_full_name, row_idx, col, value):
+        """逐鍵輸入的子表欄位：緩衝後才提交"""
+        self._stage_edit(("sub", sheet_full_name, row_idx, col),
+                         lambda v: self._commit_sub_cell(sheet_full_name, row_idx, col, v), value)
+
+    def _stage_sub_linked_text(self, sheet_full_name, key, text):
+        self._stage_edit(("text", key),
+                         lambda v: self._commit_sub_linked_text(sheet_full_name, key, v), text)
+
+    def _commit_sub_linked_text(self, sheet_full_name, key, text):
+        self.manager.update_linked_text(key, text)
+        self._restamp_sub_tab(sheet_full_name)
+
+    def _restamp_sub_tab(self, sheet_full_name):
+        tab_name = sheet_full_name.split("#", 1)[1]
+        rendered = self._sub_tab_rendered.get(tab_name)
+        if rendered is not None:
+            self._sub_tab_rendered[tab_name] = (rendered[0], self.manager.data_version(sheet_full_name))
 
     def _create_sub_table_structure(self, tab_name):
         """創建子表的固定結構 (標題固定在頂部，資料區域獨立捲動)"""
@@ -1182,29 +3119,36 @@ class SheetEditor(ctk.CTkFrame):
             'scroll_container': scroll_container,
             '_freeze': False,
             '_update_widths': _update_widths,
+            'mode': 'widgets',  # 'widgets' 或 'grid'（列數超過 _SUB_GRID_THRESHOLD）
+            'grid': None,
+            'grid_rows': [],  # grid 模式下各列對應的子表 row_idx
+            'grid_sheet': None,
+            'grid_headers': [],
         }
-        self.sub_table_row_pools[tab_name] = []
         self.sub_table_active_rows[tab_name] = []
 
     def _update_sub_table_data(self, tab_name, sheet_full_name, master_id):
         """更新子表資料（智能重用行）"""
+        # 渲染完成才記錄戳記；途中被取消的 Tab 下次顯示時會重新渲染
+        stamp = (master_id, self.manager.data_version(sheet_full_name))
+        self._sub_tab_rendered.pop(tab_name, None)
+        self._scheduler.cancel(("sub_table", tab_name))
 
         # 取得資料
         sub_df = self.manager.sub_dfs[sheet_full_name]
-        sub_cfg = self.cfg.get("sub_sheets", {}).get(tab_name, {})
-        sub_cols_cfg = sub_cfg.get("columns", {})
-        fk = sub_cfg.get("foreign_key", self.pk_key)
+        schema = self.manager.schema(sheet_full_name)
+        fk = schema.foreign_key or self.pk_key
 
         if fk not in sub_df.columns:
             self._show_error_in_tab(tab_name, f"錯誤: 找不到關鍵欄位 {fk}")
+            self._sub_tab_rendered[tab_name] = stamp
             return
 
-        # 篩選資料
+        # 篩選資料（外鍵索引 + 鄰近項目預取 LRU）
         try:
-            mask = sub_df[fk].astype(str) == str(master_id)
-            filtered_rows = sub_df[mask]
-        except:
-            filtered_rows = sub_df.head(0)
+            filtered_rows, texts = self._sub_slice(sheet_full_name, fk, master_id)
+        except Exception:
+            filtered_rows, texts = sub_df.head(0), {}
 
         # 取得容器
         frames = self.sub_table_frames.get(tab_name)
@@ -1212,26 +3156,62 @@ class SheetEditor(ctk.CTkFrame):
             return
 
         header_frame = frames['header']
-        data_frame = frames['data']
+        headers = list(sub_df.columns)
+
+        # 大量子表列：改用 VirtualGrid，只繪製可視範圍
+        if len(filtered_rows) > _SUB_GRID_THRESHOLD:
+            self._show_sub_table_grid(tab_name, sheet_full_name, headers, schema,
+                                      list(filtered_rows.index))
+            self._sub_tab_rendered[tab_name] = stamp
+            return
+        self._show_sub_table_widgets(tab_name)
 
         # 更新標題（只在需要時）
-        headers = list(sub_df.columns)
         if not header_frame.winfo_children():
-            self._build_sub_table_header(header_frame, headers, sub_cols_cfg)
+            self._build_sub_table_header(header_frame, headers, schema)
+
+        # 大量 widget 建立與高度調整交給時間片排程器分段執行：
+        # 列會逐步出現，使用者在途中選了別的項目時舊 job 直接取消
+        self._scheduler.submit(
+            ("sub_table", tab_name),
+            self._build_sub_rows_job(tab_name, headers, filtered_rows, sheet_full_name, schema, texts),
+            on_slice=lambda f=frames: self._flush_sub_table_widths(f),
+            on_done=lambda t=tab_name: self._on_sub_rows_built(t, stamp))
+
+    def _on_sub_rows_built(self, tab_name, stamp):
+        self._sub_tab_rendered[tab_name] = stamp
+        self._highlight_current_sub_row(tab_name)
+
+    @staticmethod
+    def _flush_sub_table_widths(frames):
+        """時間片之間暫時解凍，讓已出現的列可以捲動"""
+        frames['_freeze'] = False
+        frames['_update_widths']()
+        frames['_freeze'] = True
 
-        # === 三階段更新：凍結 → 批次資料+pack → flush → 批次 resize → 解凍 ===
+    def _build_sub_rows_job(self, tab_name, headers, filtered_rows, sheet_full_name, schema, texts=None):
+        """
+        子表 widget 列的分段建立 job（generator，每個 yield 是一個可中斷點）
+        階段：凍結 → 回收舊行 → 逐行填入資料 + 估算列高 + pack → 解凍
+        active/pool 狀態隨每一行即時更新，中途取消也不會遺失 widget
+        """
+        frames = self.sub_table_frames[tab_name]
+        data_frame = frames['data']
         frames['_freeze'] = True
 
         try:
-            # ── 階段 1：回收舊行 + 填入新資料 + pack（不做 resize）──
+            # ── 階段 1：回收舊行到全域列池（欄位佈局改變時舊列留在舊 key，由 LRU 淘汰）──
             active_rows = self.sub_table_active_rows.get(tab_name, [])
-            row_pool = self.sub_table_row_pools.get(tab_name, [])
-
             for row_frame in active_rows:
                 row_frame.pack_forget()
-                row_pool.append(row_frame)
+            if frames.get('row_key') is not None:
+                _ROW_POOL.release(frames['row_key'], active_rows)
+            row_key = (data_frame, schema.signature(headers))
+            frames['row_key'] = row_key
+            _ROW_POOL.touch(row_key, reclaim=lambda t=tab_name: self._reclaim_sub_rows(t))
 
-            self.sub_table_active_rows[tab_name] = []
+            new_active_rows = []
+            self.sub_table_active_rows[tab_name] = new_active_rows
 
             if filtered_rows.empty:
                 if not hasattr(data_frame, '_empty_label'):
@@ -1239,43 +3219,191 @@ class SheetEditor(ctk.CTkFrame):
                                                         bg=_BG, fg="gray", font=_CELL_FONT)
                 data_frame._empty_label.pack(pady=10)
                 return
-            else:
-                if hasattr(data_frame, '_empty_label'):
-                    data_frame._empty_label.pack_forget()
-
-            needed_rows = len(filtered_rows)
-            available_rows = len(row_pool)
-            new_active_rows = []
+            if hasattr(data_frame, '_empty_label'):
+                data_frame._empty_label.pack_forget()
 
+            # ── 階段 2：填入資料 + 列高 + pack，每行一個中斷點 ──
+            # 列高由 _LINE_MEASURER 依欄寬估算，不需等待幾何計算，pack 時已是最終高度
             for i, (idx, row) in enumerate(filtered_rows.iterrows()):
                 row_bg = _ROW_EVEN if i % 2 == 0 else _ROW_ODD
-                if i < available_rows:
-                    row_frame = row_pool[i]
-                    self._update_sub_table_row(row_frame, headers, row, idx, sheet_full_name, sub_cols_cfg)
-                    row_frame.configure(bg=row_bg)
-                    row_frame.pack(fill="x", pady=1, padx=2, ipady=3)
+                row_frame = _ROW_POOL.acquire(row_key)
+                if row_frame is not None:
+                    self._update_sub_table_row(row_frame, headers, row, idx, sheet_full_name, schema, texts)
                 else:
-                    row_frame = self._create_sub_table_row(data_frame, headers, row, idx, sheet_full_name, sub_cols_cfg)
-                    row_frame.configure(bg=row_bg)
-                    row_frame.pack(fill="x", pady=1, padx=2, ipady=3)
+                    row_frame = self._create_sub_table_row(data_frame, headers, row, idx, sheet_full_name, schema, texts)
+                    _ROW_POOL.register(row_key, row_frame)
+                row_frame.configure(bg=row_bg)
+                self._auto_resize_row(row_frame, headers)
+                row_frame.pack(fill="x", pady=1, padx=2, ipady=3)
                 new_active_rows.append(row_frame)
-
-            self.sub_table_active_rows[tab_name] = new_active_rows
-            self.sub_table_row_pools[tab_name] = row_pool[needed_rows:]
-
-            # ── 強制幾何計算，讓 tk.Text 取得實際寬度後 count("displaylines") 才準確 ──
-            # _freeze=True 會阻擋 _update_widths，不會產生連鎖重繪
-            data_frame.update_idletasks()
-
-            # ── 批次 resize ──
-            for rf in new_active_rows:
-                self._auto_resize_row(rf, headers)
+                yield
 
         finally:
             frames['_freeze'] = False
             frames['_update_widths']()
 
-    def _build_sub_table_header(self, header_frame, headers, cols_cfg):
+    def _reclaim_sub_rows(self, tab_name):
+        """
+        全域列池要求回收：Tab 目前不可見時交出它使用中的列，並把 Tab 標記為過期
+        （下次切換到該 Tab 時重新渲染）
+        """
+        if tab_name not in self.sub_table_frames or self._scheduler.is_running(("sub_table", tab_name)):
+            return []
+        if self.sub_tables_tabs.winfo_ismapped() and self.sub_tables_tabs.get() == tab_name:
+            return []
+        rows = self.sub_table_active_rows.get(tab_name, [])
+        self.sub_table_active_rows[tab_name] = []
+        for row_frame in rows:
+            row_frame.pack_forget()
+        self._sub_tab_rendered.pop(tab_name, None)
+        return rows
+
+    def _forget_tab_rows(self, tab_name):
+        """Tab 即將銷毀：從全域列池移除它的列（widget 隨 Tab 一起銷毀）"""
+        self._scheduler.cancel(("sub_table", tab_name))
+        frames = self.sub_table_frames.get(tab_name, {})
+        rows = self.sub_table_active_rows.pop(tab_name, [])
+        if frames.get('row_key') is not None:
+            _ROW_POOL.forget(frames['row_key'], rows)
+
+    def _show_sub_table_widgets(self, tab_name):
+        """切回 widget 列模式（隱藏 grid）"""
+        frames = self.sub_table_frames[tab_name]
+        if frames['mode'] == 'widgets':
+            return
+        frames['grid'].pack_forget()
+        frames['scroll_container'].pack(fill="both", expand=True)
+        frames['mode'] = 'widgets'
+
+    def _show_sub_table_grid(self, tab_name, sheet_full_name, headers, schema, row_indices):
+        """以 VirtualGrid 顯示子表：回收 widget 列，grid 只向 DataManager 取可視範圍的資料"""
+        frames = self.sub_table_frames[tab_name]
+        self._scheduler.cancel(("sub_table", tab_name))
+
+        if frames['mode'] != 'grid':
+            # widget 列全部回收到全域列池，隱藏 widget 容器
+            active_rows = self.sub_table_active_rows.get(tab_name, [])
+            for row_frame in active_rows:
+                row_frame.pack_forget()
+            self.sub_table_active_rows[tab_name] = []
+            if frames.get('row_key') is not None:
+                _ROW_POOL.release(frames['row_key'], active_rows)
+            frames['scroll_container'].pack_forget()
+
+        # grid 欄位：查表欄位在來源欄右邊多一個唯讀欄（grid_headers 記錄每個 grid 欄的來源欄位）
+        grid_headers = []
+        for col in headers:
+            grid_headers.append(col)
+            if col in schema.lookups:
+                grid_headers.append(col)
+        grid = frames['grid']
+        if grid is None or frames['grid_headers'] != grid_headers:
+            if grid is not None:
+                grid.destroy()
+            grid = VirtualGrid(
+                self.sub_tables_tabs.tab(tab_name),
+                self._sub_grid_columns(headers, schema),
+                fetch_rows=lambda start, end, t=tab_name: self._fetch_sub_grid_rows(t, start, end),
+                row_height=_SUB_GRID_ROW_H,
+                on_edit=lambda row, col, value, t=tab_name: self._on_sub_grid_edit(t, row, col, value),
+                on_select=lambda row, t=tab_name: self._on_sub_grid_select(t, row),
+                on_action=lambda row, col, t=tab_name: self.delete_sub_item(
+                    self.sub_table_frames[t]['grid_sheet'], self.sub_table_frames[t]['grid_rows'][row]),
+                on_context=lambda row, col, e, t=tab_name: self._on_sub_grid_context(t, row, col, e),
+                on_double=lambda row, col, t=tab_name: self._jump_to_ref(self._sub_grid_raw_value(t, row, col)),
+            )
+            frames['grid'] = grid
+            frames['grid_headers'] = grid_headers
+
+        same_rows = frames['grid_sheet'] == sheet_full_name and frames['grid_rows'] == row_indices
+        frames['grid_sheet'] = sheet_full_name
+        frames['grid_rows'] = row_indices
+        if frames['mode'] != 'grid':
+            grid.pack(fill="both", expand=True)
+            frames['mode'] = 'grid'
+        grid.set_count(len(row_indices), keep_position=same_rows)
+
+        pos = row_indices.index(self.current_sub_row_idx) if self.current_sub_row_idx in row_indices else None
+        grid.select_row(pos, see=False)
+
+    def _sub_grid_columns(self, headers, schema):
+        """依子表欄位 schema 建立 VirtualGrid 欄位定義（第 0 欄為刪除按鈕）"""
+        char_w = _LINE_MEASURER.char_width(_CELL_FONT)
+        columns = [{"title": "操作", "width": 56, "kind": "action"}]
+        for col in headers:
+            col_schema = schema.column(col)
+            col_type = col_schema.type
+            if col_schema.formula:
+                columns.append({"title": f"{col} ƒ", "width": 15 * char_w + 16, "kind": "readonly"})
+            elif col_schema.linked:
+                columns.append({"title": f"{col} 🔗", "width": 22 * char_w + 16, "kind": "text"})
+            elif col_type == "bool":
+                columns.append({"title": col, "width": 15 * char_w + 16, "kind": "bool"})
+            elif col_type == "enum":
+                columns.append({"title": col, "width": 15 * char_w + 16, "kind": "enum",
+                                "options": list(col_schema.options) or ["None"]})
+            else:
+                columns.append({"title": col, "width": 15 * char_w + 16, "kind": "text"})
+            if col_schema.lookup:
+                columns.append({"title": f"→ {col_schema.lookup[1]}", "width": 15 * char_w + 16,
+                                "kind": "readonly"})
+        return columns
+
+    def _fetch_sub_grid_rows(self, tab_name, start, end):
+        """VirtualGrid 資料來源：只取可視範圍的子表列，連結欄位轉成文字內容，查表欄填入查表結果"""
+        frames = self.sub_table_frames[tab_name]
+        headers = frames['grid_headers']
+        schema = self.manager.schema(frames['grid_sheet'])
+        linked = [i for i, col in enumerate(headers) if col in schema.linked]
+        # 查表欄是 grid_headers 中重複出現的第二個欄名
+        lookups = [(i, self.manager.lookup_values(frames['grid_sheet'], col))
+                   for i, col in enumerate(headers) if i and headers[i - 1] == col]
+        row_indices = frames['grid_rows'][start:end]
+        rows = self.manager.row_values(frames['grid_sheet'], row_indices, headers)
+        for row_idx, values in zip(row_indices, rows):
+            for i in linked:
+                values[i] = str(self.manager.get_text_value(values[i]))
+            for i, looked_up in lookups:
+                values[i] = looked_up[row_idx] if looked_up is not None else ""
+        return [["X"] + values for values in rows]
+
+    def _sub_grid_raw_value(self, tab_name, row, col):
+        """取得 grid 儲存格在 DataFrame 中的原始值（連結欄位回傳 Key）"""
+        frames = self.sub_table_frames[tab_name]
+        if col < 1:
+            return ""
+        values = self.manager.row_values(frames['grid_sheet'], [frames['grid_rows'][row]],
+                                         [frames['grid_headers'][col - 1]])
+        return values[0][0].strip() if values else ""
+
+    def _on_sub_grid_select(self, tab_name, row):
+        self.current_sub_row_idx = self.sub_table_frames[tab_name]['grid_rows'][row]
+
+    def _on_sub_grid_edit(self, tab_name, row, col, value):
+        frames = self.sub_table_frames[tab_name]
+        col_name = frames['grid_headers'][col - 1]
+        row_idx = frames['grid_rows'][row]
+        schema = self.manager.schema(frames['grid_sheet'])
+        if col_name in schema.linked:
+            self._commit_sub_linked_text(frames['grid_sheet'], self._sub_grid_raw_value(tab_name, row, col), value)
+        else:
+            self._commit_sub_cell(frames['grid_sheet'], row_idx, col_name, value)
+            if schema.lookups or schema.derived:
+                frames['grid'].refresh()  # 同列的查表 / 衍生欄位可能跟著變
+
+    def _on_sub_grid_context(self, tab_name, row, col, event):
+        frames = self.sub_table_frames[tab_name]
+        value = self._sub_grid_raw_value(tab_name, row, col)
+        if not value:
+            # 點在空白格：與 widget 版相同，改用該列第一個非空值
+            for c in range(1, len(frames['grid_headers']) + 1):
+                value = self._sub_grid_raw_value(tab_name, row, c)
+                if value:
+                    break
+        self._show_sub_row_context_menu(event, frames['grid_sheet'], frames['grid_rows'][row],
+                                        lambda v=value: self._jump_to_ref(v))
+
+    def _build_sub_table_header(self, header_frame, headers, schema):
         """建立子表標題（只執行一次）— 原生 tk.Label"""
         # 操作欄
         tk.Label(header_frame, text="操作", width=8,
@@ -1284,8 +3412,7 @@ class SheetEditor(ctk.CTkFrame):
 
         # 資料欄
         for col in headers:
-            col_info = cols_cfg.get(col, {})
-            is_linked = col_info.get("link_to_text", False)
+            is_linked = col in schema.linked
 
             label_text = f"{col} 🔗" if is_linked else col
             width = 22 if is_linked else 15  # tk.Label width in chars
@@ -1293,6 +3420,10 @@ class SheetEditor(ctk.CTkFrame):
             tk.Label(header_frame, text=label_text, width=width,
                      bg=_BG_HEADER, fg=_CELL_FG,
                      font=("微軟正黑體", 10, "bold"), anchor="w").pack(side="left", padx=2)
+            if col in schema.lookups:
+                tk.Label(header_frame, text=f"→ {schema.lookups[col][1]}", width=_SUB_LOOKUP_W,
+                         bg=_BG_HEADER, fg="gray",
+                         font=("微軟正黑體", 10, "bold"), anchor="w").pack(side="left", padx=2)
 
     @staticmethod
     def _resize_text_cell(tw, min_lines=1):
@@ -1300,17 +3431,15 @@ class SheetEditor(ctk.CTkFrame):
         原生 tk.Text 用（子表 cell）。height 以行數計，configure 極快（~0.05ms）。
         """
         content = tw.get("1.0", "end-1c")
-        if not content.strip() or ('\n' not in content and len(content) <= 20):
+        if not content.strip():
             last = getattr(tw, '_last_lines', min_lines)
             if last != min_lines:
                 tw.configure(height=min_lines)
                 tw._last_lines = min_lines
             return min_lines
 
-        try:
-            display_lines = int(tw.count("1.0", "end", "displaylines")[0])
-        except (TypeError, IndexError):
-            display_lines = max(1, content.count('\n') + 1)
+        # 以字元寬度表估算，不需要 count("displaylines") 的幾何計算
+        display_lines = _LINE_MEASURER.widget_lines(tw, content)
 
         target = max(min_lines, display_lines)
         if target != getattr(tw, '_last_lines', -1):
@@ -1361,7 +3490,7 @@ class SheetEditor(ctk.CTkFrame):
         tw._last_lines = 1
         return tw
 
-    def _create_sub_table_row(self, parent, headers, row_data, row_idx, sheet_name, cols_cfg):
+    def _create_sub_table_row(self, parent, headers, row_data, row_idx, sheet_name, schema, texts=None):
         """創建新的資料行（當池中沒有可用行時）
         使用 suppress-flag + mutable context 模式，避免 unbind/rebind 開銷。"""
         row_frame = tk.Frame(parent, bg=_BG)
@@ -1369,6 +3498,7 @@ class SheetEditor(ctk.CTkFrame):
         row_frame._widgets = {}
         row_frame._vars = {}
         row_frame._ctxs = {}  # mutable context dicts per column
+        row_frame._lookups = {}  # {查表欄位: 顯示查表結果的 tk.Label}
 
         # 刪除按鈕（原生 tk.Button）
         del_ctx = {"suppress": False, "sheet": sheet_name, "row_idx": row_idx}
@@ -1383,14 +3513,25 @@ class SheetEditor(ctk.CTkFrame):
 
         # 資料欄位
         for col in headers:
-            col_info = cols_cfg.get(col, {"type": "string"})
-            col_type = col_info.get("type", "string")
-            is_linked = col_info.get("link_to_text", False)
+            col_schema = schema.column(col)
+            col_type = col_schema.type
+            is_linked = col_schema.linked
 
             ctx = {"suppress": False, "sheet": sheet_name, "row_idx": row_idx, "col": col}
             row_frame._ctxs[col] = ctx
 
-            if is_linked:
+            if col_schema.formula:
+                # 衍生欄位（唯讀）— 由公式計算，只顯示不寫回
+                var = tk.StringVar()
+                entry = tk.Entry(row_frame, textvariable=var, width=15,
+                                 bg=_CELL_BG, fg="gray",
+                                 disabledbackground=_CELL_BG, disabledforeground="gray",
+                                 relief="flat", font=_CELL_FONT, state="disabled")
+                entry.pack(side="left", padx=2)
+                row_frame._widgets[col] = entry
+                row_frame._vars[col] = var
+
+            elif is_linked:
                 # Key (唯讀) — 原生 tk.Entry
                 key_entry = tk.Entry(row_frame, width=8,
                                      bg=_CELL_BG, fg="gray",
@@ -1405,19 +3546,20 @@ class SheetEditor(ctk.CTkFrame):
                 tw.bind("<KeyRelease>",
                         lambda e, c=ctx, w=tw, rf=row_frame, h=headers:
                         None if c["suppress"] else
-                        (self.manager.update_linked_text(c.get("key", ""), w.get("1.0", "end-1c")),
+                        (self._stage_sub_linked_text(c["sheet"], c.get("key", ""), w.get("1.0", "end-1c")),
                          self._auto_resize_row(rf, h)))
+                tw.bind("<FocusOut>", self._flush_edits)
 
                 row_frame._widgets[col] = (key_entry, tw)
                 row_frame._vars[col] = None
 
             elif col_type == "enum":
                 var = tk.StringVar()
-                options = col_info.get("options", ["None"])
+                options = list(col_schema.options) or ["None"]
                 menu = tk.OptionMenu(row_frame, var, *options,
                                      command=lambda v, c=ctx:
                                      None if c["suppress"] else
-                                     self.manager.update_cell(True, c["sheet"], c["row_idx"], c["col"], v))
+                                     self._commit_sub_cell(c["sheet"], c["row_idx"], c["col"], v))
                 menu.config(bg=_CELL_BG, fg=_CELL_FG,
                             activebackground=_CELL_FOCUS_BORDER, activeforeground="white",
                             relief="flat", highlightthickness=0, font=_CELL_FONT, width=12)
@@ -1433,7 +3575,7 @@ class SheetEditor(ctk.CTkFrame):
                                      bg=_BG, activebackground=_BG, selectcolor=_CELL_BG, relief="flat",
                                      command=lambda c=ctx, v=var:
                                      None if c["suppress"] else
-                                     self.manager.update_cell(True, c["sheet"], c["row_idx"], c["col"], v.get()))
+                                     self._commit_sub_cell(c["sheet"], c["row_idx"], c["col"], v.get()))
                 chk.pack(side="left", padx=2)
                 row_frame._widgets[col] = chk
                 row_frame._vars[col] = var
@@ -1450,7 +3592,8 @@ class SheetEditor(ctk.CTkFrame):
                 var.trace_add("write",
                               lambda *args, c=ctx, v=var:
                               None if c["suppress"] else
-                              self.manager.update_cell(True, c["sheet"], c["row_idx"], c["col"], v.get()))
+                              self._stage_sub_cell(c["sheet"], c["row_idx"], c["col"], v.get()))
+                entry.bind("<FocusOut>", self._flush_edits)
 
                 row_frame._widgets[col] = entry
                 row_frame._vars[col] = var
@@ -1462,12 +3605,20 @@ class SheetEditor(ctk.CTkFrame):
                 tw.bind("<KeyRelease>",
                         lambda e, c=ctx, w=tw, rf=row_frame, h=headers:
                         None if c["suppress"] else
-                        (self.manager.update_cell(True, c["sheet"], c["row_idx"], c["col"], w.get("1.0", "end-1c")),
+                        (self._stage_sub_cell(c["sheet"], c["row_idx"], c["col"], w.get("1.0", "end-1c")),
                          self._auto_resize_row(rf, h)))
+                tw.bind("<FocusOut>", self._flush_edits)
 
                 row_frame._widgets[col] = tw
                 row_frame._vars[col] = None
 
+            if col_schema.lookup:
+                # 查表結果（唯讀），緊接在來源欄右邊
+                lbl = tk.Label(row_frame, width=_SUB_LOOKUP_W, bg=_BG, fg="gray",
+                               font=_CELL_FONT, anchor="w")
+                lbl.pack(side="left", padx=2)
+                row_frame._lookups[col] = lbl
+
         # 綁定點擊選中行
         def _on_row_click(event, rf=row_frame):
             # 找到當前 tab name
@@ -1503,18 +3654,19 @@ class SheetEditor(ctk.CTkFrame):
             except:
                 return
             self._select_sub_row(tab_name, rf)
-            self._show_sub_row_context_menu(event, rf, sn)
+            self._show_sub_row_context_menu(event, sn, rf._del_ctx["row_idx"],
+                                            lambda: self._try_jump_ref_from_row(rf))
 
         row_frame.bind("<Button-3>", _on_row_right_click)
         for child in row_frame.winfo_children():
             child.bind("<Button-3>", _on_row_right_click, add="+")
 
         # 填充初始數據
-        self._update_sub_table_row(row_frame, headers, row_data, row_idx, sheet_name, cols_cfg)
+        self._update_sub_table_row(row_frame, headers, row_data, row_idx, sheet_name, schema, texts)
 
         return row_frame
 
-    def _update_sub_table_row(self, row_frame, headers, row_data, row_idx, sheet_name, cols_cfg):
+    def _update_sub_table_row(self, row_frame, headers, row_data, row_idx, sheet_name, schema, texts=None):
         """更新資料行的內容（重用時調用）
         使用 suppress-flag 模式：suppress=True → 注入值 → 更新 ctx → suppress=False
         無需 unbind/rebind，Python 層開銷極小。"""
@@ -1527,9 +3679,9 @@ class SheetEditor(ctk.CTkFrame):
         # 2. 更新每個欄位的值（suppress 模式）
         for col in headers:
             val = row_data[col]
-            col_info = cols_cfg.get(col, {"type": "string"})
-            col_type = col_info.get("type", "string")
-            is_linked = col_info.get("link_to_text", False)
+            col_schema = schema.column(col)
+            col_type = col_schema.type
+            is_linked = col_schema.linked
 
             if col not in row_frame._widgets:
                 continue
@@ -1538,7 +3690,10 @@ class SheetEditor(ctk.CTkFrame):
             ctx["suppress"] = True
 
             try:
-                if is_linked:
+                if col_schema.formula:
+                    row_frame._vars[col].set(str(val))
+
+                elif is_linked:
                     key_entry, tw = row_frame._widgets[col]
 
                     key_entry.configure(state="normal")
@@ -1546,7 +3701,9 @@ class SheetEditor(ctk.CTkFrame):
                     key_entry.insert(0, str(val))
                     key_entry.configure(state="disabled")
 
-                    real_text = str(self.manager.get_text_value(val))
+                    real_text = texts.get(str(val)) if texts else None
+                    if real_text is None:
+                        real_text = str(self.manager.get_text_value(val))
                     tw.delete("1.0", "end")
                     tw.insert("1.0", real_text)
 
@@ -1576,14 +3733,55 @@ class SheetEditor(ctk.CTkFrame):
                 ctx["row_idx"] = row_idx
                 ctx["suppress"] = False
 
+        self._fill_sub_row_lookups(row_frame, sheet_name, row_idx)
+
         # 行高調整交由 _update_sub_table_data 批次處理
 
+    def _fill_sub_row_lookups(self, row_frame, sheet_name, row_idx):
+        """填入該列的查表結果（DataManager 以 hash join 整欄快取，這裡只是 O(1) 取值）"""
+        for col, lbl in row_frame._lookups.items():
+            values = self.manager.lookup_values(sheet_name, col)
+            lbl.configure(text=values[row_idx] if values is not None else "")
+
+    def _refresh_sub_row_extras(self, sheet_full_name, row_idx):
+        """
+        子表儲存格寫回後，更新同列的查表結果與衍生欄位（widget 模式；grid 模式由 refresh 處理）。
+        只碰這兩類 widget，使用者正在輸入的儲存格不受影響。
+        """
+        schema = self.manager.schema(sheet_full_name)
+        if not schema.lookups and not schema.derived:
+            return
+        tab_name = sheet_full_name.split("#", 1)[1]
+        for row_frame in self.sub_table_active_rows.get(tab_name, []):
+            ctx = row_frame._del_ctx
+            if ctx["row_idx"] != row_idx or ctx["sheet"] != sheet_full_name:
+                continue
+            self._fill_sub_row_lookups(row_frame, sheet_full_name, row_idx)
+            sub_df = self.manager.sub_dfs[sheet_full_name]
+            for col in schema.derived:
+                widget = row_frame._widgets.get(col)
+                if widget is None or isinstance(widget, tuple):
+                    continue
+                val = str(sub_df.at[row_idx, col])
+                col_ctx = row_frame._ctxs[col]
+                col_ctx["suppress"] = True
+                try:
+                    if row_frame._vars.get(col) is not None:
+                        row_frame._vars[col].set(val)
+                    elif getattr(widget, '_is_text_cell', False):
+                        widget.delete("1.0", "end")
+                        widget.insert("1.0", val)
+                finally:
+                    col_ctx["suppress"] = False
+            break
+
     def _show_error_in_tab(self, tab_name, message):
         """在 Tab 中顯示錯誤訊息"""
         frames = self.sub_table_frames.get(tab_name)
         if not frames:
             return
 
+        self._show_sub_table_widgets(tab_name)
         data_frame = frames['data']
 
         # 清空內容
@@ -1620,20 +3818,31 @@ class SheetEditor(ctk.CTkFrame):
             var = row_frame._vars.get(col)
             value = str(var.get()).strip() if var else ""
 
+        self._jump_to_ref(value)
+
+    def _jump_to_ref(self, value):
+        """
+        若 value 是某個母表的 PK，跳轉到該項目（全域 PK 登錄 O(1) 查詢）。
+        同一個 PK 存在於多張母表時，在游標處列出候選讓使用者選擇。
+        """
         if not value:
             return
+        owners = self.manager.pk_owners(value)
+        app = self.winfo_toplevel()
+        if not owners or not hasattr(app, '_jump_to_master'):
+            return
+        if len(owners) == 1:
+            app._jump_to_master(owners[0], value)
+            return
 
-        # 查找哪個母表的 PK 包含此值
-        for sheet_name, df in self.manager.master_dfs.items():
-            cfg = self.manager.config.get(sheet_name, {})
-            pk_key = cfg.get("primary_key", df.columns[0])
-            if pk_key in df.columns:
-                matches = df[df[pk_key].astype(str) == str(value)]
-                if not matches.empty:
-                    app = self.winfo_toplevel()
-                    if hasattr(app, '_jump_to_master'):
-                        app._jump_to_master(sheet_name, value)
-                    return
+        menu = tk.Menu(self, tearoff=0, bg=_CELL_BG, fg=_CELL_FG,
+                       activebackground=_CELL_FOCUS_BORDER, activeforeground="white",
+                       font=_CELL_FONT)
+        menu.add_command(label=f"{value} 存在於多張母表：", state="disabled")
+        for sheet_name in owners:
+            menu.add_command(label=f"跳轉到 {sheet_name}",
+                             command=lambda s=sheet_name: app._jump_to_master(s, value))
+        menu.post(*self.winfo_pointerxy())
 
     # ================== 右鍵選單 ==================
 
@@ -1644,14 +3853,21 @@ class SheetEditor(ctk.CTkFrame):
                        activebackground=_CELL_FOCUS_BORDER, activeforeground="white",
                        font=_CELL_FONT)
         menu.add_command(label="複製項目", command=self.copy_master_item)
+        menu.add_command(label="查看引用", command=self._show_usages)
         menu.add_command(label="上移 \u25b2", command=lambda: self.move_master_item(-1))
         menu.add_command(label="下移 \u25bc", command=lambda: self.move_master_item(1))
         menu.add_separator()
         menu.add_command(label="刪除", command=self.delete_master_item)
         menu.post(event.x_root, event.y_root)
 
-    def _show_sub_row_context_menu(self, event, row_frame, sheet_name):
-        """子表行右鍵選單"""
+    def _show_usages(self):
+        """列出引用目前項目 PK 的所有儲存格"""
+        app = self.winfo_toplevel()
+        if self.current_master_idx is not None and hasattr(app, '_show_usages'):
+            app._show_usages(self.df.at[self.current_master_idx, self.pk_key])
+
+    def _show_sub_row_context_menu(self, event, sheet_name, row_idx, jump_ref):
+        """子表行右鍵選單（jump_ref: 「跳轉引用」要執行的 callable）"""
         menu = tk.Menu(self, tearoff=0, bg=_CELL_BG, fg=_CELL_FG,
                        activebackground=_CELL_FOCUS_BORDER, activeforeground="white",
                        font=_CELL_FONT)
@@ -1660,39 +3876,34 @@ class SheetEditor(ctk.CTkFrame):
         menu.add_command(label="下移 \u25bc", command=lambda: self.move_sub_item(1))
         menu.add_separator()
 
-        # 跳轉引用：讀取 FK 值
-        del_ctx = row_frame._del_ctx
-        sub_short = sheet_name.split("#")[1] if "#" in sheet_name else ""
-        sub_cfg = self.cfg.get("sub_sheets", {}).get(sub_short, {})
-        fk_key = sub_cfg.get("foreign_key", self.pk_key)
-        # 嘗試取得 FK 欄位以外的可跳轉值
-        def _try_jump_ref():
-            for col, ctx in row_frame._ctxs.items():
-                widget = row_frame._widgets.get(col)
-                if widget is None:
-                    continue
-                if isinstance(widget, tuple):
-                    key_entry = widget[0]
-                    key_entry.configure(state="normal")
-                    val = key_entry.get().strip()
-                    key_entry.configure(state="disabled")
-                elif isinstance(widget, tk.Text):
-                    val = widget.get("1.0", "end-1c").strip()
-                elif hasattr(widget, 'get') and callable(widget.get):
-                    val = widget.get().strip()
-                else:
-                    var = row_frame._vars.get(col)
-                    val = str(var.get()).strip() if var else ""
-                if val:
-                    self._on_ref_double_click(col, row_frame)
-                    return
-
-        menu.add_command(label="跳轉引用", command=_try_jump_ref)
+        menu.add_command(label="跳轉引用", command=jump_ref)
         menu.add_separator()
         menu.add_command(label="刪除",
-                         command=lambda: self.delete_sub_item(del_ctx["sheet"], del_ctx["row_idx"]))
+                         command=lambda: self.delete_sub_item(sheet_name, row_idx))
         menu.post(event.x_root, event.y_root)
 
+    def _try_jump_ref_from_row(self, row_frame):
+        """widget 列：取第一個非空欄位值嘗試跳轉引用"""
+        for col, ctx in row_frame._ctxs.items():
+            widget = row_frame._widgets.get(col)
+            if widget is None:
+                continue
+            if isinstance(widget, tuple):
+                key_entry = widget[0]
+                key_entry.configure(state="normal")
+                val = key_entry.get().strip()
+                key_entry.configure(state="disabled")
+            elif isinstance(widget, tk.Text):
+                val = widget.get("1.0", "end-1c").strip()
+            elif hasattr(widget, 'get') and callable(widget.get):
+                val = widget.get().strip()
+            else:
+                var = row_frame._vars.get(col)
+                val = str(var.get()).strip() if var else ""
+            if val:
+                self._on_ref_double_click(col, row_frame)
+                return
+
     def _show_cls_context_menu(self, event, cls_val):
         """左側分類右鍵選單"""
         self.load_items_by_group(cls_val)
@@ -1707,6 +3918,7 @@ class SheetEditor(ctk.CTkFrame):
 
     def _open_batch_edit(self):
         """切換批次編輯模式"""
+        self._flush_edits()
         if self._batch_mode:
             self._exit_batch_mode()
             return
@@ -1716,13 +3928,13 @@ class SheetEditor(ctk.CTkFrame):
             return
 
         self._batch_mode = True
-        self._batch_checks.clear()
+        self._batch_checked.clear()
 
         # 顯示批次工具列
         if self._batch_bar:
             self._batch_bar.destroy()
         bar = ctk.CTkFrame(self.frame_mid, height=30, fg_color="#2a4a6b")
-        bar.pack(fill="x", padx=2, pady=(0, 2), before=self.scroll_items)
+        bar.pack(fill="x", padx=2, pady=(0, 2), before=self.item_list)
         self._batch_bar = bar
 
         ctk.CTkButton(bar, text="全選", width=45, height=24,
@@ -1734,71 +3946,31 @@ class SheetEditor(ctk.CTkFrame):
         ctk.CTkButton(bar, text="完成", width=45, height=24, fg_color="gray",
                       command=self._exit_batch_mode).pack(side="right", padx=2)
 
-        # 重建項目清單（帶勾選框）
-        for btn in self.item_buttons.values():
-            btn.destroy()
-        self.item_buttons.clear()
-        self._rebuild_items_with_checks()
+        # 項目清單切換為勾選框外觀（只重填可視範圍）
+        self.item_list.refresh()
 
     def _exit_batch_mode(self):
         """退出批次編輯模式"""
         self._batch_mode = False
-        self._batch_checks.clear()
+        self._batch_checked.clear()
         if self._batch_bar:
             self._batch_bar.destroy()
             self._batch_bar = None
 
-        # 重建正常項目清單
-        for btn in self.item_buttons.values():
-            btn.destroy()
-        self.item_buttons.clear()
-        if self.current_cls_val is not None:
-            self.load_items_by_group(self.current_cls_val)
-
-    def _rebuild_items_with_checks(self):
-        """在批次模式下重建帶勾選框的項目清單"""
-        if not self.current_cls_val:
-            return
-        filter_df = self.df[self.df[self.cls_key] == self.current_cls_val]
-
-        for idx, row in filter_df.iterrows():
-            display_name = f"{row[self.pk_key]}"
-            if 'Name' in row.index and self.manager.text_dict:
-                text_dict_name = self.manager.text_dict.get(row['Name'])
-                if text_dict_name:
-                    display_name = text_dict_name["value"]
-
-            rf = tk.Frame(self.scroll_items.interior, bg=_BG)
-            rf.pack(fill="x", pady=1, padx=2)
-
-            var = tk.BooleanVar(value=False)
-            self._batch_checks[idx] = var
-
-            chk = tk.Checkbutton(rf, variable=var, bg=_BG,
-                                 activebackground=_BG, selectcolor=_CELL_BG)
-            chk.pack(side="left", padx=(2, 0))
-
-            lbl = tk.Label(rf, text=display_name, bg=_BG, fg=_CELL_FG,
-                           font=_CELL_FONT, anchor="w", cursor="hand2",
-                           wraplength=140)
-            lbl.pack(side="left", fill="x", expand=True, padx=4)
-
-            # 點擊 label 也切換勾選
-            lbl.bind("<Button-1>", lambda e, v=var: v.set(not v.get()))
-
-            self.item_buttons[idx] = rf
+        # 恢復正常項目清單外觀
+        self.item_list.refresh()
 
     def _batch_select_all(self):
-        for var in self._batch_checks.values():
-            var.set(True)
+        self._batch_checked = set(self._item_indices)
+        self.item_list.refresh()
 
     def _batch_deselect_all(self):
-        for var in self._batch_checks.values():
-            var.set(False)
+        self._batch_checked.clear()
+        self.item_list.refresh()
 
     def _batch_apply_dialog(self):
         """彈出欄位+值選擇視窗，套用到所有勾選項"""
-        selected = [idx for idx, var in self._batch_checks.items() if var.get()]
+        selected = [idx for idx in self._item_indices if idx in self._batch_checked]
         if not selected:
             messagebox.showwarning("提示", "請先勾選至少一個項目")
             return
@@ -1809,22 +3981,33 @@ class SheetEditor(ctk.CTkFrame):
         """清理資源"""
         # suppress 所有 callback 防止 stale 呼叫
         self._master_suppress = True
+        self._scheduler.cancel_all()
+        if self._prefetch_timer is not None:
+            self.after_cancel(self._prefetch_timer)
+            self._prefetch_timer = None
+        self._sub_prefetch.clear()
 
         # 清理子表：suppress all contexts to prevent stale callbacks
         for tab_name, active_rows in self.sub_table_active_rows.items():
             for row_frame in active_rows:
                 for ctx in getattr(row_frame, '_ctxs', {}).values():
                     ctx["suppress"] = True
+        for tab_name in list(self.sub_table_frames):
+            self._forget_tab_rows(tab_name)
 
         # 清空所有緩存
         self.cls_buttons.clear()
-        self.item_buttons.clear()
+        self._item_indices = []
+        self._item_labels = []
+        self._item_pos = {}
         self.master_fields.clear()
         self.master_field_vars.clear()
         self.trace_ids.clear()
+        self._master_shown.clear()
+        self._master_lookups.clear()
         self.sub_table_frames.clear()
+        self._sub_tab_rendered.clear()
         self.sub_table_headers.clear()
-        self.sub_table_row_pools.clear()
         self.sub_table_active_rows.clear()
         self.current_image_ref = None
 
@@ -2096,6 +4279,10 @@ class ConfigEditorWindow(ctk.CTkToplevel):
                 command=on_toggle_link
             ).pack(side="right", padx=6)
 
+            # ---------- 衍生欄位公式 / 查表 ----------
+            self._formula_entry(line, cfg["columns"][col])
+            self._lookup_entry(line, cfg["columns"][col])
+
             # ---------- type 選單 ----------
             t_menu = ctk.CTkOptionMenu(
                 line,
@@ -2164,6 +4351,10 @@ class ConfigEditorWindow(ctk.CTkToplevel):
                         command=on_toggle_link
                     ).pack(side="right", padx=6)
 
+                    # ---------- 衍生欄位公式（可用 [master.欄位] 引用母表列）----------
+                    self._formula_entry(s_line, cfg["sub_sheets"][short]["columns"][s_col])
+                    self._lookup_entry(s_line, cfg["sub_sheets"][short]["columns"][s_col])
+
                     # ---------- type 選單 ----------
                     st_menu = ctk.CTkOptionMenu(
                         s_line,
@@ -2186,6 +4377,39 @@ class ConfigEditorWindow(ctk.CTkToplevel):
         if val == "enum":
             self._ask_enum_options(self.manager.config[m]["sub_sheets"][s]["columns"][col])
 
+    @staticmethod
+    def _formula_entry(line, col_conf):
+        """衍生欄位公式輸入框（例如 Atk*1.5）；留空表示一般欄位"""
+        var = ctk.StringVar(value=col_conf.get("formula", ""))
+
+        def on_change(*_):
+            formula = var.get().strip()
+            if formula:
+                col_conf["formula"] = formula
+            else:
+                col_conf.pop("formula", None)
+
+        var.trace_add("write", on_change)
+        ctk.CTkEntry(line, textvariable=var, width=140,
+                     placeholder_text="公式（選填）").pack(side="right", padx=6)
+
+    @staticmethod
+    def _lookup_entry(line, col_conf):
+        """查表設定輸入框：「母表:欄位」（例如 skill.json:Name），在此欄旁顯示被引用列的該欄值"""
+        lookup = col_conf.get("lookup") or {}
+        var = ctk.StringVar(value=f"{lookup['sheet']}:{lookup['column']}" if lookup else "")
+
+        def on_change(*_):
+            sheet, sep, column = var.get().strip().rpartition(":")
+            if sep and sheet.strip() and column.strip():
+                col_conf["lookup"] = {"sheet": sheet.strip(), "column": column.strip()}
+            else:
+                col_conf.pop("lookup", None)
+
+        var.trace_add("write", on_change)
+        ctk.CTkEntry(line, textvariable=var, width=140,
+                     placeholder_text="查表 母表:欄位（選填）").pack(side="right", padx=6)
+
     def _ask_enum_options(self, col_conf):
         """彈出視窗讓使用者輸入 enum 選項（逗號分隔）"""
         current = col_conf.get("options", [])
@@ -2214,26 +4438,36 @@ class ConfigEditorWindow(ctk.CTkToplevel):
 
     def save_and_close(self):
         self.manager.save_config()
+        # 公式可能改變：重算衍生欄位，無法使用的公式列出提醒
+        if self.manager.recompute_derived():
+            self.manager.dirty = True
+        if self.manager.derived_errors:
+            lines = [f"{sheet} / {col}：{msg}" for (sheet, col), msg in self.manager.derived_errors.items()]
+            messagebox.showwarning("公式錯誤", "以下衍生欄位的公式無法使用：\n" + "\n".join(lines), parent=self)
         self.destroy()
         if hasattr(self.master, "refresh_ui"):
             self.master.refresh_ui()
 
 class SearchResultWindow(ctk.CTkToplevel):
-    """全域搜尋結果視窗（非模態，美化版）"""
+    """全域搜尋結果視窗（非模態，虛擬化清單：只繪製可視範圍的結果列）"""
 
     _TAG_MASTER_BG = "#1a5c2a"  # 母表標籤底色（綠）
     _TAG_SUB_BG = "#8b6914"     # 子表標籤底色（金）
     _TAG_FG = "#ffffff"
     _HOVER_BG = "#3a5070"       # 滑鼠懸停底色
     _MATCH_FG = "#7ec8e3"       # 匹配值高亮色
+    _ROW_H = 32                 # 每列高度 (px)
 
-    def __init__(self, parent, results, jump_callback, query=""):
+    def __init__(self, parent, results, jump_callback, query="", title="搜尋結果", query_label="關鍵字"):
+        """results: 支援 len() 與索引的結果序列（如 DataManager.search 回傳的 SearchCursor）"""
         super().__init__(parent)
-        self.title("搜尋結果")
+        self.title(title)
         self.geometry("750x520")
         self.transient(parent)
 
         self._jump_callback = jump_callback
+        self._results = results
+        self._hover = None
 
         # ── 頂部標題列 ──
         header = ctk.CTkFrame(self, fg_color="#333333", corner_radius=0)
@@ -2242,115 +4476,245 @@ class SearchResultWindow(ctk.CTkToplevel):
                      font=("微軟正黑體", 14, "bold"),
                      text_color="#7ec8e3").pack(side="left", padx=10, pady=8)
         if query:
-            ctk.CTkLabel(header, text=f"關鍵字: {query}",
+            ctk.CTkLabel(header, text=f"{query_label}: {query}",
                          font=("微軟正黑體", 11),
                          text_color="#aaaaaa").pack(side="left", padx=10)
         ctk.CTkButton(header, text="關閉", width=50, height=26,
                       fg_color="gray", command=self.destroy).pack(side="right", padx=10, pady=6)
 
-        # ── 結果列表（CTkScrollableFrame — 一次性建立，非迴圈熱路徑） ──
-        scroll = ctk.CTkScrollableFrame(self, fg_color=_BG)
-        scroll.pack(fill="both", expand=True, padx=8, pady=(4, 8))
+        # ── 結果列表（VirtualList — 只為可視範圍建立 canvas 列，結果列向游標延遲取值） ──
+        self._list = VirtualList(self, self._ROW_H, self._make_slot, self._fill_slot)
+        self._list.pack(fill="both", expand=True, padx=8, pady=(4, 8))
+
+        self._list.bind_row("<Button-1>", self._on_click)
+        self._list.canvas.bind("<Motion>", self._on_motion)
+        self._list.canvas.bind("<Leave>", self._on_leave)
+        self._list.canvas.configure(cursor="hand2")
+        self._list.set_count(len(results))
+
+    def _make_slot(self, canvas, tag):
+        return {
+            "bg": canvas.create_rectangle(0, 0, 0, 0, outline="#444444", tags=(tag,)),
+            "tag_bg": canvas.create_rectangle(0, 0, 0, 0, width=0, tags=(tag,)),
+            "tag_text": canvas.create_text(0, 0, fill=self._TAG_FG, font=("微軟正黑體", 9, "bold"),
+                                           tags=(tag,)),
+            "sheet": canvas.create_text(0, 0, anchor="w", fill="#b0b0b0",
+                                        font=("微軟正黑體", 10), tags=(tag,)),
+            "match": canvas.create_text(0, 0, anchor="w", fill=self._MATCH_FG,
+                                        font=_CELL_FONT, tags=(tag,)),
+            "row_no": canvas.create_text(0, 0, anchor="e", fill="#777777",
+                                         font=("Segoe UI", 9), tags=(tag,)),
+        }
+
+    def _fill_slot(self, slot, index, y, width):
+        canvas = self._list.canvas
+        sheet_name, is_sub, row_idx, match_info = self._results[index]
 
-        for i, (sheet_name, is_sub, row_idx, match_info) in enumerate(results):
-            row_bg = _ROW_EVEN if i % 2 == 0 else _ROW_ODD
+        if index == self._hover:
+            row_bg = self._HOVER_BG
+        else:
+            row_bg = _ROW_EVEN if index % 2 == 0 else _ROW_ODD
+        mid = y + self._ROW_H / 2
+
+        canvas.coords(slot["bg"], 4, y + 2, width - 4, y + self._ROW_H - 2)
+        canvas.itemconfigure(slot["bg"], fill=row_bg)
+
+        # 標籤 (母表/子表)
+        tag_text, tag_bg = ("子表", self._TAG_SUB_BG) if is_sub else ("母表", self._TAG_MASTER_BG)
+        canvas.coords(slot["tag_bg"], 10, y + 7, 50, y + self._ROW_H - 7)
+        canvas.itemconfigure(slot["tag_bg"], fill=tag_bg)
+        canvas.coords(slot["tag_text"], 30, mid)
+        canvas.itemconfigure(slot["tag_text"], text=tag_text)
+
+        # 表名
+        sheet_display = sheet_name.replace("#", " > ") if "#" in sheet_name else sheet_name
+        canvas.coords(slot["sheet"], 58, mid)
+        canvas.itemconfigure(slot["sheet"], text=sheet_display)
+        sheet_bbox = canvas.bbox(slot["sheet"])
+        match_x = (sheet_bbox[2] if sheet_bbox else 58) + 12
+
+        # 匹配內容（最多 2 組 col=val）
+        match_strs = []
+        for col, val in list(match_info.items())[:2]:
+            display_val = val if len(val) <= 40 else val[:37] + "..."
+            match_strs.append(f"{col}={display_val}")
+        canvas.coords(slot["match"], match_x, mid)
+        canvas.itemconfigure(slot["match"], text="  |  ".join(match_strs))
+
+        # 行號
+        canvas.coords(slot["row_no"], width - 12, mid)
+        canvas.itemconfigure(slot["row_no"], text=f"#{row_idx}")
+
+    def _on_motion(self, event):
+        i = self._list.index_at(event.y)
+        if i != self._hover:
+            self._hover = i
+            self._list.refresh()
+
+    def _on_leave(self, _event=None):
+        if self._hover is not None:
+            self._hover = None
+            self._list.refresh()
+
+    def _on_click(self, index, _event):
+        sheet_name, is_sub, row_idx, _ = self._results[index]
+        self._jump_callback(sheet_name, is_sub, row_idx)
+
+
+class GotoPalette(ctk.CTkToplevel):
+    """Ctrl+P 快速跳轉面板：模糊比對所有母表的 PK 與顯示名稱，選取後跳轉到該項目"""
+
+    _ROW_H = 28
+    _LIMIT = 50
+    _SELECT_BG = "#1F6AA5"
+
+    def __init__(self, parent, manager, jump_callback):
+        super().__init__(parent)
+        self.title("跳轉到項目")
+        self.transient(parent)
+        self.resizable(False, False)
+        x = parent.winfo_rootx() + max(0, (parent.winfo_width() - 560) // 2)
+        y = parent.winfo_rooty() + 60
+        self.geometry(f"560x380+{x}+{y}")
 
-            rf = tk.Frame(scroll, bg=row_bg, cursor="hand2",
-                          highlightthickness=1, highlightbackground="#444444")
-            rf.pack(fill="x", pady=2, padx=4, ipady=3)
+        self._manager = manager
+        self._jump_callback = jump_callback
+        self._results = []  # [(sheet_name, pk, name)]
+        self._selected = 0
+
+        self._var = tk.StringVar()
+        self._entry = tk.Entry(self, textvariable=self._var,
+                               bg=_CELL_BG, fg=_CELL_FG, insertbackground=_CELL_FG,
+                               relief="flat", highlightthickness=1,
+                               highlightbackground=_CELL_BORDER, highlightcolor=_CELL_FOCUS_BORDER,
+                               font=("Segoe UI", 13))
+        self._entry.pack(fill="x", padx=8, pady=(8, 4), ipady=4)
+
+        self._list = VirtualList(self, self._ROW_H, self._make_slot, self._fill_slot)
+        self._list.pack(fill="both", expand=True, padx=8, pady=(0, 8))
+        self._list.canvas.configure(cursor="hand2")
+        self._list.bind_row("<Button-1>", lambda i, e: self._choose(i))
+
+        self._var.trace_add("write", lambda *args: self._on_query())
+        self._entry.bind("<Down>", lambda e: self._move(1))
+        self._entry.bind("<Up>", lambda e: self._move(-1))
+        self._entry.bind("<Return>", lambda e: self._choose(self._selected))
+        self.bind("<Escape>", lambda e: self.destroy())
+
+        self.after(50, self._entry.focus_force)
+        self.after_idle(manager.prepare_goto_index)
+
+    def _make_slot(self, canvas, tag):
+        return {
+            "bg": canvas.create_rectangle(0, 0, 0, 0, width=0, tags=(tag,)),
+            "pk": canvas.create_text(0, 0, anchor="w", fill="white",
+                                     font=("Segoe UI", 11, "bold"), tags=(tag,)),
+            "name": canvas.create_text(0, 0, anchor="w", fill=_PANEL_HEADER_FG,
+                                       font=_CELL_FONT, tags=(tag,)),
+            "sheet": canvas.create_text(0, 0, anchor="e", fill="#888888",
+                                        font=("Segoe UI", 9), tags=(tag,)),
+        }
 
-            # 標籤 (母表/子表)
-            if is_sub:
-                tag_text, tag_bg = "子表", self._TAG_SUB_BG
-            else:
-                tag_text, tag_bg = "母表", self._TAG_MASTER_BG
-
-            tag_lbl = tk.Label(rf, text=f" {tag_text} ", bg=tag_bg, fg=self._TAG_FG,
-                               font=("微軟正黑體", 9, "bold"), padx=4, pady=1)
-            tag_lbl.pack(side="left", padx=(6, 4), pady=2)
-
-            # 表名
-            sheet_display = sheet_name.replace("#", " > ") if "#" in sheet_name else sheet_name
-            tk.Label(rf, text=sheet_display, bg=row_bg, fg="#b0b0b0",
-                     font=("微軟正黑體", 10), anchor="w").pack(side="left", padx=(0, 8))
-
-            # 匹配內容（最多 2 組 col=val）
-            match_strs = []
-            for col, val in list(match_info.items())[:2]:
-                display_val = val if len(val) <= 40 else val[:37] + "..."
-                match_strs.append(f"{col}={display_val}")
-
-            tk.Label(rf, text="  |  ".join(match_strs), bg=row_bg,
-                     fg=self._MATCH_FG, font=_CELL_FONT, anchor="w").pack(
-                side="left", fill="x", expand=True, padx=4)
-
-            # 行號
-            tk.Label(rf, text=f"#{row_idx}", bg=row_bg, fg="#777777",
-                     font=("Segoe UI", 9)).pack(side="right", padx=(4, 8))
-
-            # hover 效果 + 點擊
-            def _enter(e, f=rf):
-                f.configure(bg=self._HOVER_BG)
-                for w in f.winfo_children():
-                    try:
-                        w.configure(bg=self._HOVER_BG)
-                    except tk.TclError:
-                        pass
-
-            def _leave(e, f=rf, bg=row_bg):
-                f.configure(bg=bg)
-                for w in f.winfo_children():
-                    try:
-                        # tag label 保持原色
-                        if getattr(w, '_is_tag', False):
-                            pass
-                        else:
-                            w.configure(bg=bg)
-                    except tk.TclError:
-                        pass
-
-            def _on_click(e, s=sheet_name, sub=is_sub, idx=row_idx):
-                self._jump_callback(s, sub, idx)
-
-            tag_lbl._is_tag = True  # 標記不被 hover 改色
-
-            for w in [rf] + rf.winfo_children():
-                w.bind("<Enter>", _enter)
-                w.bind("<Leave>", _leave)
-                w.bind("<Button-1>", _on_click)
+    def _fill_slot(self, slot, index, y, width):
+        canvas = self._list.canvas
+        sheet_name, pk, name = self._results[index]
+        if index == self._selected:
+            row_bg = self._SELECT_BG
+        else:
+            row_bg = _ROW_EVEN if index % 2 == 0 else _ROW_ODD
+        mid = y + self._ROW_H / 2
+
+        canvas.coords(slot["bg"], 0, y, width, y + self._ROW_H)
+        canvas.itemconfigure(slot["bg"], fill=row_bg)
+        canvas.coords(slot["pk"], 10, mid)
+        canvas.itemconfigure(slot["pk"], text=pk)
+        pk_bbox = canvas.bbox(slot["pk"])
+        canvas.coords(slot["name"], (pk_bbox[2] if pk_bbox else 10) + 14, mid)
+        canvas.itemconfigure(slot["name"], text=name if name != pk else "")
+        canvas.coords(slot["sheet"], width - 10, mid)
+        canvas.itemconfigure(slot["sheet"], text=sheet_name)
+
+    def _on_query(self):
+        self._results = self._manager.goto_search(self._var.get(), limit=self._LIMIT)
+        self._selected = 0
+        self._list.set_count(len(self._results))
+
+    def _move(self, step):
+        if not self._results:
+            return "break"
+        self._selected = max(0, min(len(self._results) - 1, self._selected + step))
+        self._list.see(self._selected)
+        self._list.refresh()
+        return "break"
+
+    def _choose(self, index):
+        if not (0 <= index < len(self._results)):
+            return
+        sheet_name, pk, _ = self._results[index]
+        self.destroy()
+        self._jump_callback(sheet_name, pk)
 
 
 class BatchEditApplyWindow(ctk.CTkToplevel):
-    """批次編輯 — 選擇欄位與新值（勾選模式觸發）"""
+    """
+    批次編輯 — 選擇目標表、欄位與新值（勾選模式觸發）
+    新值以 "=" 開頭時視為運算式（例如 =Damage*1.1、=[Cool Down]-1），對每列以自己的欄位計算；
+    目標為子表時套用到勾選項目底下的所有子表列。
+    """
+    _PREVIEW_LIMIT = 300
+
     def __init__(self, parent_editor, selected_indices):
         super().__init__(parent_editor.winfo_toplevel())
         self.title("批次修改")
-        self.geometry("400x180")
+        self.geometry("560x440")
         self.transient(parent_editor.winfo_toplevel())
         self.grab_set()
 
         self.editor = parent_editor
         self.selected = selected_indices
-
-        ctk.CTkLabel(self, text=f"將修改 {len(selected_indices)} 筆項目",
-                     font=("微軟正黑體", 13, "bold")).pack(pady=(10, 5))
+        manager = parent_editor.manager
+
+        # 目標表：母表 + 此母表的子表（顯示短名）
+        self._targets = {"母表": parent_editor.sheet_name}
+        for sub_key in manager.sub_dfs:
+            if sub_key.startswith(parent_editor.sheet_name + "#"):
+                self._targets[f"子表: {sub_key.split('#', 1)[1]}"] = sub_key
+
+        self._summary = ctk.CTkLabel(self, text="", font=("微軟正黑體", 13, "bold"))
+        self._summary.pack(pady=(10, 5))
+
+        sheet_frame = ctk.CTkFrame(self, fg_color="transparent")
+        sheet_frame.pack(fill="x", padx=20, pady=5)
+        ctk.CTkLabel(sheet_frame, text="目標表:").pack(side="left")
+        self.sheet_var = ctk.StringVar(value="母表")
+        ctk.CTkOptionMenu(sheet_frame, values=list(self._targets), variable=self.sheet_var,
+                          command=lambda _: self._on_target_change()).pack(
+            side="left", padx=10, fill="x", expand=True)
 
         # 目標欄位
         field_frame = ctk.CTkFrame(self, fg_color="transparent")
         field_frame.pack(fill="x", padx=20, pady=5)
         ctk.CTkLabel(field_frame, text="目標欄位:").pack(side="left")
-        cols = list(parent_editor.df.columns)
-        self.col_var = ctk.StringVar(value=cols[0] if cols else "")
-        ctk.CTkOptionMenu(field_frame, values=cols, variable=self.col_var).pack(
-            side="left", padx=10, fill="x", expand=True)
+        self.col_var = ctk.StringVar(value="")
+        self._col_menu = ctk.CTkOptionMenu(field_frame, values=[""], variable=self.col_var,
+                                           command=lambda _: self._preview())
+        self._col_menu.pack(side="left", padx=10, fill="x", expand=True)
 
-        # 新的值
+        # 新的值 / 運算式
         val_frame = ctk.CTkFrame(self, fg_color="transparent")
         val_frame.pack(fill="x", padx=20, pady=5)
         ctk.CTkLabel(val_frame, text="新的值:").pack(side="left")
-        self.val_entry = ctk.CTkEntry(val_frame)
+        self.val_entry = ctk.CTkEntry(val_frame, placeholder_text="固定值，或 =Damage*1.1 這類運算式")
         self.val_entry.pack(side="left", padx=10, fill="x", expand=True)
         self.val_entry.bind("<Return>", lambda e: self._apply())
+        ctk.CTkButton(val_frame, text="預覽", width=60, command=self._preview).pack(side="left")
+
+        # 舊值 → 新值預覽
+        self._text = tk.Text(self, bg=_CELL_BG, fg=_CELL_FG, relief="flat", height=10,
+                             font=_CELL_FONT, wrap="none", padx=6, pady=4)
+        self._text.pack(fill="both", expand=True, padx=20, pady=5)
+        self._text.tag_configure("same", foreground="gray")
+        self._text.tag_configure("error", foreground="#FF6666")
 
         # 按鈕
         btn_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -2360,6 +4724,73 @@ class BatchEditApplyWindow(ctk.CTkToplevel):
         ctk.CTkButton(btn_frame, text="取消", fg_color="gray",
                       command=self.destroy).pack(side="left", padx=10)
 
+        self._on_target_change()
+
+    def _target(self):
+        return self._targets[self.sheet_var.get()]
+
+    def _target_rows(self):
+        """目標表要修改的列：母表為勾選列；子表為勾選項目底下的所有子表列"""
+        editor = self.editor
+        sheet = self._target()
+        if sheet == editor.sheet_name:
+            return list(self.selected)
+        fk = editor.manager.schema(sheet).foreign_key or editor.pk_key
+        if fk not in editor.manager.sub_dfs[sheet].columns:
+            return []
+        keys = [editor.df.at[idx, editor.pk_key] for idx in self.selected]
+        return editor.manager.rows_with_values(sheet, fk, keys)
+
+    def _on_target_change(self):
+        sheet = self._target()
+        df = self.editor.manager.sub_dfs[sheet] if "#" in sheet else self.editor.df
+        derived = self.editor.manager.schema(sheet).derived
+        cols = [c for c in df.columns if c not in derived]
+        self._col_menu.configure(values=cols or [""])
+        if self.col_var.get() not in cols:
+            self.col_var.set(cols[0] if cols else "")
+        self._rows = self._target_rows()
+        self._summary.configure(text=f"將修改 {len(self._rows)} 列（勾選 {len(self.selected)} 筆項目）")
+        self._preview()
+
+    def _preview(self):
+        """列出前幾列的 舊值 → 新值；運算式錯誤顯示在預覽區"""
+        self._text.configure(state="normal")
+        self._text.delete("1.0", "end")
+        col = self.col_var.get()
+        value = self.val_entry.get()
+        if not col or not len(self._rows):
+            self._text.configure(state="disabled")
+            return
+        manager = self.editor.manager
+        sheet = self._target()
+        rows = self._rows[:self._PREVIEW_LIMIT]
+        try:
+            if value.startswith("="):
+                new_values = manager.evaluate_expression(sheet, rows, col, value)
+            else:
+                new_values = [value] * len(rows)
+        except ExpressionError as e:
+            self._text.insert("end", str(e), "error")
+            self._text.configure(state="disabled")
+            return
+
+        old_values = manager.row_values(sheet, rows, [col])
+        if manager.schema(sheet).column(col).linked:
+            # 連結欄位修改的是 Key 背後的文字，預覽也比對文字
+            old_values = [(str(manager.get_text_value(key)),) for (key,) in old_values]
+        lines = []
+        for row_idx, (old,), new in zip(rows, old_values, new_values):
+            if new is None:
+                lines.append((f"#{row_idx}\t{old}  （無法計算，保持原值）\n", "error"))
+            else:
+                lines.append((f"#{row_idx}\t{old} → {new}\n", "same" if str(new) == old else ""))
+        for line, tag in lines:
+            self._text.insert("end", line, tag)
+        if len(self._rows) > len(rows):
+            self._text.insert("end", f"…另有 {len(self._rows) - len(rows)} 列\n", "same")
+        self._text.configure(state="disabled")
+
     def _apply(self):
         col = self.col_var.get()
         value = self.val_entry.get()
@@ -2369,18 +4800,115 @@ class BatchEditApplyWindow(ctk.CTkToplevel):
         editor = self.editor
         manager = editor.manager
 
-        for idx in self.selected:
-            manager.update_cell(False, editor.sheet_name, idx, col, value)
-        manager.dirty = True
+        # 一次向量化寫入 + 單一復原記錄
+        try:
+            manager.bulk_update(self._target(), self._rows, col, value)
+        except ExpressionError as e:
+            messagebox.showerror("運算式錯誤", str(e), parent=self)
+            return
 
         self.destroy()
 
-        # 退出批次模式並刷新
+        # 退出批次模式並刷新（清單名稱/分類可能被改到；編輯區只更新有差異的欄位）
         editor._exit_batch_mode()
+        editor.load_items_by_group(editor.current_cls_val)
         if editor.current_master_idx is not None:
             editor.load_editor(editor.current_master_idx)
 
 
+class IconReportWindow(ctk.CTkToplevel):
+    """圖示檢查 — 列出各母表缺少圖示的項目與沒有對應 PK 的圖示檔"""
+
+    def __init__(self, parent, manager):
+        super().__init__(parent)
+        self.title("圖示檢查")
+        self.geometry("620x520")
+        self.transient(parent)
+        self.manager = manager
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=10, pady=(10, 5))
+        self._summary = ctk.CTkLabel(bar, text="", anchor="w")
+        self._summary.pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(bar, text="重新掃描", width=80, command=self._rescan).pack(side="right")
+
+        self._text = tk.Text(self, bg=_CELL_BG, fg=_CELL_FG, relief="flat",
+                             font=_CELL_FONT, wrap="none", padx=6, pady=4)
+        self._text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self._text.tag_configure("sheet", font=("微軟正黑體", 11, "bold"), foreground=_PANEL_HEADER_FG)
+        self._text.tag_configure("head", foreground="#E0A040")
+        self.refresh()
+
+    def _rescan(self):
+        _ICONS.clear()
+        self.refresh()
+
+    def refresh(self):
+        manager = self.manager
+        lines = []  # (文字, tag)
+        total_missing = total_orphans = 0
+        for sheet_name, df in manager.master_dfs.items():
+            cfg = manager.config.get(sheet_name, {})
+            if not cfg.get("use_icon", False):
+                continue
+            schema = manager.schema(sheet_name)
+            base = cfg.get("image_path", "")
+            pairs = manager.row_values(sheet_name, range(len(df)),
+                                       [schema.primary_key, schema.classification_key])
+            missing, orphans = _ICONS.report(base, pairs)
+            total_missing += len(missing)
+            total_orphans += len(orphans)
+
+            lines.append((f"{sheet_name}  （{base or '未設定圖示資料夾'}）\n", "sheet"))
+            lines.append((f"  缺少圖示 ({len(missing)})\n", "head"))
+            lines.extend((f"    {pk}    [{cls_val}]\n", None) for pk, cls_val in missing)
+            lines.append((f"  未使用的圖示 ({len(orphans)})\n", "head"))
+            lines.extend((f"    {path}\n", None) for path in orphans)
+            lines.append(("\n", None))
+
+        self._summary.configure(text=f"缺少圖示 {total_missing} 筆，未使用的圖示 {total_orphans} 個"
+                                if lines else "沒有啟用圖示的母表")
+        self._text.configure(state="normal")
+        self._text.delete("1.0", "end")
+        for text, tag in lines:
+            self._text.insert("end", text, tag or ())
+        self._text.configure(state="disabled")
+
+
+class PkReportWindow(ctk.CTkToplevel):
+    """PK 檢查 — 列出同時存在於多張母表、或在同一張母表重複的 PK（跨表引用無法確定指向哪一筆）"""
+
+    def __init__(self, parent, manager):
+        super().__init__(parent)
+        self.title("PK 檢查")
+        self.geometry("560x480")
+        self.transient(parent)
+        self.manager = manager
+
+        bar = ctk.CTkFrame(self, fg_color="transparent")
+        bar.pack(fill="x", padx=10, pady=(10, 5))
+        self._summary = ctk.CTkLabel(bar, text="", anchor="w")
+        self._summary.pack(side="left", fill="x", expand=True)
+        ctk.CTkButton(bar, text="重新整理", width=80, command=self.refresh).pack(side="right")
+
+        self._text = tk.Text(self, bg=_CELL_BG, fg=_CELL_FG, relief="flat",
+                             font=_CELL_FONT, wrap="none", padx=6, pady=4)
+        self._text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self._text.tag_configure("head", foreground="#E0A040")
+        self.refresh()
+
+    def refresh(self):
+        ambiguous = self.manager.ambiguous_pks()
+        self._summary.configure(text=f"有歧義的 PK {len(ambiguous)} 個" if ambiguous else "沒有重複的 PK")
+        self._text.configure(state="normal")
+        self._text.delete("1.0", "end")
+        for key, owners in ambiguous.items():
+            self._text.insert("end", f"{key}\n", "head")
+            for sheet_name, count in owners.items():
+                self._text.insert("end", f"    {sheet_name}" + (f"  ×{count}" if count > 1 else "") + "\n")
+        self._text.configure(state="disabled")
+
+
 class App(ctk.CTk):
     """ 主畫面 """
     def __init__(self):
@@ -2399,6 +4927,9 @@ class App(ctk.CTk):
         # self.geometry("1280x720")
 
         self.manager = DataManager()
+        self.edit_buffer = EditBuffer(self)
+        self.manager.flush_hook = self.edit_buffer.flush
+        _THUMBS.attach(self)
 
         # 初始化暗色捲軸主題
         _init_dark_scrollbar_style()
@@ -2410,6 +4941,10 @@ class App(ctk.CTk):
         ctk.CTkButton(self.top_bar, text="讀取 Excel", command=self.load_file).pack(side="left", padx=5)
         ctk.CTkButton(self.top_bar, text="儲存 Excel", command=self.save_file, fg_color="green").pack(side="left", padx=5)
         ctk.CTkButton(self.top_bar, text="搜尋", width=60, command=self._show_search_bar).pack(side="left", padx=5)
+        ctk.CTkButton(self.top_bar, text="跳轉", width=60, command=self._show_goto_palette).pack(side="left", padx=5)
+        ctk.CTkButton(self.top_bar, text="整表檢視", width=80, command=self._toggle_table_view).pack(side="left", padx=5)
+        ctk.CTkButton(self.top_bar, text="圖示檢查", width=80, command=self._show_icon_report).pack(side="left", padx=5)
+        ctk.CTkButton(self.top_bar, text="PK 檢查", width=70, command=self._show_pk_report).pack(side="left", padx=5)
         ctk.CTkButton(self.top_bar, text="配置設定", command=self.open_configwnd, fg_color="gray").pack(side="right", padx=5)
 
         # === 搜尋列 (Ctrl+F) ===
@@ -2432,6 +4967,10 @@ class App(ctk.CTk):
                      text_color="#666666").pack(side="right", padx=10)
 
         self.bind_all("<Control-f>", lambda e: self._show_search_bar())
+        self.bind_all("<Control-p>", lambda e: self._show_goto_palette())
+        self.bind_all("<Control-z>", lambda e: self._undo())
+        self.bind_all("<Control-y>", lambda e: self._redo())
+        self._goto_palette = None
         self._search_entry.bind("<Escape>", lambda e: self._hide_search_bar())
 
         # 內容區 (Tabview 存放不同的母表)
@@ -2440,21 +4979,34 @@ class App(ctk.CTk):
 
         self.sheet_editors = []
         self._editor_map = {}  # {sheet_name: SheetEditor or None} 延遲載入追蹤
+
+        # 閒置預建：使用者一段時間沒有操作時，分段建立其餘 SheetEditor
+        self._idle_scheduler = SliceScheduler(self)
+        self._prebuild_steps = {}  # {sheet_name: 尚未跑完的 build_steps generator}
+        self._prebuild_timer = None
+        self._io_busy = False  # 背景執行緒正在載入/存檔：期間不得預建（DataFrame 會被替換）
+        self._tab_usage = {}  # {sheet_name: 切換次數}，決定預建順序
         # 全域滑鼠滾輪路由 (根據游標位置決定捲動目標)
         self.bind_all("<MouseWheel>", self._route_mousewheel)
         self.bind_all("<Shift-MouseWheel>", self._route_shift_mousewheel)
+        # 任何操作都會中斷閒置預建（add="+" 保留既有的 bind_all）
+        # （滾輪由 _route_mousewheel 通知，因為它回傳 "break" 會略過同一 tag 後面的 script）
+        for seq in ("<KeyPress>", "<ButtonPress>"):
+            self.bind_all(seq, self._on_user_activity, add="+")
 
         # 關閉視窗攔截
         self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     def _on_close(self):
         """關閉視窗前檢查未儲存的變更"""
+        self.edit_buffer.flush()
         if self.manager.dirty:
             result = messagebox.askyesnocancel("資料未儲存", "有尚未儲存的變更，是否先儲存再關閉？")
             if result is None:  # Cancel
                 return
             if result:  # Yes
                 self.save_file()
+        _THUMBS.save()
         self.destroy()
 
     def load_file(self):
@@ -2473,11 +5025,19 @@ class App(ctk.CTk):
                      font=("微軟正黑體", 13)).pack(expand=True)
         loading_win.update()
 
+        # 背景執行緒會重設 manager：先停掉預建並丟棄舊 Editor 的追蹤，refresh_ui 之前不再預建
+        self._io_busy = True
+        self._stop_prebuild()
+        self._prebuild_steps = {}
+        self._editor_map = {}
+
         error_holder = []
 
         def _do_load():
             try:
                 self.manager.load_excel(path)
+                # 跨表引用索引在背景執行緒預先建好，之後「查看引用」即時回應
+                self.manager.prepare_usage_index()
             except Exception as e:
                 error_holder.append(str(e))
             finally:
@@ -2488,8 +5048,11 @@ class App(ctk.CTk):
                 loading_win.destroy()
             except Exception:
                 pass
+            self._io_busy = False
             if error_holder:
                 messagebox.showerror("錯誤", f"讀取失敗: {error_holder[0]}")
+                # manager 已被重設，舊 Editor 不能再用，依目前狀態重建
+                self.refresh_ui()
                 return
             if self.manager.need_config_alert:
                 messagebox.showinfo("提示", "偵測到新資料表，請先設定【分類參數】與【欄位格式】")
@@ -2500,6 +5063,8 @@ class App(ctk.CTk):
         threading.Thread(target=_do_load, daemon=True).start()
 
     def save_file(self):
+        # 未提交的輸入先在主執行緒寫回，存檔執行緒不碰 Tk
+        self.edit_buffer.flush()
         # 建立儲存中提示視窗
         loading_win = ctk.CTkToplevel(self)
         loading_win.title("")
@@ -2511,6 +5076,10 @@ class App(ctk.CTk):
                      font=("微軟正黑體", 13)).pack(expand=True)
         loading_win.update()
 
+        # 存檔可能替換 DataFrame：期間停止預建
+        self._io_busy = True
+        self._stop_prebuild()
+
         error_holder = []
 
         def _do_save():
@@ -2526,6 +5095,8 @@ class App(ctk.CTk):
                 loading_win.destroy()
             except Exception:
                 pass
+            self._io_busy = False
+            self._restart_prebuild_timer()
             if error_holder:
                 messagebox.showerror("存檔失敗", error_holder[0])
             else:
@@ -2535,6 +5106,8 @@ class App(ctk.CTk):
 
     def refresh_ui(self):
         # 1. 先清理舊的 SheetEditor
+        self._stop_prebuild()
+        self._prebuild_steps = {}
         for editor in self.sheet_editors:
             editor.destroy()
         self.sheet_editors = []
@@ -2559,15 +5132,24 @@ class App(ctk.CTk):
         if sheet_names:
             self._ensure_editor(sheet_names[0])
 
+        # 4. 其餘 Editor 在使用者閒置時預建
+        self._restart_prebuild_timer()
+
     def _on_main_tab_changed(self):
         """頂部 Tab 切換時，延遲建立尚未初始化的 SheetEditor"""
         current = self.main_tabs.get()
         if current:
+            self._tab_usage[current] = self._tab_usage.get(current, 0) + 1
             self._ensure_editor(current)
 
     def _ensure_editor(self, sheet_name):
         """確保指定 tab 的 SheetEditor 已建立（只建立一次）"""
         if self._editor_map.get(sheet_name) is not None:
+            # 預建到一半：同步完成剩餘步驟
+            steps = self._prebuild_steps.pop(sheet_name, None)
+            if steps is not None:
+                for _ in steps:
+                    pass
             return  # 已建立，跳過
 
         parent = self.main_tabs.tab(sheet_name)
@@ -2576,6 +5158,57 @@ class App(ctk.CTk):
         self._editor_map[sheet_name] = editor
         self.sheet_editors.append(editor)
 
+    # ================== 閒置預建 SheetEditor ==================
+
+    _PREBUILD_IDLE_MS = 1200  # 使用者停止操作多久後開始預建
+
+    def _on_user_activity(self, _event=None):
+        """任何鍵盤/滑鼠操作：立即停止預建，重新計時"""
+        if self._idle_scheduler.is_running("prebuild"):
+            self._idle_scheduler.cancel("prebuild")
+        self._restart_prebuild_timer()
+
+    def _restart_prebuild_timer(self):
+        if self._prebuild_timer is not None:
+            self.after_cancel(self._prebuild_timer)
+            self._prebuild_timer = None
+        if self._io_busy:
+            return
+        if any(editor is None for editor in self._editor_map.values()) or self._prebuild_steps:
+            self._prebuild_timer = self.after(self._PREBUILD_IDLE_MS, self._start_prebuild)
+
+    def _stop_prebuild(self):
+        self._idle_scheduler.cancel("prebuild")
+        if self._prebuild_timer is not None:
+            self.after_cancel(self._prebuild_timer)
+            self._prebuild_timer = None
+
+    def _start_prebuild(self):
+        self._prebuild_timer = None
+        self._idle_scheduler.submit("prebuild", self._prebuild_job())
+
+    def _prebuild_job(self):
+        """
+        依使用次數（多者優先）再依 tab 位置逐一預建尚未建立的 SheetEditor；
+        每個 Editor 的建立拆成多個步驟，被取消時停在步驟之間，下次閒置再接續
+        """
+        names = list(self._editor_map)
+        order = sorted(names, key=lambda n: (-self._tab_usage.get(n, 0), names.index(n)))
+        for sheet_name in order:
+            steps = self._prebuild_steps.get(sheet_name)
+            if steps is None:
+                if self._editor_map.get(sheet_name) is not None:
+                    continue
+                editor = SheetEditor(self.main_tabs.tab(sheet_name), sheet_name, self.manager, deferred=True)
+                editor.pack(fill="both", expand=True)
+                self._editor_map[sheet_name] = editor
+                self.sheet_editors.append(editor)
+                steps = self._prebuild_steps[sheet_name] = editor.build_steps()
+                yield
+            for _ in steps:
+                yield
+            self._prebuild_steps.pop(sheet_name, None)
+
     def open_configwnd(self):
         if not self.manager.master_dfs:
             messagebox.showinfo("提示", "請先匯入Excel後再進行參數的配置")
@@ -2602,59 +5235,7 @@ class App(ctk.CTk):
         if not query:
             return
 
-        results = []
-        limit = 200
-
-        # 搜尋母表
-        for sheet_name, df in self.manager.master_dfs.items():
-            if len(results) >= limit:
-                break
-            try:
-                mask = df.astype(str).apply(
-                    lambda col: col.str.contains(query, case=False, na=False))
-                matched = mask.any(axis=1)
-                for idx in df[matched].index:
-                    if len(results) >= limit:
-                        break
-                    matched_cols = {col: str(df.at[idx, col])
-                                    for col in df.columns if mask.at[idx, col]}
-                    results.append((sheet_name, False, idx, matched_cols))
-            except Exception:
-                pass
-
-        # 搜尋子表
-        for sub_name, sub_df in self.manager.sub_dfs.items():
-            if len(results) >= limit:
-                break
-            try:
-                mask = sub_df.astype(str).apply(
-                    lambda col: col.str.contains(query, case=False, na=False))
-                matched = mask.any(axis=1)
-                for idx in sub_df[matched].index:
-                    if len(results) >= limit:
-                        break
-                    matched_cols = {col: str(sub_df.at[idx, col])
-                                    for col in sub_df.columns if mask.at[idx, col]}
-                    results.append((sub_name, True, idx, matched_cols))
-            except Exception:
-                pass
-
-        # 搜尋連結文字
-        if self.manager.text_dict and len(results) < limit:
-            for key, info in self.manager.text_dict.items():
-                if len(results) >= limit:
-                    break
-                val = info["value"] if isinstance(info, dict) else str(info)
-                if query.lower() in val.lower() or query.lower() in str(key).lower():
-                    # 找到哪個母表行引用此 key
-                    for sheet_name, df in self.manager.master_dfs.items():
-                        for col in df.columns:
-                            col_mask = df[col].astype(str) == str(key)
-                            for idx in df[col_mask].index:
-                                if len(results) >= limit:
-                                    break
-                                results.append((sheet_name, False, idx,
-                                                {col: str(key), "Text": val}))
+        results = self.manager.search(query)
 
         if not results:
             messagebox.showinfo("搜尋", f"找不到「{query}」")
@@ -2662,6 +5243,69 @@ class App(ctk.CTk):
 
         SearchResultWindow(self, results, self._jump_to_result, query=query)
 
+    def _show_usages(self, pk_value):
+        """查看引用：列出所有引用 pk_value 的母表 / 子表儲存格（反向引用索引）"""
+        usages = self.manager.find_usages(pk_value)
+        if not usages:
+            messagebox.showinfo("查看引用", f"沒有任何儲存格引用「{pk_value}」")
+            return
+        results = [(sheet_name, is_sub, row_idx, {col: str(pk_value)})
+                   for sheet_name, is_sub, row_idx, col in usages]
+        SearchResultWindow(self, results, self._jump_to_result, query=str(pk_value),
+                           title="查看引用", query_label="PK")
+
+    def _undo(self):
+        """Ctrl+Z：復原最後一筆欄位修改，並顯示被復原的位置"""
+        op = self.manager.undo()
+        if op is not None:
+            self._reveal_op(op)
+        return "break"
+
+    def _redo(self):
+        """Ctrl+Y：重做"""
+        op = self.manager.redo()
+        if op is not None:
+            self._reveal_op(op)
+        return "break"
+
+    def _reveal_op(self, op):
+        """儲存格修改跳到該列；整表檢視中或文字表修改則重新載入目前畫面"""
+        current = self.main_tabs.get() if self.manager.master_dfs else None
+        editor = self._editor_map.get(current) if current else None
+        if op["kind"] == "cell" and not (editor and editor.table_mode
+                                         and op["sheet"].split("#")[0] == current):
+            self._jump_to_result(op["sheet"], op["is_sub"], op["row"])
+        elif editor:
+            editor.reload_current()
+
+    def _show_goto_palette(self):
+        """開啟 Ctrl+P 快速跳轉面板（已開啟時只帶到前景）"""
+        if not self.manager.master_dfs:
+            messagebox.showinfo("提示", "請先匯入Excel")
+            return
+        if self._goto_palette is not None and self._goto_palette.winfo_exists():
+            self._goto_palette.lift()
+            self._goto_palette.focus_force()
+            return
+        self._goto_palette = GotoPalette(self, self.manager, self._jump_to_master)
+
+    def _show_icon_report(self):
+        if not self.manager.master_dfs:
+            return
+        IconReportWindow(self, self.manager)
+
+    def _show_pk_report(self):
+        if not self.manager.master_dfs:
+            return
+        PkReportWindow(self, self.manager)
+
+    def _toggle_table_view(self):
+        """目前母表的編輯器在一般佈局與整表檢視之間切換"""
+        current = self.main_tabs.get() if self.manager.master_dfs else None
+        editor = self._editor_map.get(current) if current else None
+        if editor:
+            editor.show_table_view(not editor.table_mode)
+
     def _jump_to_result(self, sheet_name, is_sub, row_idx):
         """跳轉到搜尋結果"""
         if is_sub:
@@ -2699,6 +5343,7 @@ class App(ctk.CTk):
                 return
 
             # 找到該行的分類
+            editor.show_table_view(False, reload=False)
             cls_val = df.at[row_idx, editor.cls_key]
             editor.load_items_by_group(cls_val)
             editor.load_editor(row_idx)
@@ -2715,19 +5360,20 @@ class App(ctk.CTk):
         if not editor:
             return
 
-        # 找到 PK 對應的行
-        matches = df[df[editor.pk_key].astype(str) == str(pk_value)]
-        if matches.empty:
+        # 找到 PK 對應的行（PK 索引 O(1)）
+        row_idx = self.manager.pk_row(sheet_name, pk_value)
+        if row_idx is None:
             messagebox.showinfo("跳轉", f"找不到 {pk_value}")
             return
 
-        row_idx = matches.index[0]
+        editor.show_table_view(False, reload=False)
         cls_val = df.at[row_idx, editor.cls_key]
         editor.load_items_by_group(cls_val)
         editor.load_editor(row_idx)
 
     def _route_mousewheel(self, event):
         """將滑鼠滾輪事件路由到游標所在的可捲動區域"""
+        self._on_user_activity()
         widget = self.winfo_containing(event.x_root, event.y_root)
         if not widget:
             return
@@ -2757,6 +5403,7 @@ class App(ctk.CTk):
 
     def _route_shift_mousewheel(self, event):
         """將 Shift+滑鼠滾輪事件路由到游標所在的子表 Canvas (橫向捲動)"""
+        self._on_user_activity()
         widget = self.winfo_containing(event.x_root, event.y_root)
         if not widget:
             return